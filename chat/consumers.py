@@ -1,7 +1,11 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from .history import PAGE_SIZE, cursor, history_page, message_json, page_size
 from .models import Message, ChatRoom
+from .rooms import membership
+from . import presence, replay, write_behind
 from users.models import CustomUser
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -9,13 +13,42 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'chat_{self.room_id}'
 
+        self.joined = False
+        self.replayed = set()
+
+        # Only members may listen to (or page through) a room
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        # Join before reading the room, so no broadcast falls between the two
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
+        member = await database_sync_to_async(membership)(self.room_id, user)
+        if member is None:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+            await self.close()
+            return
+
+        replay.join(self.room_id, member.room.last_message_id)
+        self.joined = True
         await self.accept()
 
+        last_seen_id = cursor(parse_qs(self.scope.get('query_string', b'').decode()).get('last_seen_id', [None])[0])
+        if last_seen_id is not None:
+            await self.send_missed(last_seen_id)
+
+        # Others hear about this socket with the room's next presence broadcast
+        presence.store.connected(self.room_id, user.id)
+        await self.send_presence()
+
     async def disconnect(self, close_code):
+        if self.joined:
+            replay.leave(self.room_id)
+            presence.store.disconnected(self.room_id, self.scope['user'].id)
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -23,30 +56,97 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         data = json.loads(text_data)
-        message = data['message']
+        action = data.get('action', 'new')
+
+        if action == 'history':
+            await self.send_history(data)
+        elif action == 'typing':
+            # Local state only — broadcast at most once per interval by chat/presence.py
+            presence.store.set_typing(self.room_id, self.scope['user'].id, data.get('typing', True) is not False)
+        elif action == 'new' and data.get('message'):
+            await self.new_message(data['message'])
+
+    async def new_message(self, message):
         user_id = self.scope['user'].id
+        presence.store.set_typing(self.room_id, user_id, False)
 
-        # Save message
-        message_obj = await database_sync_to_async(Message.objects.create)(
-            chat_room_id=self.room_id,
-            sender_id=user_id,
-            content=message
-        )
+        # Save message — or queue it, broadcasting first, in write-behind mode
+        if write_behind.enabled() and await write_behind.batcher().active():
+            message_obj = await write_behind.batcher().add(self.room_id, self.scope['user'], message)
+        else:
+            message_obj = await database_sync_to_async(Message.objects.create)(
+                chat_room_id=self.room_id,
+                sender_id=user_id,
+                content=message
+            )
 
         # Send to group
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
+                'id': message_obj.id,
                 'message': message,
                 'sender': self.scope['user'].get_full_name(),
+                'sender_id': user_id,
                 'timestamp': message_obj.timestamp.isoformat(),
             }
         )
 
+    async def send_history(self, data):
+        """The "load older" request — one keyset page before `before_id`, to this socket only"""
+        messages, has_more = await database_sync_to_async(history_page)(
+            self.room_id,
+            before_id=cursor(data.get('before_id')),
+            limit=page_size(data.get('limit', PAGE_SIZE)),
+        )
+        await self.send(text_data=json.dumps({
+            'action': 'history',
+            'messages': [message_json(message) for message in messages],
+            'has_more': has_more,
+        }))
+
+    async def send_missed(self, last_seen_id):
+        """A reconnect: what arrived after last_seen_id — from this process's ring, else one query"""
+        messages, has_more = replay.recent(self.room_id, last_seen_id), False
+        if messages is None:
+            messages, has_more = await database_sync_to_async(replay.from_database)(self.room_id, last_seen_id)
+        # Queued write-behind messages are in no page the client loaded, whatever their id
+        messages = replay.with_queued(messages, write_behind.queued(self.room_id))
+        # Broadcasts queued while connecting may repeat these; chat_message skips them
+        self.replayed = {message['id'] for message in messages}
+        await self.send(text_data=json.dumps({
+            'action': 'replay',
+            'messages': messages,
+            'has_more': has_more,
+        }))
+
     async def chat_message(self, event):
+        replay.record(self.room_id, {
+            'id': event['id'],
+            'content': event['message'],
+            'sender': event['sender'],
+            'sender_id': event['sender_id'],
+            'timestamp': event['timestamp'],
+            'edited': False,
+        })
+        if event['id'] in self.replayed:
+            self.replayed.discard(event['id'])
+            return
+
         await self.send(text_data=json.dumps({
+            'action': 'new',
+            'id': event['id'],
+            'content': event['message'],
             'message': event['message'],
             'sender': event['sender'],
+            'sender_id': event['sender_id'],
             'timestamp': event['timestamp'],
-        }))
\ No newline at end of file
+        }))
+
+    async def presence_update(self, event):
+        presence.store.merge(self.room_id, event)
+        await self.send_presence()
+
+    async def send_presence(self):
+        await self.send(text_data=json.dumps({'action': 'presence', **presence.store.state(self.room_id)}))
@@ -0,0 +1,55 @@
+# chat/history.py — KEYSET-PAGINATED ROOM HISTORY
+#
+# Rooms open on their latest page only; older (or newer) pages are fetched by
+# message id — from the history endpoint or the room socket — using the
+# (chat_room, id) index, so a page costs the same at any depth. Message ids
+# only grow, so they are a stable cursor while new messages arrive.
+
+from chat.models import Message
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(value):
+    """A client-supplied limit, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def history_page(room_id, before_id=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Up to `limit` messages, oldest first: the ones just before `before_id`, just
+    after `after_id`, or the latest. Returns (messages, has_more) — has_more
+    says whether another page exists in the direction of travel.
+    """
+    messages = Message.objects.filter(chat_room_id=room_id).select_related('sender')
+    if after_id is not None:
+        page = list(messages.filter(id__gt=after_id).order_by('id')[:limit + 1])
+        return page[:limit], len(page) > limit
+
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages.order_by('-id')[:limit + 1])
+    return page[:limit][::-1], len(page) > limit
+
+
+def message_json(message):
+    return {
+        'id': message.id,
+        'content': message.content,
+        'sender': message.sender.get_full_name(),
+        'sender_id': message.sender_id,
+        'timestamp': message.timestamp.isoformat(),
+        'edited': message.edited,
+    }
+
+
+def cursor(value):
+    """A message id from a query string or socket frame, or None"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
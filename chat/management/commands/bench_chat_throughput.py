@@ -0,0 +1,82 @@
+# chat/management/commands/bench_chat_throughput.py
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat import write_behind
+from chat.models import ChatMembership, ChatRoom, Message
+from chat.routing import websocket_urlpatterns
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Time ChatConsumer message throughput with per-message inserts against write-behind batching"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=10, help="Sockets in the room, all sending at once")
+        parser.add_argument('--messages', type=int, default=50, help="Messages sent by each socket")
+        parser.add_argument('--batch', type=int, default=100, help="Write-behind batch size")
+        parser.add_argument('--interval-ms', type=int, default=200, help="Write-behind flush interval")
+
+    def handle(self, *args, **options):
+        # Broadcasts stay in-process so the numbers are the consumer's and the database's
+        channel_layers.backends[DEFAULT_CHANNEL_LAYER] = InMemoryChannelLayer(capacity=1_000_000)
+        users = [
+            CustomUser.objects.create_user(username=f'bench_chat_{i}', password='x', first_name='Bench', last_name=str(i))
+            for i in range(options['clients'])
+        ]
+        room = ChatRoom.objects.create(name='bench_chat_throughput', is_group=True)
+        ChatMembership.objects.bulk_create(ChatMembership(room=room, user=user) for user in users)
+
+        previous = settings.CHAT_WRITE_BEHIND
+        try:
+            self.stdout.write(f"{'mode':>14}  {'messages':>9}  {'seconds':>8}  {'msgs/sec':>9}  {'persisted':>9}")
+            for mode, on in [('per-message', False), ('write-behind', True)]:
+                settings.CHAT_WRITE_BEHIND = on
+                write_behind._batcher = write_behind.MessageBatcher(options['batch'], options['interval_ms'] / 1000)
+                Message.objects.filter(chat_room=room).delete()
+
+                elapsed = async_to_sync(self._run)(room, users, options['messages'])
+                sent = len(users) * options['messages']
+                persisted = Message.objects.filter(chat_room=room).count()
+                self.stdout.write(f"{mode:>14}  {sent:>9}  {elapsed:>8.2f}  {sent / elapsed:>9.0f}  {persisted:>9}")
+        finally:
+            settings.CHAT_WRITE_BEHIND = previous
+            write_behind._batcher = None
+            room.delete()
+            CustomUser.objects.filter(id__in=[user.id for user in users]).delete()
+
+    async def _run(self, room, users, per_client):
+        """Seconds from the first send until every socket saw every message and all of them are stored"""
+        application = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for user in users:
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{room.id}/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            assert connected, "bench socket was refused"
+            sockets.append(communicator)
+
+        expected = len(users) * per_client
+
+        async def client(communicator):
+            for n in range(per_client):
+                await communicator.send_json_to({'message': f'bench {n}'})
+            for _ in range(expected):
+                await communicator.receive_json_from(timeout=60)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(communicator) for communicator in sockets))
+        if write_behind.enabled():
+            await write_behind.batcher().flush()
+        elapsed = time.perf_counter() - start
+
+        for communicator in sockets:
+            await communicator.disconnect()
+        return elapsed
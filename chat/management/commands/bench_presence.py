@@ -0,0 +1,93 @@
+# chat/management/commands/bench_presence.py
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from chat import presence
+from chat.models import ChatMembership, ChatRoom
+from chat.routing import websocket_urlpatterns
+from users.models import CustomUser
+
+
+class CountingLayer(InMemoryChannelLayer):
+    """The in-memory layer, counting the group messages put on it"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.group_sends = 0
+
+    async def group_send(self, group, message):
+        self.group_sends += 1
+        await super().group_send(group, message)
+
+
+class Command(BaseCommand):
+    help = "Show that presence and typing traffic on the channel layer stays flat as a room grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, nargs='+', default=[10, 40, 160], help="Room sizes to run")
+        parser.add_argument('--seconds', type=float, default=5, help="How long everyone keeps typing")
+        parser.add_argument('--keystroke-ms', type=int, default=100, help="Typing frame interval per socket")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'members':>8}  {'typing frames':>13}  {'naive sends':>11}  {'layer sends':>11}  {'sends/sec':>9}"
+        )
+        for size in options['members']:
+            users = CustomUser.objects.bulk_create(
+                CustomUser(username=f'bench_presence_{size}_{i}', first_name='Bench', last_name=str(i), password='!')
+                for i in range(size)
+            )
+            if users[0].pk is None:  # backends that cannot return bulk ids
+                users = list(CustomUser.objects.filter(username__startswith=f'bench_presence_{size}_'))
+            room = ChatRoom.objects.create(name='bench_presence', is_group=True)
+            ChatMembership.objects.bulk_create(ChatMembership(room=room, user=user) for user in users)
+
+            layer = channel_layers.backends[DEFAULT_CHANNEL_LAYER] = CountingLayer(capacity=1_000_000)
+            presence.store = presence.PresenceStore()
+            try:
+                frames = async_to_sync(self._run)(room, users, options['seconds'], options['keystroke_ms'] / 1000)
+            finally:
+                room.delete()
+                CustomUser.objects.filter(id__in=[user.id for user in users]).delete()
+
+            # Sending each typing frame straight to the group would be one layer message per frame
+            self.stdout.write(
+                f"{size:>8}  {frames:>13}  {frames:>11}  {layer.group_sends:>11}"
+                f"  {layer.group_sends / options['seconds']:>9.1f}"
+            )
+
+    async def _run(self, room, users, seconds, keystroke):
+        application = URLRouter(websocket_urlpatterns)
+        sockets = []
+        for user in users:
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{room.id}/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect()
+            assert connected, "bench socket was refused"
+            sockets.append(communicator)
+
+        frames = 0
+
+        async def type_for(communicator):
+            nonlocal frames
+            deadline = time.monotonic() + seconds
+            keystrokes = 0
+            while time.monotonic() < deadline:
+                # Pause every fifth keystroke, so the room's typing state keeps changing
+                await communicator.send_json_to({'action': 'typing', 'typing': keystrokes % 5 != 4})
+                keystrokes += 1
+                frames += 1
+                await asyncio.sleep(keystroke)
+
+        channel_layers.backends[DEFAULT_CHANNEL_LAYER].group_sends = 0  # count the typing phase only
+        await asyncio.gather(*(type_for(communicator) for communicator in sockets))
+
+        for communicator in sockets:
+            await communicator.disconnect()
+        return frames
@@ -0,0 +1,35 @@
+# chat/management/commands/reconcile_unread_counters.py
+from django.core.management.base import BaseCommand
+
+from chat.unread import reconcile_unread_counters
+
+
+class Command(BaseCommand):
+    help = "Recount room memberships from the Message table and UnreadCounter from memberships; repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not repair it")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rooms checked per batch")
+
+    def handle(self, *args, **options):
+        memberships, counters = reconcile_unread_counters(
+            repair=not options['dry_run'], chunk_size=options['chunk_size'],
+        )
+
+        if not memberships and not counters:
+            self.stdout.write(self.style.SUCCESS("All unread counts match the Message table."))
+            return
+
+        for label, drifted in (('membership', memberships), ('user counter', counters)):
+            if not drifted:
+                continue
+            preview = ', '.join(
+                f"{label} {key}: {stored} → {actual}" for key, (stored, actual) in list(drifted.items())[:20]
+            )
+            more = f" (+{len(drifted) - 20} more)" if len(drifted) > 20 else ''
+            if options['dry_run']:
+                self.stdout.write(self.style.ERROR(
+                    f"{len(drifted)} {label}(s) out of sync: {preview}{more}. Run again without --dry-run to fix."
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(f"Repaired {len(drifted)} {label}(s): {preview}{more}"))
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_read_state(apps, schema_editor):
+    """
+    Last message per room; each member's watermark at the newest message they
+    sent or that was already flagged read, and the messages from others above it.
+    Counters are recreated from the memberships on first read.
+    """
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMembership = apps.get_model('chat', 'ChatMembership')
+    Message = apps.get_model('chat', 'Message')
+    UnreadCounter = apps.get_model('chat', 'UnreadCounter')
+
+    ChatRoom.objects.update(last_message_id=Subquery(
+        Message.objects.filter(chat_room=OuterRef('pk')).order_by('-id').values('id')[:1]
+    ))
+    ChatMembership.objects.update(last_read_message_id=Coalesce(Subquery(
+        Message.objects.filter(chat_room=OuterRef('room'))
+        .filter(Q(is_read=True) | Q(sender=OuterRef('user')))
+        .order_by('-id').values('id')[:1]
+    ), 0))
+    ChatMembership.objects.update(unread_count=Coalesce(Subquery(
+        Message.objects.filter(chat_room=OuterRef('room'), id__gt=OuterRef('last_read_message_id'))
+        .exclude(sender=OuterRef('user'))
+        .order_by().values('chat_room').annotate(n=Count('id')).values('n')
+    ), 0))
+    UnreadCounter.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_unreadcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # ChatMembership takes over the table of the implicit participants M2M
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ChatMembership',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False)),
+                        ('room', models.ForeignKey(db_column='chatroom_id', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='chat.chatroom')),
+                        ('user', models.ForeignKey(db_column='customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='chat_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'chat_chatroom_participants',
+                        'unique_together': {('room', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='chatroom',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='chat_rooms', through='chat.ChatMembership', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatmembership',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatmembership',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.RunPython(backfill_read_state, migrations.RunPython.noop),
+    ]
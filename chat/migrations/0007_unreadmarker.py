@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_message_chat_room_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_markers', to='chat.chatmembership')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='chat.message')),
+            ],
+            options={
+                'unique_together': {('membership', 'message')},
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -6,10 +6,14 @@ User = get_user_model()
 
 class ChatRoom(models.Model):
     name = models.CharField(max_length=100, blank=True)
-    participants = models.ManyToManyField(User, related_name='chat_rooms')
+    participants = models.ManyToManyField(User, through='ChatMembership', related_name='chat_rooms')
     is_group = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # Newest message, kept by Message.save()/delete() so room lists need no per-room query
+    last_message = models.ForeignKey(
+        'Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
 
     def __str__(self):
         if self.is_group:
@@ -17,10 +21,30 @@ class ChatRoom(models.Model):
         return " & ".join([p.get_full_name() for p in self.participants.all()])
 
     def update_last_message(self):
-        latest = self.messages.order_by('-timestamp').first()
-        if latest:
-            self.last_message_at = latest.timestamp
-            self.save(update_fields=['last_message_at'])
+        latest = self.messages.order_by('-id').first()
+        self.last_message = latest
+        self.last_message_at = latest.timestamp if latest else None
+        self.save(update_fields=['last_message', 'last_message_at'])
+
+
+class ChatMembership(models.Model):
+    """
+    A room participant and their read state: messages above last_read_message_id
+    from others are unread, and unread_count keeps their number (chat/unread.py).
+    Uses the table of the original implicit participants M2M.
+    """
+    id = models.AutoField(primary_key=True)
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, db_column='chatroom_id', related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='customuser_id', related_name='chat_memberships')
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'chat_chatroom_participants'
+        unique_together = ('room', 'user')
+
+    def __str__(self):
+        return f"{self.user_id} in room {self.room_id}: {self.unread_count} unread"
 
 class Message(models.Model):
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='messages')
@@ -35,15 +59,67 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pages of a room's history (chat/history.py)
+            models.Index(fields=['chat_room', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.sender.get_full_name()}: {self.content or 'Media'}"
 
+    def save(self, *args, **kwargs):
+        from chat.unread import message_created
+
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                message_created(self)
+
+    def delete(self, *args, **kwargs):
+        from chat.unread import message_deleted
+
+        message_id = self.pk  # delete() clears it
+        with transaction.atomic():
+            marked = list(UnreadMarker.objects.filter(message_id=message_id).values_list('membership_id', flat=True))
+            result = super().delete(*args, **kwargs)
+            message_deleted(self.chat_room_id, message_id, self.sender_id, marked)
+        return result
+
     def mark_as_read(self):
+        # Legacy flag — per-user read state is ChatMembership.last_read_message_id
         if not self.is_read:
             self.is_read = True
             self.save(update_fields=['is_read'])
 
+class UnreadMarker(models.Model):
+    """
+    A message that landed at or below a member's read watermark (a write-behind
+    id, or a slow commit) and so is not covered by it: it counts as unread
+    until the member next reads the room (chat/unread.py).
+    """
+    membership = models.ForeignKey(ChatMembership, on_delete=models.CASCADE, related_name='unread_markers')
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ('membership', 'message')
+
+    def __str__(self):
+        return f"Membership {self.membership_id}: message {self.message_id} unread"
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread chat messages per user, moved by Message writes and reads (chat/unread.py).
+    Created on first read; `manage.py reconcile_unread_counters` repairs drift.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    messages = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.messages} unread message(s)"
+
 # Add this method to ChatRoom
 def create_class_group(classroom):
     """ Create group chat for a class """
@@ -0,0 +1,200 @@
+# chat/presence.py — WHO IS ONLINE AND TYPING, COALESCED PER ROOM
+#
+# Presence and typing never reach the channel layer one event at a time. Each
+# process tracks its own room sockets here — open sockets per user, and
+# typing flags that lapse after TYPING_TTL — and marks a room dirty when
+# either changes. One loop per process sends each dirty room's snapshot as a
+# single group message every BROADCAST_INTERVAL, and re-sends rooms it still
+# has sockets in every REFRESH, so the layer carries at most one presence
+# message per room per interval per process however many members type.
+#
+# Snapshots name the process that sent them: consumers keep other processes'
+# snapshots for ONLINE_TTL (typing for TYPING_TTL) and show the union. The
+# loop also marks users online in the cache for ONLINE_TTL, which is what the
+# chat lists read (online_users()).
+#
+# The store lives on the event loop thread: only touch it from async code.
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_INTERVAL = 1.0
+TYPING_TTL = 5
+REFRESH = 20
+ONLINE_TTL = 60
+
+ORIGIN = uuid.uuid4().hex  # this process, in the snapshots it sends
+
+
+def _key(user_id):
+    return f'presence:online:{user_id}'
+
+
+def online_users(user_ids):
+    """Which of these users have a chat socket open anywhere — one cache read"""
+    keys = {_key(user_id): user_id for user_id in user_ids if user_id is not None}
+    if not keys:
+        return set()
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+def is_online(user):
+    return user is not None and user.id in online_users([user.id])
+
+
+class PresenceStore:
+    def __init__(self):
+        self.sockets = defaultdict(Counter)  # room -> {user: open sockets}
+        self.typing = defaultdict(dict)  # room -> {user: expires}
+        self.remote = defaultdict(dict)  # room -> {origin: (online, typing, online expires, typing expires)}
+        self.users = Counter()  # user -> open sockets in any room
+        self.dirty = set()
+        self.sent_at = {}
+        self.arrived, self.departed = set(), set()
+        self.cached_at = 0
+        self.broadcasts = 0
+        self._task = None
+
+    # ─────────────────────────────────────
+    # LOCAL SOCKETS
+    # ─────────────────────────────────────
+    def connected(self, room_id, user_id):
+        self.sockets[room_id][user_id] += 1
+        self.users[user_id] += 1
+        if self.users[user_id] == 1:
+            self.arrived.add(user_id)
+            self.departed.discard(user_id)
+        self.dirty.add(room_id)
+        self._start()
+
+    def disconnected(self, room_id, user_id):
+        room = self.sockets.get(room_id)
+        if not room or not room[user_id]:
+            return
+        room[user_id] -= 1
+        if not room[user_id]:
+            del room[user_id]
+            typers = self.typing.get(room_id)
+            if typers is not None:
+                typers.pop(user_id, None)
+                if not typers:
+                    del self.typing[room_id]
+        if not room:
+            del self.sockets[room_id]
+        self.users[user_id] -= 1
+        if not self.users[user_id]:
+            del self.users[user_id]
+            self.departed.add(user_id)
+            self.arrived.discard(user_id)
+        self.dirty.add(room_id)
+        self._start()
+
+    def set_typing(self, room_id, user_id, typing=True):
+        typers = self.typing[room_id]
+        if typing:
+            if user_id not in typers:
+                self.dirty.add(room_id)
+            typers[user_id] = time.monotonic() + TYPING_TTL
+        elif typers.pop(user_id, None) is not None:
+            self.dirty.add(room_id)
+        if not typers:
+            del self.typing[room_id]
+        self._start()
+
+    # ─────────────────────────────────────
+    # OTHER PROCESSES
+    # ─────────────────────────────────────
+    def merge(self, room_id, event):
+        """Keep another process's snapshot of the room; ours are already known"""
+        if event['origin'] == ORIGIN:
+            return
+        remote = self.remote[room_id]
+        if event['online'] or event['typing']:
+            now = time.monotonic()
+            remote[event['origin']] = (set(event['online']), set(event['typing']), now + ONLINE_TTL, now + TYPING_TTL)
+        else:
+            remote.pop(event['origin'], None)
+        if not remote:
+            del self.remote[room_id]
+
+    def state(self, room_id):
+        """{'online': [user ids], 'typing': [user ids]} for the room, across processes"""
+        now = time.monotonic()
+        online = set(self.sockets.get(room_id, ()))
+        typing = set(self.typing.get(room_id, ()))
+        for origin, (their_online, their_typing, online_until, typing_until) in list(self.remote.get(room_id, {}).items()):
+            if online_until <= now:
+                del self.remote[room_id][origin]
+                continue
+            online |= their_online
+            if typing_until > now:
+                typing |= their_typing
+        return {'online': sorted(online), 'typing': sorted(typing & online)}
+
+    # ─────────────────────────────────────
+    # COALESCED BROADCASTS
+    # ─────────────────────────────────────
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self.users or self.dirty or self.typing:
+            await asyncio.sleep(BROADCAST_INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        now = time.monotonic()
+        for room_id, typers in list(self.typing.items()):
+            for user_id, expires in list(typers.items()):
+                if expires <= now:
+                    del typers[user_id]
+                    self.dirty.add(room_id)
+            if not typers:
+                del self.typing[room_id]
+        for room_id in self.sockets:
+            if now - self.sent_at.get(room_id, 0) >= REFRESH:
+                self.dirty.add(room_id)
+
+        rooms, self.dirty = self.dirty, set()
+        for room_id in rooms:
+            online = list(self.sockets.get(room_id, ()))
+            typing = list(self.typing.get(room_id, ()))
+            await self._send(room_id, {'type': 'presence.update', 'origin': ORIGIN, 'online': online, 'typing': typing})
+            if online:
+                self.sent_at[room_id] = now
+            else:
+                self.sent_at.pop(room_id, None)
+
+        await self._cache_online(now)
+
+    async def _send(self, room_id, event):
+        try:
+            await get_channel_layer().group_send(f'chat_{room_id}', event)
+            self.broadcasts += 1
+        except Exception:
+            logger.warning("Presence broadcast for room %s failed", room_id, exc_info=True)
+
+    async def _cache_online(self, now):
+        """Arrivals and departures now, everyone still here every REFRESH"""
+        if now - self.cached_at >= REFRESH:
+            self.arrived, self.cached_at = set(self.users), now
+        arrived, departed = self.arrived, self.departed
+        self.arrived, self.departed = set(), set()
+        if arrived:
+            await sync_to_async(cache.set_many)({_key(user_id): True for user_id in arrived}, ONLINE_TTL)
+        if departed:
+            await sync_to_async(cache.delete_many)([_key(user_id) for user_id in departed])
+
+
+store = PresenceStore()
@@ -0,0 +1,98 @@
+# chat/replay.py — RESUMING A ROOM SOCKET FROM THE LAST MESSAGE SEEN
+#
+# A socket that connects with ?last_seen_id=N is sent the messages it missed
+# before live delivery starts, instead of the page reloading the room.
+#
+# Each process keeps a ring of the RING_SIZE latest messages of every room it
+# has sockets in, filled from the broadcasts its consumers receive. A ring
+# holds everything above its `floor` (the room's last message when this
+# process started listening, or the last message evicted), so a resume from
+# at or above the floor is answered from memory. Older cursors take one
+# keyset query on the (chat_room, id) index (chat/history.py); a gap longer
+# than MAX_PAGE_SIZE is not replayed and the client reloads instead.
+#
+# With write-behind (chat/write_behind.py) a broadcast message may not be
+# stored yet, so no page the client loaded has it even when its id is below
+# last_seen_id: those queued messages always go in the replay.
+#
+# The rings live on the event loop thread: only touch them from async code.
+
+from collections import OrderedDict
+
+from chat.history import MAX_PAGE_SIZE, history_page, message_json
+
+RING_SIZE = 100
+
+
+class RoomRing:
+    def __init__(self, floor):
+        self.floor = floor
+        self.messages = OrderedDict()
+        self.listeners = 0
+
+    @property
+    def newest(self):
+        return max(self.messages, default=self.floor)
+
+    def add(self, message):
+        if message['id'] <= self.floor or message['id'] in self.messages:
+            return
+        self.messages[message['id']] = message
+        if len(self.messages) > RING_SIZE:
+            self.floor, _ = self.messages.popitem(last=False)
+
+    def since(self, last_seen_id):
+        """Messages after last_seen_id, oldest first — None if the ring no longer reaches back that far"""
+        if last_seen_id < self.floor:
+            return None
+        return sorted((m for message_id, m in self.messages.items() if message_id > last_seen_id), key=lambda m: m['id'])
+
+
+_rings = {}
+
+
+def join(room_id, last_message_id):
+    """
+    A socket of this process is listening to the room. Call after joining the
+    room's group, with last_message_id read after that, so nothing falls
+    between the floor and the first recorded broadcast.
+    """
+    last_message_id = last_message_id or 0
+    ring = _rings.get(room_id)
+    if ring is None or (ring.listeners == 0 and last_message_id > ring.newest):
+        # New here, or messages arrived while nobody in this process listened
+        ring = _rings[room_id] = RoomRing(last_message_id)
+    ring.listeners += 1
+
+
+def leave(room_id):
+    ring = _rings.get(room_id)
+    if ring is not None:
+        ring.listeners = max(ring.listeners - 1, 0)
+
+
+def record(room_id, message):
+    ring = _rings.get(room_id)
+    if ring is not None:
+        ring.add(message)
+
+
+def recent(room_id, last_seen_id):
+    """What the room's ring holds after last_seen_id, or None if it cannot answer"""
+    ring = _rings.get(room_id)
+    return ring.since(last_seen_id) if ring is not None else None
+
+
+def from_database(room_id, last_seen_id):
+    """The fallback: one indexed query. Returns (messages, has_more)"""
+    messages, has_more = history_page(room_id, after_id=last_seen_id, limit=MAX_PAGE_SIZE)
+    return [message_json(message) for message in messages], has_more
+
+
+def with_queued(messages, queued):
+    """A replay plus the room's queued write-behind messages, by id"""
+    if not queued:
+        return messages
+    merged = {message['id']: message for message in messages}
+    merged.update((message.id, message_json(message)) for message in queued)
+    return [merged[message_id] for message_id in sorted(merged)]
@@ -0,0 +1,56 @@
+# chat/rooms.py — ROOM LISTS AND MEMBERSHIP LOOKUPS
+#
+# The chat lists read everything they show from the user's ChatMembership
+# rows: the room with its denormalized last_message (and sender), and the
+# membership's unread_count. The other person of each one-to-one room comes
+# from one more query, so a list costs the same however many rooms it has,
+# and whether they are online from one cache read (chat/presence.py).
+
+from django.db.models import Max
+
+from chat.models import ChatMembership
+from chat.presence import online_users
+
+
+def room_list(user):
+    """
+    The user's memberships, latest activity first — each with .room
+    (last_message and its sender loaded), .unread_count, .other_user (None
+    for group rooms) and .other_online. Two queries and a cache read.
+    """
+    memberships = list(
+        ChatMembership.objects.filter(user=user)
+        .select_related('room__last_message__sender')
+        .order_by('-room__last_message_at', '-room__created_at')
+    )
+    direct = [membership.room_id for membership in memberships if not membership.room.is_group]
+    others = {}
+    if direct:
+        for other in ChatMembership.objects.filter(room_id__in=direct).exclude(user=user).select_related(
+            'user__profile'
+        ).order_by('id'):
+            others.setdefault(other.room_id, other.user)
+    online = online_users(other.id for other in others.values())
+    for membership in memberships:
+        membership.other_user = others.get(membership.room_id)
+        membership.other_online = membership.room_id in others and others[membership.room_id].id in online
+    return memberships
+
+
+def membership(room_id, user):
+    """The user's membership of a room with the room loaded, or None if they are not in it"""
+    return ChatMembership.objects.select_related('room').filter(room_id=room_id, user=user).first()
+
+
+def other_participant(room, user):
+    """The other person of a one-to-one room"""
+    if room.is_group:
+        return None
+    return room.participants.exclude(id=user.id).first()
+
+
+def others_read_up_to(room, user):
+    """Highest message id any other member has read — for "seen" ticks on the user's messages"""
+    return ChatMembership.objects.filter(room=room).exclude(user=user).aggregate(
+        read=Max('last_read_message_id')
+    )['read'] or 0
@@ -0,0 +1,19 @@
+# chat/templatetags/unread_tags.py
+from django import template
+
+from chat.unread import unread_counts as load_unread_counts
+
+register = template.Library()
+
+NO_UNREAD = {'messages': 0, 'notifications': 0, 'total': 0}
+
+
+@register.simple_tag(takes_context=True)
+def unread_counts(context):
+    """{% unread_counts as unread %} — the user's badge counts, loaded once per request"""
+    request = context.get('request')
+    if request is None or not request.user.is_authenticated:
+        return NO_UNREAD
+    if not hasattr(request, '_unread_counts'):
+        request._unread_counts = load_unread_counts(request.user)
+    return request._unread_counts
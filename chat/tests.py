@@ -1,3 +1,327 @@
-from django.test import TestCase
+from collections import Counter
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import OperationalError
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from chat import presence, replay, write_behind
+from chat.history import message_json
+from chat.models import ChatMembership, ChatRoom, Message
+from chat.rooms import membership
+from chat.unread import messages_read, reconcile_unread_counters, unread_messages
+from reports.models import Notification
+from users.models import CustomUser
+
+
+class WriteBehindTests(TransactionTestCase):
+    # Transactional: constraint failures only surface when a batch commits
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user('alice', password='pw')
+        self.bob = CustomUser.objects.create_user('bob', password='pw')
+        self.room = ChatRoom.objects.create(is_group=True)
+        ChatMembership.objects.create(room=self.room, user=self.alice)
+        ChatMembership.objects.create(room=self.room, user=self.bob)
+        self.batcher = write_behind.MessageBatcher(batch_size=100, interval=60)
+
+    def add(self, room_id, content):
+        return async_to_sync(self.batcher.add)(room_id, self.alice, content)
+
+    def test_bad_row_is_dropped_and_the_rest_saved(self):
+        self.add(self.room.id + 1000, 'room that does not exist')
+        good = self.add(self.room.id, 'hello')
+        with self.assertLogs('chat.write_behind', 'WARNING'):
+            async_to_sync(self.batcher.flush)()
+
+        self.assertEqual(list(Message.objects.values_list('id', flat=True)), [good.id])
+        self.assertEqual((self.batcher.flushed, self.batcher.dropped, self.batcher.pending), (1, 1, []))
+        self.assertEqual(ChatMembership.objects.get(user=self.bob).unread_count, 1)
+        self.assertEqual(reconcile_unread_counters(repair=False), ({}, {}))
+
+    def test_failing_flush_is_retried_then_dropped(self):
+        def locked(messages):
+            raise OperationalError('database is locked')
+
+        self.add(self.room.id, 'hello')
+        original, write_behind.write = write_behind.write, locked
+        try:
+            with self.assertLogs('chat.write_behind', 'ERROR') as logs:
+                for _ in range(write_behind.MAX_ATTEMPTS - 1):
+                    async_to_sync(self.batcher.flush)()
+                    self.assertEqual(len(self.batcher.pending), 1)
+                async_to_sync(self.batcher.flush)()
+        finally:
+            write_behind.write = original
+        self.assertIn('after 5 failed flushes', logs.output[-1])
+        self.assertEqual((self.batcher.pending, self.batcher.dropped), ([], 1))
+
+    def test_ids_keep_send_order_with_direct_inserts(self):
+        queued = self.add(self.room.id, 'queued')
+        direct = Message.objects.create(chat_room=self.room, sender=self.bob, content='direct')
+        self.assertLess(queued.id, direct.id)
+        async_to_sync(self.batcher.flush)()
+        self.assertLess(direct.id, self.add(self.room.id, 'next batch').id)
+
+    def test_one_id_block_per_batch(self):
+        reserved = []
+        original = write_behind.reserve_message_ids
+
+        def counting(count):
+            reserved.append(count)
+            return original(count)
+
+        write_behind.reserve_message_ids = counting
+        try:
+            ids = [self.add(self.room.id, f'message {n}').id for n in range(10)]
+            async_to_sync(self.batcher.flush)()
+            ids.append(self.add(self.room.id, 'next batch').id)
+        finally:
+            write_behind.reserve_message_ids = original
+        self.assertEqual(reserved, [100, 100])
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_message_landing_behind_a_read_watermark_still_counts(self):
+        queued = self.add(self.room.id, 'queued')
+        Message.objects.create(chat_room=self.room, sender=self.alice, content='direct')
+        messages_read(membership(self.room.id, self.bob))  # bob reads past the queued id
+        async_to_sync(self.batcher.flush)()
+
+        bob = ChatMembership.objects.get(user=self.bob)
+        watermark = bob.last_read_message_id
+        self.assertGreater(watermark, queued.id)  # bob's read state stays as it was
+        self.assertEqual(bob.unread_count, 1)  # only the late message
+        self.assertEqual(reconcile_unread_counters(repair=False), ({}, {}))
+
+        self.assertEqual(messages_read(membership(self.room.id, self.bob)), 1)
+        bob.refresh_from_db()
+        self.assertEqual((bob.last_read_message_id, bob.unread_count), (watermark, 0))
+        self.assertEqual(reconcile_unread_counters(repair=False), ({}, {}))
+
+    def test_deleting_a_late_message_takes_it_off_the_count(self):
+        queued = self.add(self.room.id, 'queued')
+        Message.objects.create(chat_room=self.room, sender=self.alice, content='direct')
+        messages_read(membership(self.room.id, self.bob))
+        async_to_sync(self.batcher.flush)()
+
+        Message.objects.get(pk=queued.id).delete()
+        self.assertEqual(ChatMembership.objects.get(user=self.bob).unread_count, 0)
+        self.assertEqual(reconcile_unread_counters(repair=False), ({}, {}))
+
+    def test_queued_messages_go_in_every_replay(self):
+        queued = self.add(self.room.id, 'queued')
+        direct = Message.objects.create(chat_room=self.room, sender=self.bob, content='direct')
+        write_behind._batcher = self.batcher
+        try:
+            # The client's page came from the database: it has `direct` but not the queued message below it
+            missed, has_more = replay.from_database(self.room.id, direct.id)
+            replayed = replay.with_queued(missed, write_behind.queued(str(self.room.id)))
+        finally:
+            write_behind._batcher = None
+        self.assertEqual(([m['id'] for m in replayed], has_more), ([queued.id], False))
+        self.assertEqual(replayed[0]['sender'], self.alice.get_full_name())
+
+
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = (CustomUser.objects.create_user(name, password='pw') for name in ('alice', 'bob', 'carol'))
+        cls.room = ChatRoom.objects.create(is_group=True)
+        for user in (cls.alice, cls.bob, cls.carol):
+            ChatMembership.objects.create(room=cls.room, user=user)
+
+    def setUp(self):
+        cache.clear()
+        for user in (self.alice, self.bob, self.carol):
+            unread_messages(user.id)  # create the UnreadCounter rows
+
+    def send(self, sender, content):
+        return Message.objects.create(chat_room=self.room, sender=sender, content=content)
+
+    def assertCounts(self, **expected):
+        self.assertEqual(reconcile_unread_counters(repair=False), ({}, {}))
+        cache.clear()
+        self.assertEqual({name: unread_messages(getattr(self, name).id) for name in expected}, expected)
+
+    def test_counters_follow_create_read_and_delete(self):
+        first = self.send(self.alice, 'one')
+        self.send(self.alice, 'two')
+        self.send(self.bob, 'three')
+        self.assertCounts(alice=1, bob=2, carol=3)
+
+        messages_read(membership(self.room.id, self.bob))
+        self.assertCounts(alice=1, bob=0, carol=3)
+
+        first.delete()  # read by bob, unread for carol
+        self.assertCounts(alice=1, bob=0, carol=2)
+
+        self.send(self.carol, 'four')
+        self.assertCounts(alice=2, bob=1, carol=2)
+
+    def test_drift_is_reported_and_repaired(self):
+        self.send(self.alice, 'one')
+        bob = ChatMembership.objects.get(user=self.bob)
+        ChatMembership.objects.filter(pk=bob.pk).update(unread_count=7)
+
+        memberships, counters = reconcile_unread_counters()
+        self.assertEqual((memberships, counters), ({bob.pk: (7, 1)}, {}))
+        self.assertCounts(bob=1)
+
+
+class UnreadApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = (CustomUser.objects.create_user(name, password='pw') for name in ('alice', 'bob'))
+        cls.room = ChatRoom.objects.create()
+        for user in (cls.alice, cls.bob):
+            ChatMembership.objects.create(room=cls.room, user=user)
+
+    def setUp(self):
+        cache.clear()
+        for n in range(2):
+            Message.objects.create(chat_room=self.room, sender=self.alice, content=f'message {n}')
+        Notification.objects.create(title='Welcome', message='Welcome', recipient_type='all')
+
+    def counts(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('unread_api')).json()
+
+    def test_counts_follow_send_and_read(self):
+        self.assertEqual(self.counts(self.bob), {'messages': 2, 'notifications': 1, 'total': 3})
+        self.assertEqual(self.counts(self.alice), {'messages': 0, 'notifications': 1, 'total': 1})
+
+        self.client.force_login(self.bob)
+        self.client.get(reverse('chat:chat_room', args=[self.room.id]))  # reads the room
+        self.assertEqual(self.counts(self.bob), {'messages': 0, 'notifications': 1, 'total': 1})
+
+        Message.objects.create(chat_room=self.room, sender=self.alice, content='one more')
+        self.assertEqual(self.counts(self.bob)['messages'], 1)
+
+    def test_template_tag_loads_once_per_request(self):
+        template = Template('{% load unread_tags %}{% unread_counts as unread %}{{ unread.messages }}/{{ unread.total }}')
+        request = RequestFactory().get('/')
+        request.user = self.bob
+        self.assertEqual(template.render(Context({'request': request})), '2/3')
+        with self.assertNumQueries(0):
+            self.assertEqual(template.render(Context({'request': request})), '2/3')  # the sidebar and the page
+
+        anonymous = RequestFactory().get('/')
+        anonymous.user = AnonymousUser()
+        self.assertEqual(template.render(Context({'request': anonymous})), '0/0')
+
+
+class ReplayRingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user('alice', password='pw')
+        cls.room = ChatRoom.objects.create(is_group=True)
+        ChatMembership.objects.create(room=cls.room, user=cls.alice)
+
+    def setUp(self):
+        replay._rings.clear()
+        self.addCleanup(replay._rings.clear)
+
+    def send(self, count, record=True):
+        for n in range(count):
+            message = Message.objects.create(chat_room=self.room, sender=self.alice, content=f'message {n}')
+            if record:
+                replay.record(self.room.id, message_json(message))  # what the consumer does per broadcast
+
+    def ids(self):
+        return list(Message.objects.filter(chat_room=self.room).order_by('id').values_list('id', flat=True))
+
+    def assertRingMatchesDatabase(self, last_seen_id):
+        self.assertEqual(replay.recent(self.room.id, last_seen_id), replay.from_database(self.room.id, last_seen_id)[0])
+
+    def test_ring_answers_like_the_database(self):
+        self.send(3, record=False)
+        replay.join(self.room.id, self.ids()[-1])
+        self.send(5)
+        for last_seen_id in self.ids()[2:]:
+            self.assertRingMatchesDatabase(last_seen_id)
+        self.assertIsNone(replay.recent(self.room.id, self.ids()[1]))  # before the ring started
+
+    def test_eviction_moves_the_floor(self):
+        replay.join(self.room.id, None)
+        self.send(replay.RING_SIZE + 5)
+        floor = self.ids()[4]
+        self.assertEqual(replay._rings[self.room.id].floor, floor)
+        self.assertRingMatchesDatabase(floor)
+        self.assertIsNone(replay.recent(self.room.id, floor - 1))
+
+    def test_ring_restarts_after_messages_nobody_here_heard(self):
+        replay.join(self.room.id, None)
+        self.send(2)
+        replay.leave(self.room.id)
+        self.send(2, record=False)  # another process's sockets only
+
+        replay.join(self.room.id, self.ids()[-1])
+        self.assertIsNone(replay.recent(self.room.id, self.ids()[1]))
+        self.send(1)
+        self.assertRingMatchesDatabase(self.ids()[-2])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PresenceStoreTests(SimpleTestCase):
+    ALICE, BOB = 1, 2
+
+    def setUp(self):
+        cache.clear()
+        self.store = presence.PresenceStore()
+
+    def assertUsersMatchSockets(self):
+        recount = sum(self.store.sockets.values(), Counter())
+        self.assertEqual(self.store.users, recount)
+
+    def run_async(self, scenario):
+        async def run():
+            try:
+                await scenario()
+            finally:
+                if self.store._task:
+                    self.store._task.cancel()
+        async_to_sync(run)()
+
+    def test_socket_counts_follow_connects_and_disconnects(self):
+        async def scenario():
+            store = self.store
+            store.connected(1, self.ALICE)
+            store.connected(1, self.ALICE)  # a second tab
+            store.connected(2, self.ALICE)
+            store.connected(1, self.BOB)
+            store.set_typing(1, self.BOB)
+            self.assertUsersMatchSockets()
+            self.assertEqual(store.state(1), {'online': [self.ALICE, self.BOB], 'typing': [self.BOB]})
+
+            await store.flush()
+            self.assertEqual(store.broadcasts, 2)  # one per dirty room
+            self.assertEqual(presence.online_users([self.ALICE, self.BOB]), {self.ALICE, self.BOB})
+
+            store.disconnected(1, self.BOB)
+            store.disconnected(1, self.ALICE)
+            store.disconnected(1, self.BOB)  # already gone
+            self.assertUsersMatchSockets()
+            self.assertEqual(store.state(1), {'online': [self.ALICE], 'typing': []})
+
+            store.disconnected(1, self.ALICE)
+            store.disconnected(2, self.ALICE)
+            self.assertUsersMatchSockets()
+            self.assertEqual((dict(store.sockets), dict(store.typing)), ({}, {}))
+            await store.flush()
+            self.assertEqual(presence.online_users([self.ALICE, self.BOB]), set())
+
+        self.run_async(scenario)
+
+    def test_other_processes_are_merged_until_they_expire(self):
+        async def scenario():
+            self.store.connected(1, self.ALICE)
+            self.store.merge(1, {'origin': 'elsewhere', 'online': [self.BOB], 'typing': [self.BOB]})
+            self.assertEqual(self.store.state(1), {'online': [self.ALICE, self.BOB], 'typing': [self.BOB]})
+
+            self.store.merge(1, {'origin': 'elsewhere', 'online': [], 'typing': []})
+            self.assertEqual(self.store.state(1), {'online': [self.ALICE], 'typing': []})
+
+        self.run_async(scenario)
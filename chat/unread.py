@@ -0,0 +1,214 @@
+# chat/unread.py — READ WATERMARKS AND UNREAD COUNTERS
+#
+# Read state lives on ChatMembership: messages above last_read_message_id
+# from other people are unread, and unread_count holds how many there are.
+# Message.save() and the write-behind batcher (chat/write_behind.py) bump the
+# other members' counts and the room's last_message pointer, Message.delete()
+# takes an unread message back off, and opening a room is one watermark
+# UPDATE (messages_read()). A message that lands at or below a member's
+# watermark (a write-behind id, or a slow commit) gets an UnreadMarker for
+# that member and counts on its own; the watermark — what they have read —
+# never moves back. Reading the room clears the markers.
+#
+# UnreadCounter keeps each user's total across rooms for the badges, read
+# through a cache; missing counters are created from the memberships, and
+# `manage.py reconcile_unread_counters` recounts memberships from Message and
+# counters from memberships.
+#
+# Notification counts come from reports/notifications.py, whose cached
+# watermark counter already avoids per-recipient writes; unread_counts()
+# returns both for the badges, /api/unread/ and {% unread_counts %}.
+
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+
+from chat.models import ChatMembership, ChatRoom, UnreadCounter, UnreadMarker
+
+UNREAD_TIMEOUT = 10 * 60
+
+
+def _key(user_id):
+    return f'unread:messages:{user_id}'
+
+
+def _forget(user_ids):
+    """Drop cached counts now and again at commit, so a read in between cannot re-cache the old value"""
+    keys = [_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def bump_unread(user_ids, delta):
+    """Add delta to existing counters; users without one are counted on their next read"""
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    UnreadCounter.objects.filter(user_id__in=user_ids).update(messages=Greatest(F('messages') + delta, 0))
+    _forget(user_ids)
+
+
+# ─────────────────────────────────────
+# WRITE SIDE
+# ─────────────────────────────────────
+def message_created(message):
+    messages_created([message])
+
+
+def messages_created(messages):
+    """
+    Account for new messages (one, or a bulk_create batch): point each room at
+    its newest one and count them for every member except their senders.
+    """
+    by_room = defaultdict(list)
+    for message in messages:
+        by_room[message.chat_room_id].append(message)
+
+    for room_id, room_messages in by_room.items():
+        latest = max(room_messages, key=lambda message: message.id)
+        # Never move the pointer back — batches may land out of id order
+        ChatRoom.objects.filter(Q(last_message__isnull=True) | Q(last_message_id__lt=latest.id), id=room_id).update(
+            last_message=latest, last_message_at=latest.timestamp,
+        )
+
+        # Unread for a member: sent by someone else, and above their watermark or
+        # below it because it landed late (a write-behind id, or a slow commit)
+        by_delta = defaultdict(list)
+        markers = []
+        members = ChatMembership.objects.filter(room_id=room_id).values_list('id', 'user_id', 'last_read_message_id')
+        for membership_id, user_id, read_up_to in members:
+            theirs = [message for message in room_messages if message.sender_id != user_id]
+            late = [message for message in theirs if message.id <= read_up_to]
+            markers.extend(UnreadMarker(membership_id=membership_id, message_id=message.id) for message in late)
+            if theirs:
+                by_delta[len(theirs)].append(user_id)
+        UnreadMarker.objects.bulk_create(markers, ignore_conflicts=True)
+        for delta, user_ids in by_delta.items():
+            ChatMembership.objects.filter(room_id=room_id, user_id__in=user_ids).update(
+                unread_count=F('unread_count') + delta,
+            )
+            bump_unread(user_ids, delta)
+
+
+def message_deleted(room_id, message_id, sender_id, marked=()):
+    """
+    Take a deleted message off the counts of members who had not read it yet —
+    above their watermark, or below it with an UnreadMarker (membership ids in `marked`)
+    """
+    members = ChatMembership.objects.filter(
+        Q(last_read_message_id__lt=message_id) | Q(id__in=marked), room_id=room_id,
+    ).exclude(user_id=sender_id)
+    user_ids = list(members.values_list('user_id', flat=True))
+    members.update(unread_count=Greatest(F('unread_count') - 1, 0))
+    bump_unread(user_ids, -1)
+    room = ChatRoom.objects.filter(id=room_id).first()
+    if room and room.last_message_id is None:
+        room.update_last_message()
+
+
+def messages_read(membership):
+    """
+    Mark everything up to the room's last message read — one watermark UPDATE,
+    plus clearing the membership's UnreadMarker rows.
+    `membership` must be loaded with its room (one query, so the count and the
+    last message agree). Returns how many messages were unread.
+    """
+    latest = membership.room.last_message_id or 0
+    unread = membership.unread_count
+    if latest <= membership.last_read_message_id and not unread:
+        return 0
+
+    with transaction.atomic():
+        UnreadMarker.objects.filter(membership_id=membership.pk).delete()
+        # Relative update: messages that arrived after `membership` was loaded stay counted
+        ChatMembership.objects.filter(pk=membership.pk).update(
+            last_read_message_id=Greatest(F('last_read_message_id'), latest),
+            unread_count=Greatest(F('unread_count') - unread, 0),
+        )
+        bump_unread([membership.user_id], -unread)
+    membership.last_read_message_id, membership.unread_count = latest, 0
+    return unread
+
+
+# ─────────────────────────────────────
+# READ SIDE
+# ─────────────────────────────────────
+def unread_messages(user_id):
+    """Cached counter; a cache miss is one primary-key read, a new user one SUM over memberships"""
+    key = _key(user_id)
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    count = UnreadCounter.objects.filter(user_id=user_id).values_list('messages', flat=True).first()
+    if count is None:
+        count = ChatMembership.objects.filter(user_id=user_id).aggregate(n=Sum('unread_count'))['n'] or 0
+        try:
+            with transaction.atomic():
+                UnreadCounter.objects.create(user_id=user_id, messages=count)
+        except IntegrityError:
+            pass  # created by a concurrent read
+    cache.set(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def unread_counts(user):
+    from reports.notifications import unread_count as unread_notifications
+
+    counts = {'messages': unread_messages(user.id), 'notifications': unread_notifications(user)}
+    counts['total'] = counts['messages'] + counts['notifications']
+    return counts
+
+
+# ─────────────────────────────────────
+# RECONCILIATION
+# ─────────────────────────────────────
+def _count_unread(memberships):
+    """{membership id: unread messages} straight from Message, plus UnreadMarker rows"""
+    counts = dict(memberships.annotate(
+        actual=Count('room__messages', filter=Q(room__messages__id__gt=F('last_read_message_id')) & ~Q(
+            room__messages__sender_id=F('user_id')
+        ))
+    ).values_list('id', 'actual'))
+    marked = UnreadMarker.objects.filter(membership__in=memberships).order_by().values('membership_id').annotate(
+        n=Count('id'),
+    ).values_list('membership_id', 'n')
+    for membership_id, n in marked:
+        counts[membership_id] += n
+    return counts
+
+
+def reconcile_unread_counters(repair=True, chunk_size=500):
+    """
+    Recount membership unread counts from Message, a chunk of rooms at a time,
+    then compare each UnreadCounter with its memberships. Returns
+    ({membership id: (stored, actual)}, {user_id: (stored, actual)}) and
+    repairs both if asked.
+    """
+    memberships_drifted = {}
+    room_ids = list(ChatRoom.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(room_ids), chunk_size):
+        memberships = ChatMembership.objects.filter(room_id__in=room_ids[start:start + chunk_size])
+        actual = _count_unread(memberships)
+        for membership_id, stored in memberships.values_list('id', 'unread_count'):
+            if stored != actual[membership_id]:
+                memberships_drifted[membership_id] = (stored, actual[membership_id])
+    if repair:
+        for membership_id, (_, actual) in memberships_drifted.items():
+            ChatMembership.objects.filter(id=membership_id).update(unread_count=actual)
+
+    counters_drifted = {}
+    totals = dict(
+        ChatMembership.objects.order_by().values('user_id').annotate(n=Sum('unread_count')).values_list('user_id', 'n')
+    )
+    for user_id, stored in UnreadCounter.objects.values_list('user_id', 'messages'):
+        if stored != totals.get(user_id, 0):
+            counters_drifted[user_id] = (stored, totals.get(user_id, 0))
+    if repair:
+        for user_id, (_, actual) in counters_drifted.items():
+            UnreadCounter.objects.filter(user_id=user_id).update(messages=actual)
+        _forget(counters_drifted)
+    return memberships_drifted, counters_drifted
@@ -4,7 +4,7 @@ from .views import(
     start_chat, 
     send_message, 
     chat_room,
-
+    room_history,
 )
 app_name = 'chat'
 
@@ -14,6 +14,7 @@ urlpatterns = [
     path('start/<int:user_id>/', start_chat, name='start_chat'),
     path('send/', send_message, name='send_message'),
     path('room/<int:room_id>/', chat_room, name='chat_room'),
+    path('room/<int:room_id>/history/', room_history, name='room_history'),
 
    
 ]
@@ -1,8 +1,13 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
 from users.models import CustomUser
 from .models import ChatRoom, Message
+from .history import PAGE_SIZE, cursor, history_page, message_json, page_size
+from .rooms import membership, other_participant, others_read_up_to, room_list
+from .presence import is_online
+from .unread import messages_read, unread_counts
 
 @login_required
 def chat_list(request):
@@ -10,32 +15,17 @@ def chat_list(request):
     user = request.user
     print(user.id)
     
-    # Get all chat rooms for this user
-    chat_rooms = ChatRoom.objects.filter(
-        participants=user
-    ).order_by('-last_message_at', '-created_at')
-
-    rooms_with_info = []
-    for room in chat_rooms:
-        # Other user for 1-on-1 chat
-        other_user = None
-        if not room.is_group:
-            other_user = room.participants.exclude(id=user.id).first()
-
-        # Last message
-        last_message = room.messages.select_related('sender').last()
-
-        # Unread count
-        unread_count = room.messages.filter(
-            is_read=False
-        ).exclude(sender=user).count()
-
-        rooms_with_info.append({
-            'room': room,
-            'other_user': other_user,
-            'last_message': last_message,
-            'unread_count': unread_count,
-        })
+    # All chat rooms for this user, from their memberships — a fixed number of queries
+    rooms_with_info = [
+        {
+            'room': item.room,
+            'other_user': item.other_user,  # for 1-on-1 chats
+            'online': item.other_online,
+            'last_message': item.room.last_message,
+            'unread_count': item.unread_count,
+        }
+        for item in room_list(user)
+    ]
 
     # Available users to start chat with
     available_users = CustomUser.objects.exclude(id=user.id)
@@ -89,12 +79,12 @@ def send_message(request):
         room = get_object_or_404(ChatRoom, id=room_id, participants=request.user)
 
         if content:
+            # Message.save() moves the room's last message and the unread counts
             Message.objects.create(
                 chat_room=room,
                 sender=request.user,
                 content=content
             )
-            room.update_last_message()
             messages.success(request, "Message sent!")
 
         # FIXED — use namespace
@@ -104,39 +94,57 @@ def send_message(request):
 
 @login_required
 def chat_room(request, room_id):
-    room = get_object_or_404(ChatRoom, id=room_id)
-
     # Access control
-    if request.user not in room.participants.all():
+    member = membership(room_id, request.user)
+    if member is None:
+        get_object_or_404(ChatRoom, id=room_id)
         messages.error(request, "Access denied.")
         return redirect('chat_list')
+    room = member.room
 
     # Other user for 1-on-1 chat
-    other_user = None
-    if not room.is_group:
-        other_user = room.participants.exclude(id=request.user.id).first()
+    other_user = other_participant(room, request.user)
 
-    # Messages
-    messages = room.messages.select_related('sender').order_by('timestamp')
+    # Latest page only — older pages load from room_history / the socket
+    messages, has_older = history_page(room.id)
 
-    # Mark messages as read
-    room.messages.filter(
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    # Mark messages as read — one watermark update
+    messages_read(member)
 
     context = {
         'room': room,
         'other_user': other_user,
+        'other_online': is_online(other_user),
         'messages': messages,
+        'has_older': has_older,
         'teacher_user': request.user,  # if needed in template
     }
 
     return render(request, 'chat/chat_room.html', context)
 
+
+@login_required
+def room_history(request, room_id):
+    """
+    GET ?before_id=<id> (older) or ?after_id=<id> (newer), optional &limit=
+    — one keyset page of the room's messages, oldest first.
+    """
+    if membership(room_id, request.user) is None:
+        return JsonResponse({'error': 'Not a member of this room'}, status=404)
+
+    messages, has_more = history_page(
+        room_id,
+        before_id=cursor(request.GET.get('before_id')),
+        after_id=cursor(request.GET.get('after_id')),
+        limit=page_size(request.GET.get('limit', PAGE_SIZE)),
+    )
+    return JsonResponse({'messages': [message_json(message) for message in messages], 'has_more': has_more})
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Max, Q
+from django.db.models import Q
+from django.http import Http404
 from django.urls import reverse
 
 from .models import ChatRoom, Message
@@ -149,43 +157,38 @@ from core.models import Student, Parent
 def chat_list_teacher(request):
     teacher_user = request.user  # Now uses logged-in teacher
 
-    # Get all chat rooms the teacher is in
-    chat_rooms = ChatRoom.objects.filter(
-        participants=teacher_user
-    ).annotate(
-        last_message_time=Max('messages__timestamp')
-    ).order_by('-last_message_time')
-
-    # Add unread count and other_user info to each room
-    for room in chat_rooms:
-        room.unread_count = room.messages.filter(
-            is_read=False
-        ).exclude(sender=teacher_user).count()
-        room.other_user = room.participants.exclude(id=teacher_user.id).first()
+    # Get all chat rooms the teacher is in, with unread count and other_user info
+    chat_rooms = []
+    for item in room_list(teacher_user):
+        item.room.unread_count = item.unread_count
+        item.room.other_user = item.other_user
+        item.room.online = item.other_online
+        chat_rooms.append(item.room)
 
     # Selected room and messages
     selected_room = None
     messages_list = []
     selected_other_user = None
+    selected_online = False
+    read_up_to = 0
+    has_older = False
+    before_id = None
     room_id = request.GET.get('room')
 
     if room_id:
-        selected_room = get_object_or_404(
-            ChatRoom,
-            id=room_id,
-            participants=teacher_user
-        )
-        messages_list = selected_room.messages.select_related(
-            'sender', 'sender__profile'
-        ).order_by('timestamp')
-        selected_other_user = selected_room.participants.exclude(
-            id=teacher_user.id
-        ).first()
-
-        # Mark incoming messages as read
-        selected_room.messages.filter(
-            is_read=False
-        ).exclude(sender=teacher_user).update(is_read=True)
+        member = membership(room_id, teacher_user) if room_id.isdigit() else None
+        if member is None:
+            raise Http404("No ChatRoom matches the given query.")
+        selected_room = member.room
+        # One page, newest by default; "Load older" links walk back by ?before_id=
+        before_id = cursor(request.GET.get('before_id'))
+        messages_list, has_older = history_page(selected_room.id, before_id=before_id)
+        selected_other_user = other_participant(selected_room, teacher_user)
+        selected_online = is_online(selected_other_user)
+        read_up_to = others_read_up_to(selected_room, teacher_user)
+
+        # Mark incoming messages as read — one watermark update
+        messages_read(member)
 
     # Handle search in "New Message" modal
     search_query = request.GET.get('search', '').strip()
@@ -223,6 +226,10 @@ def chat_list_teacher(request):
         'chat_rooms': chat_rooms,
         'selected_room': selected_room,
         'selected_other_user': selected_other_user,
+        'selected_online': selected_online,
+        'read_up_to': read_up_to,
+        'has_older': has_older,
+        'before_id': before_id,
         'messages': messages_list,
         'teacher_user': teacher_user,
         'search_query': search_query,
@@ -285,4 +292,10 @@ def start_chat_teacher(request, user_id):
         room = ChatRoom.objects.create(is_group=False)
         room.participants.add(request.user, other_user)
 
-    return redirect(f"{reverse('teacher_chat')}?room={room.id}")
\ No newline at end of file
+    return redirect(f"{reverse('teacher_chat')}?room={room.id}")
+
+
+@login_required
+def unread_api(request):
+    """Badge counts for the logged-in user — {'messages', 'notifications', 'total'}"""
+    return JsonResponse(unread_counts(request.user))
@@ -0,0 +1,249 @@
+# chat/write_behind.py — WRITE-BEHIND PERSISTENCE FOR SOCKET MESSAGES
+#
+# With CHAT_WRITE_BEHIND on, ChatConsumer does not insert each message before
+# broadcasting it. The message takes an id from a block the batcher reserves
+# from the table's own id sequence — the one every other insert uses — is
+# broadcast straight away, and is queued here; the process's batcher writes
+# the queue with one bulk_create (plus the unread bookkeeping, chat/unread.py)
+# every CHAT_WRITE_BEHIND_BATCH messages or CHAT_WRITE_BEHIND_INTERVAL_MS,
+# whichever comes first.
+#
+# A block holds one batch worth of ids and is reserved by the first message
+# of a batch, so a busy room costs one sequence round trip per flush, not per
+# message. Each flush drops what is left of the block (ids may have gaps), so
+# the next batch's ids are above every row inserted meanwhile: ids follow
+# send order across processes to within one flush interval.
+#
+# Only one process batches at a time: it holds a lease in the (shared) cache,
+# and other ASGI processes insert directly while it does. Run one ASGI
+# process per deployment with write-behind on; a second one still works, but
+# its sockets cannot see the first one's queue.
+#
+# Until its batch lands, a message is only in its sender's process: the room
+# socket replays queued messages on reconnect (queued()), and a member whose
+# read watermark passed a message before it landed gets it back as unread
+# (chat/unread.py). Its stored timestamp is the flush time.
+#
+# Whatever is still queued when the process exits is written by an atexit
+# hook. A batch that breaks a constraint (its room or sender deleted while
+# the socket was open) is saved row by row and the bad rows dropped; any
+# other failure is retried with the next flush, up to MAX_ATTEMPTS.
+
+import asyncio
+import atexit
+import logging
+import time
+import uuid
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from chat.models import Message
+from chat.unread import messages_created
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5  # flushes a message may fail before it is dropped
+LEASE_KEY = 'chat:write_behind:owner'
+LEASE_TTL = 30
+
+ORIGIN = uuid.uuid4().hex  # this process, as the lease holder
+
+
+def enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+def hold_lease():
+    """Take or renew the write-behind lease; False while another process holds it"""
+    if cache.add(LEASE_KEY, ORIGIN, LEASE_TTL):
+        return True
+    if cache.get(LEASE_KEY) == ORIGIN:
+        cache.touch(LEASE_KEY, LEASE_TTL)
+        return True
+    return False
+
+
+def reserve_message_ids(count):
+    """
+    `count` fresh Message ids from the table's own sequence, so they never clash
+    with rows inserted normally. PostgreSQL and SQLite (AUTOINCREMENT) only.
+    """
+    table = Message._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", [table, count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == 'sqlite':
+            with transaction.atomic():
+                cursor.execute("UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s RETURNING seq", [count, table])
+                row = cursor.fetchone()
+                if row is None:
+                    # No row is inserted yet: start after whatever the table holds
+                    cursor.execute(
+                        f'INSERT INTO sqlite_sequence (name, seq) SELECT %s, COALESCE(MAX(id), 0) + %s FROM "{table}"',
+                        [table, count],
+                    )
+                    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                    row = cursor.fetchone()
+            return list(range(row[0] - count + 1, row[0] + 1))
+    raise NotImplementedError(f"Write-behind ids are not supported on {connection.vendor}")
+
+
+def persist(messages):
+    """Insert a batch of id-assigned messages and do their unread bookkeeping — one transaction"""
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        messages_created(messages)
+
+
+def persist_rows(messages):
+    """
+    persist() for a batch that broke a constraint: one row at a time, logging
+    and dropping the rows that cannot be saved. Returns how many were saved.
+    """
+    saved = 0
+    for message in messages:
+        try:
+            persist([message])
+            saved += 1
+        except IntegrityError:
+            logger.warning(
+                "Dropping write-behind chat message %s (room %s, sender %s): it cannot be saved",
+                message.id, message.chat_room_id, message.sender_id, exc_info=True,
+            )
+    return saved
+
+
+def write(messages):
+    """persist(), falling back to persist_rows() when one bad row fails the batch"""
+    try:
+        persist(messages)
+        return len(messages)
+    except IntegrityError:
+        return persist_rows(messages)
+
+
+class MessageBatcher:
+    def __init__(self, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []
+        self._writing = []  # the batch being flushed
+        self._ids = deque()  # what is left of this batch's id block
+        self._timer = None
+        self._leased, self._lease_checked = False, float('-inf')
+        self._attempts = {}  # message id -> failed flushes
+        self.flushed = 0
+        self.dropped = 0
+
+    async def active(self):
+        """Whether this process may batch — it must hold the lease, renewed every third of LEASE_TTL"""
+        now = time.monotonic()
+        if now - self._lease_checked >= LEASE_TTL / 3:
+            leased = await sync_to_async(hold_lease)()
+            if self._leased and not leased:
+                logger.warning("Chat write-behind lease lost to another process; inserting messages directly")
+            self._leased, self._lease_checked = leased, now
+        return self._leased
+
+    async def add(self, room_id, sender, content):
+        """Queue a message and return it, id and timestamp set, ready to broadcast"""
+        if not self._ids:
+            # The first message of a batch reserves ids for the whole batch
+            self._ids.extend(await database_sync_to_async(reserve_message_ids)(self.batch_size))
+        message = Message(
+            id=self._ids.popleft(), chat_room_id=int(room_id), sender=sender,
+            content=content, timestamp=timezone.now(),
+        )
+        self.pending.append(message)
+
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+        return message
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        batch, self.pending = self.pending, []
+        self._ids.clear()  # the next batch starts above anything inserted until now
+        if not batch:
+            return
+        self._writing = batch
+        try:
+            saved = await database_sync_to_async(write)(batch)
+        except Exception:
+            logger.exception("Write-behind flush of %d chat messages failed; retrying", len(batch))
+            self._writing = []
+            self._requeue(batch)
+            if self.pending and (self._timer is None or self._timer.done()):
+                self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+            return
+        self._writing = []
+        self._done(batch, saved)
+
+    def queued(self, room_id):
+        """The room's messages not in the database yet — queued or being written"""
+        room_id = int(room_id)
+        return [message for message in self._writing + self.pending if message.chat_room_id == room_id]
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front of the queue, minus messages out of attempts"""
+        retry = []
+        for message in batch:
+            attempts = self._attempts.get(message.id, 0) + 1
+            if attempts < MAX_ATTEMPTS:
+                self._attempts[message.id] = attempts
+                retry.append(message)
+            else:
+                self._attempts.pop(message.id, None)
+                self.dropped += 1
+                logger.error(
+                    "Dropping write-behind chat message %s (room %s) after %d failed flushes",
+                    message.id, message.chat_room_id, attempts,
+                )
+        self.pending = retry + self.pending
+
+    def _done(self, batch, saved):
+        for message in batch:
+            self._attempts.pop(message.id, None)
+        self.flushed += saved
+        self.dropped += len(batch) - saved
+
+    def flush_now(self):
+        """Synchronous flush for process exit, when no event loop is left to run flush()"""
+        batch, self.pending = self.pending, []
+        self._ids.clear()
+        if batch:
+            self._done(batch, write(batch))
+
+
+_batcher = None
+
+
+def queued(room_id):
+    """The room's messages this process has broadcast but not stored yet"""
+    return _batcher.queued(room_id) if _batcher is not None else []
+
+
+def batcher():
+    """This process's batcher, created on first use"""
+    global _batcher
+    if _batcher is None:
+        _batcher = MessageBatcher(
+            batch_size=getattr(settings, 'CHAT_WRITE_BEHIND_BATCH', 100),
+            interval=getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL_MS', 200) / 1000,
+        )
+        atexit.register(_batcher.flush_now)
+    return _batcher
@@ -0,0 +1,142 @@
+# core/absence_counter.py — PER-STUDENT, PER-SUBJECT ABSENCE COUNTERS
+#
+# Penalty rules and "low attendance" lists read AbsenceCounter instead of
+# counting absent Attendance rows. Attendance.save()/delete() move the counter
+# by one on every status transition; bulk writers call
+# refresh_absence_counters() for the (student, subject) pairs they touched,
+# and `manage.py reconcile_absence_counters` compares the table with
+# Attendance and repairs drift.
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from core.models import AbsenceCounter, Attendance
+
+
+def bump_absences(student_id, subject_id, delta):
+    """Add delta to one counter, creating it if needed"""
+    if not delta:
+        return
+
+    counter = AbsenceCounter.objects.filter(student_id=student_id, subject_id=subject_id)
+    if counter.update(absences=F('absences') + delta):
+        return
+    if delta < 0:
+        return  # nothing to take away from — reconciliation will sort it out
+
+    try:
+        with transaction.atomic():
+            AbsenceCounter.objects.create(student_id=student_id, subject_id=subject_id, absences=delta)
+    except IntegrityError:
+        # Another writer created the counter first
+        counter.update(absences=F('absences') + delta)
+
+
+def apply_absence_change(old_key, new_key):
+    """
+    Account for one attendance row changing.
+    Keys are (student_id, subject_id, status) tuples, or None for "no row".
+    """
+    old_pair = old_key[:2] if old_key and old_key[2] == 'absent' else None
+    new_pair = new_key[:2] if new_key and new_key[2] == 'absent' else None
+    if old_pair == new_pair:
+        return
+    if old_pair:
+        bump_absences(*old_pair, delta=-1)
+    if new_pair:
+        bump_absences(*new_pair, delta=1)
+
+
+def _pairs_condition(pairs):
+    condition = Q()
+    for student_id, subject_id in pairs:
+        condition |= Q(student_id=student_id, subject_id=subject_id)
+    return condition
+
+
+def _count_absences(condition):
+    """{(student_id, subject_id): absences} straight from Attendance"""
+    rows = Attendance.objects.filter(condition, status='absent').order_by().values(
+        'student_id', 'subject_id'
+    ).annotate(n=Count('id')).values_list('student_id', 'subject_id', 'n')
+    return {(student_id, subject_id): n for student_id, subject_id, n in rows}
+
+
+def refresh_absence_counters(pairs):
+    """Recount the given (student_id, subject_id) pairs from Attendance (for bulk writers)"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    counts = _count_absences(_pairs_condition(pairs))
+    with transaction.atomic():
+        AbsenceCounter.objects.bulk_create(
+            [
+                AbsenceCounter(student_id=student_id, subject_id=subject_id, absences=counts.get((student_id, subject_id), 0))
+                for student_id, subject_id in pairs
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['student', 'subject'],
+            update_fields=['absences', 'updated_at'],
+        )
+
+
+def reconcile_absence_counters(repair=True, chunk_size=200):
+    """
+    Compare every counter with Attendance, a chunk of subjects at a time.
+    Returns the drifted {(student_id, subject_id): (stored, actual)} and repairs them if asked.
+    """
+    from core.models import Subject
+
+    drifted = {}
+    subject_ids = list(Subject.objects.order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(subject_ids), chunk_size):
+        chunk = subject_ids[start:start + chunk_size]
+        actual = _count_absences(Q(subject_id__in=chunk))
+        stored = {
+            (student_id, subject_id): absences
+            for student_id, subject_id, absences in AbsenceCounter.objects.filter(
+                subject_id__in=chunk
+            ).values_list('student_id', 'subject_id', 'absences')
+        }
+        for pair in actual.keys() | stored.keys():
+            have, want = stored.get(pair), actual.get(pair, 0)
+            if have != want and not (have is None and want == 0):
+                drifted[pair] = (have or 0, want)
+
+    if repair and drifted:
+        refresh_absence_counters(drifted.keys())
+    return drifted
+
+
+# ─────────────────────────────────────
+# READ SIDE — INDEXED LOOKUPS
+# ─────────────────────────────────────
+def absence_counts(subject_id, student_ids):
+    """{student_id: absences in the subject} — 0 for students without a counter"""
+    counts = dict.fromkeys(student_ids, 0)
+    counts.update(
+        AbsenceCounter.objects.filter(subject_id=subject_id, student_id__in=student_ids)
+        .values_list('student_id', 'absences')
+    )
+    return counts
+
+
+def absence_counts_for_pairs(pairs):
+    """{(student_id, subject_id): absences} for any set of pairs"""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    student_ids = {student_id for student_id, _ in pairs}
+    subject_ids = {subject_id for _, subject_id in pairs}
+    rows = AbsenceCounter.objects.filter(
+        student_id__in=student_ids, subject_id__in=subject_ids
+    ).values_list('student_id', 'subject_id', 'absences')
+    return {(student_id, subject_id): n for student_id, subject_id, n in rows if (student_id, subject_id) in pairs}
+
+
+def over_threshold(subject_ids, minimum):
+    """Counters with at least `minimum` absences in the given subjects — range scan on (subject, absences)"""
+    return AbsenceCounter.objects.filter(subject_id__in=subject_ids, absences__gte=minimum)
@@ -0,0 +1,170 @@
+# core/attendance_batch.py — ROSTER ATTENDANCE MARKING
+#
+# AttendanceBatch marks a whole roster for one subject and day: one read for
+# the rows that already exist, one bulk insert, one bulk update, then the
+# day's rollups and the touched absence counters are recomputed. Absence counts
+# and attendance penalty scores are worked out for the whole roster at once.
+# manual_attendance, mark_attendance and the QR scan view all go through it.
+#
+# The bulk writes skip Attendance.save(), so the roster is validated here
+# first: one lookup for the students, then each new row's own validation
+# without its foreign keys. A row another marking inserts between the read
+# and the insert is not an error: the insert is an upsert on (student,
+# subject, date), like ScoreBatchWriter's, and every inserted pair's absence
+# counter is recounted since the row it replaced is not known.
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from core.absence_counter import absence_counts, refresh_absence_counters
+from core.attendance_rollup import refresh_attendance_rollups
+from core.models import Attendance, Score, Student
+from core.score_summary import refresh_score_summaries
+
+STATUSES = dict(Attendance.STATUS_CHOICES)
+
+# Absences in a subject → the student's 'attendance' score for that subject
+PENALTY_SCORES = {0: Decimal('100.00'), 1: Decimal('95.00'), 2: Decimal('85.00')}
+PENALTY_FLOOR = Decimal('0.00')  # 3 absences or more
+
+
+def penalty_score(absences):
+    return PENALTY_SCORES.get(absences, PENALTY_FLOOR)
+
+
+class AttendanceBatch:
+    """
+    batch = AttendanceBatch(subject, marked_by=request.user)
+    batch.add(student_id, 'present')
+    batch.save()
+    batch.created / batch.updated / batch.skipped (student ids), batch.errors {student_id: message}
+
+    overwrite=False leaves rows that already exist for the day untouched (they end up in skipped).
+    """
+
+    def __init__(self, subject, date=None, marked_by=None, overwrite=True):
+        self.subject_id = getattr(subject, 'id', subject)
+        self.date = date or timezone.now().date()
+        self.marked_by = marked_by
+        self.overwrite = overwrite
+
+        self.statuses = {}  # student_id → status, last one wins
+        self.errors = {}
+        self.created = []
+        self.updated = []
+        self.skipped = []
+
+    def add(self, student, status):
+        student_id = getattr(student, 'id', student)
+        if status not in STATUSES:
+            self.errors[student_id] = f"Unknown status: {status}"
+        else:
+            self.statuses[student_id] = status
+
+    # ─────────────────────────────────────
+    # WRITE
+    # ─────────────────────────────────────
+    def save(self):
+        if self.date > timezone.now().date():
+            raise ValueError("Cannot mark attendance for future dates!")
+        self._drop_unknown_students()
+        if not self.statuses:
+            return self
+
+        with transaction.atomic():
+            existing = self._existing_rows()
+
+            new_rows, changed, absence_moved = [], [], set()
+            for student_id, status in self.statuses.items():
+                row = existing.get(student_id)
+                if row is None:
+                    row = Attendance(
+                        student_id=student_id, subject_id=self.subject_id, date=self.date,
+                        status=status, marked_by=self.marked_by,
+                    )
+                    try:
+                        row.full_clean(exclude=['student', 'subject', 'marked_by'], validate_unique=False)
+                    except ValidationError as error:
+                        self.errors[student_id] = '; '.join(error.messages)
+                        continue
+                    new_rows.append(row)
+                    absence_moved.add((student_id, self.subject_id))
+                elif not self.overwrite:
+                    self.skipped.append(student_id)
+                else:
+                    if 'absent' in (row.status, status) and row.status != status:
+                        absence_moved.add((student_id, self.subject_id))
+                    row.status = status
+                    row.marked_by = self.marked_by
+                    changed.append(row)
+
+            if self.overwrite:
+                conflicts = {'update_conflicts': True, 'update_fields': ['status', 'marked_by']}
+            else:
+                conflicts = {'ignore_conflicts': True}
+            Attendance.objects.bulk_create(
+                new_rows, batch_size=500, unique_fields=['student', 'subject', 'date'], **conflicts
+            )
+            Attendance.objects.bulk_update(changed, ['status', 'marked_by'], batch_size=500)
+            if new_rows or changed:
+                refresh_attendance_rollups([(self.date, self.subject_id)])
+            refresh_absence_counters(absence_moved)
+
+        self.created = [row.student_id for row in new_rows]
+        self.updated = [row.student_id for row in changed]
+        return self
+
+    def _drop_unknown_students(self):
+        known = set(Student.objects.filter(id__in=self.statuses).values_list('id', flat=True))
+        for student_id in [student_id for student_id in self.statuses if student_id not in known]:
+            del self.statuses[student_id]
+            self.errors[student_id] = "Unknown student"
+
+    def _existing_rows(self):
+        """{student_id: row} already marked for the day, locked until commit"""
+        return {
+            row.student_id: row
+            for row in Attendance.objects.select_for_update().filter(
+                subject_id=self.subject_id, date=self.date, student_id__in=self.statuses
+            )
+        }
+
+    # ─────────────────────────────────────
+    # ABSENCES + PENALTIES — set-wise
+    # ─────────────────────────────────────
+    def absence_counts(self, student_ids=None):
+        """{student_id: absences in this subject} for the roster, from the absence counters"""
+        student_ids = list(self.statuses) if student_ids is None else list(student_ids)
+        return absence_counts(self.subject_id, student_ids)
+
+    def apply_penalties(self, absences=None):
+        """
+        Set every marked student's 'attendance' score in this subject from their absence
+        count (see PENALTY_SCORES), as one upsert. Returns the absence counts used.
+        """
+        absences = self.absence_counts() if absences is None else absences
+        if not absences:
+            return absences
+
+        scores = []
+        for student_id, missed in absences.items():
+            score = Score(
+                student_id=student_id, subject_id=self.subject_id, exam_type='attendance',
+                score=penalty_score(missed), recorded_by=self.marked_by,
+            )
+            score.grade = score.calculate_grade()
+            scores.append(score)
+
+        with transaction.atomic():
+            Score.objects.bulk_create(
+                scores,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'exam_type'],
+                update_fields=['score', 'grade', 'recorded_by'],
+            )
+            refresh_score_summaries(absences.keys())
+        return absences
@@ -0,0 +1,169 @@
+# core/attendance_rollup.py — DAILY ATTENDANCE ROLLUPS
+#
+# Dashboards read DailyAttendanceRollup instead of counting Attendance rows.
+# Attendance.save()/delete() keep the rollups in step one row at a time;
+# bulk writers call refresh_attendance_rollups() for the (date, subject)
+# pairs they touched, and `manage.py rebuild_attendance_rollups` rebuilds
+# everything from scratch. Buckets count a row under the student's current
+# classroom, so Student.save() re-buckets a student who changes class
+# (student_moved()).
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from core.models import Attendance, DailyAttendanceRollup
+
+# Attendance.status → rollup counter column
+STATUS_FIELDS = {
+    'present': 'present_count',
+    'absent': 'absent_count',
+    'late': 'late_count',
+    'excused': 'excused_count',
+}
+
+
+def bump_rollup(date, classroom_id, subject_id, status, delta):
+    """Add delta to one status counter of a rollup bucket, creating the bucket if needed"""
+    field = STATUS_FIELDS.get(status)
+    if field is None or not delta:
+        return
+
+    bucket = DailyAttendanceRollup.objects.filter(date=date, classroom_id=classroom_id, subject_id=subject_id)
+    if bucket.update(**{field: F(field) + delta}):
+        return
+    if delta < 0:
+        return  # nothing to take away from — a rebuild will sort it out
+
+    try:
+        with transaction.atomic():
+            DailyAttendanceRollup.objects.create(
+                date=date, classroom_id=classroom_id, subject_id=subject_id, **{field: delta}
+            )
+    except IntegrityError:
+        # Another writer created the bucket first
+        bucket.update(**{field: F(field) + delta})
+
+
+def apply_attendance_change(old_key, new_key):
+    """
+    Move one attendance row between rollup buckets.
+    Keys are (date, classroom_id, subject_id, status) tuples, or None for "no row".
+    """
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        bump_rollup(*old_key, delta=-1)
+    if new_key is not None:
+        bump_rollup(*new_key, delta=1)
+
+
+def _count_attendance(queryset):
+    """Group Attendance rows into {(date, classroom_id, subject_id): {field: n}}"""
+    buckets = defaultdict(lambda: dict.fromkeys(STATUS_FIELDS.values(), 0))
+    rows = queryset.values('date', 'student__classroom_id', 'subject_id', 'status').annotate(n=Count('id'))
+    for row in rows:
+        field = STATUS_FIELDS.get(row['status'])
+        if field:
+            key = (row['date'], row['student__classroom_id'], row['subject_id'])
+            buckets[key][field] += row['n']
+    return buckets
+
+
+def _write_buckets(buckets):
+    DailyAttendanceRollup.objects.bulk_create(
+        [
+            DailyAttendanceRollup(date=date, classroom_id=classroom_id, subject_id=subject_id, **counts)
+            for (date, classroom_id, subject_id), counts in buckets.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def refresh_attendance_rollups(pairs):
+    """Recompute the rollups for the given (date, subject_id) pairs from Attendance (for bulk writers)"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    condition = Q()
+    for date, subject_id in pairs:
+        condition |= Q(date=date, subject_id=subject_id)
+
+    with transaction.atomic():
+        DailyAttendanceRollup.objects.filter(condition).delete()
+        _write_buckets(_count_attendance(Attendance.objects.filter(condition)))
+
+
+def student_moved(student_id, chunk_size=200):
+    """Recount every bucket the student's attendance is in, after their classroom changed"""
+    pairs = list(Attendance.objects.filter(student_id=student_id).order_by().values_list('date', 'subject_id').distinct())
+    for start in range(0, len(pairs), chunk_size):
+        refresh_attendance_rollups(pairs[start:start + chunk_size])
+
+
+def rebuild_attendance_rollups(start_date=None, end_date=None, chunk_days=31):
+    """Drop and rebuild rollups (optionally only for a date range), a month of attendance at a time"""
+    dates = Attendance.objects.all()
+    if start_date:
+        dates = dates.filter(date__gte=start_date)
+    if end_date:
+        dates = dates.filter(date__lte=end_date)
+    bounds = dates.aggregate(first=Min('date'), last=Max('date'))
+
+    with transaction.atomic():
+        stale = DailyAttendanceRollup.objects.all()
+        if start_date:
+            stale = stale.filter(date__gte=start_date)
+        if end_date:
+            stale = stale.filter(date__lte=end_date)
+        stale.delete()
+
+        written = 0
+        current = bounds['first']
+        while current and current <= bounds['last']:
+            chunk_end = min(current + timedelta(days=chunk_days - 1), bounds['last'])
+            buckets = _count_attendance(Attendance.objects.filter(date__range=(current, chunk_end)))
+            _write_buckets(buckets)
+            written += len(buckets)
+            current = chunk_end + timedelta(days=1)
+    return written
+
+
+# ─────────────────────────────────────
+# READ SIDE — ONE RANGE QUERY EACH
+# ─────────────────────────────────────
+def _rollups(start_date, end_date, subject_ids=None, classroom_ids=None):
+    rollups = DailyAttendanceRollup.objects.filter(date__range=(start_date, end_date))
+    if subject_ids is not None:
+        rollups = rollups.filter(subject_id__in=subject_ids)
+    if classroom_ids is not None:
+        rollups = rollups.filter(classroom_id__in=classroom_ids)
+    return rollups
+
+
+def daily_attendance(start_date, end_date, subject_ids=None, classroom_ids=None):
+    """{date: {'present': n, 'absent': n, 'late': n, 'excused': n}} for every day in the range"""
+    days = {}
+    current = start_date
+    while current <= end_date:
+        days[current] = dict.fromkeys(STATUS_FIELDS, 0)
+        current += timedelta(days=1)
+
+    totals = _rollups(start_date, end_date, subject_ids, classroom_ids).values('date').annotate(
+        **{status: Sum(field) for status, field in STATUS_FIELDS.items()}
+    )
+    for row in totals:
+        days[row['date']] = {status: row[status] or 0 for status in STATUS_FIELDS}
+    return days
+
+
+def attendance_totals(start_date, end_date, subject_ids=None, classroom_ids=None):
+    """{'present': n, 'absent': n, 'late': n, 'excused': n} summed over the range"""
+    totals = _rollups(start_date, end_date, subject_ids, classroom_ids).aggregate(
+        **{status: Sum(field) for status, field in STATUS_FIELDS.items()}
+    )
+    return {status: totals[status] or 0 for status in STATUS_FIELDS}
+
@@ -0,0 +1,280 @@
+# core/bulk_import.py — STUDENT BULK IMPORT PIPELINE
+#
+# The uploaded spreadsheet is stored as a file (never the session) and read
+# back a chunk of rows at a time. For each chunk, usernames and roll numbers
+# are checked with one query each, classrooms/sections come from maps loaded
+# once, the default password is hashed once for the whole import, and
+# CustomUser/Student rows are written with bulk_create in one transaction —
+# after their field validators, which bulk_create does not run.
+# The import itself runs as a 'core.bulk_import' job (core/tasks.py) on
+# another machine, so the upload goes to the shared 'files' storage
+# (settings.STORAGES) and is copied to a local temp file to be read.
+
+import csv
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files.storage import storages
+from django.db import transaction
+
+from core.models import ClassRoom, Section, Student
+from users.models import CustomUser
+
+CHUNK_SIZE = 1000
+DEFAULT_PASSWORD = "123456"
+UPLOAD_DIR = 'imports'  # in storages['files']
+MAX_REPORTED_ERRORS = 100
+
+# Spreadsheet header → row key ('First Name' and 'first_name' both become 'first_name')
+HEADER_ALIASES = {
+    'roll_no': 'roll_number',
+    'roll': 'roll_number',
+    'classroom': 'class',
+    'grade': 'class',
+}
+
+
+def _normalize_header(name):
+    key = str(name or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def _cell(row, key):
+    value = row.get(key)
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN from an empty spreadsheet cell
+            return ''
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+# ─────────────────────────────────────
+# UPLOAD STORAGE
+# ─────────────────────────────────────
+def upload_name(token):
+    """Storage name of an upload — the session only ever holds the token"""
+    storage = storages['files']
+    for extension in ('xlsx', 'csv'):
+        name = f'{UPLOAD_DIR}/{token}.{extension}'
+        if storage.exists(name):
+            return name
+    return None
+
+
+def save_upload(file):
+    """Store an UploadedFile in the shared file storage; returns its token"""
+    extension = 'xlsx' if file.name.lower().endswith('.xlsx') else 'csv'
+    token = uuid.uuid4().hex
+    storages['files'].save(f'{UPLOAD_DIR}/{token}.{extension}', file)
+    return token
+
+
+def discard_upload(token):
+    name = upload_name(token)
+    if name:
+        storages['files'].delete(name)
+
+
+@contextmanager
+def local_upload(token):
+    """A local path to read the upload from (None if it is gone) — a temp copy unless storage is on this disk"""
+    name = upload_name(token) if token else None
+    if name is None:
+        yield None
+        return
+    storage = storages['files']
+    try:
+        yield storage.path(name)
+        return
+    except NotImplementedError:
+        pass  # remote storage
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, os.path.basename(name))
+        with storage.open(name, 'rb') as source, open(path, 'wb') as out:
+            shutil.copyfileobj(source, out)
+        yield path
+
+
+def iter_rows(path):
+    """Yield (row_number, row) — row as a dict keyed by normalized header, numbered as in the sheet"""
+    if path.endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [_normalize_header(name) for name in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield number, dict(zip(headers, values))
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.reader(handle)
+            headers = [_normalize_header(name) for name in next(reader, [])]
+            for values in reader:
+                if any(value.strip() for value in values):
+                    yield reader.line_num, dict(zip(headers, values))
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield lists of up to chunk_size (row_number, row) pairs"""
+    chunk = []
+    for numbered in iter_rows(path):
+        chunk.append(numbered)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def preview(path, limit=20):
+    """(first `limit` rows, total row count) without keeping the whole sheet in memory"""
+    rows, total = [], 0
+    for _, row in iter_rows(path):
+        if total < limit:
+            rows.append({key: _cell(row, key) for key in row})
+        total += 1
+    return rows, total
+
+
+# ─────────────────────────────────────
+# IMPORTER
+# ─────────────────────────────────────
+def field_errors(model, values):
+    """Messages from the field validators (RegexValidator, max_length, email…) for the values a row sets"""
+    errors = []
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        try:
+            field.clean(value, None)
+        except ValidationError as e:
+            errors.append(f"{field.verbose_name}: {' '.join(e.messages)}")
+    return errors
+
+
+class StudentImporter:
+    """Import every row of an uploaded sheet; .imported and .errors hold the outcome"""
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, default_password=DEFAULT_PASSWORD, on_progress=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.default_password = default_password
+        self.on_progress = on_progress
+
+        self.processed = 0
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+
+    def _error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Row {number}: {message}")
+
+    def run(self):
+        # Hashed once — every imported account starts with the same default password
+        self.password_hash = make_password(self.default_password)
+        self.classrooms = {name.lower(): pk for pk, name in ClassRoom.objects.values_list('id', 'name')}
+        self.sections = {
+            (classroom_id, name.lower()): pk
+            for pk, classroom_id, name in Section.objects.values_list('id', 'classroom_id', 'name')
+        }
+        self.seen_usernames = set()
+        self.seen_rolls = set()
+
+        for rows in iter_chunks(self.path, self.chunk_size):
+            self._import_chunk(rows)
+            self.processed += len(rows)
+            if self.on_progress:
+                self.on_progress(self)
+        return self
+
+    def _import_chunk(self, rows):
+        usernames = {_cell(row, 'username') for _, row in rows} - {''}
+        rolls = {_cell(row, 'roll_number') for _, row in rows} - {''}
+        taken_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+        taken_rolls = set(Student.objects.filter(roll_number__in=rolls).values_list('roll_number', flat=True))
+
+        users, placements = [], []
+        for number, row in rows:
+            username = _cell(row, 'username')
+            roll = _cell(row, 'roll_number')
+            class_name = _cell(row, 'class')
+            section_name = _cell(row, 'section')
+
+            if not username:
+                self._error(number, "Username missing")
+                continue
+            if username in taken_usernames or username in self.seen_usernames:
+                self._error(number, f"Username {username} already exists")
+                continue
+            if not roll:
+                self._error(number, "Roll number missing")
+                continue
+            if roll in taken_rolls or roll in self.seen_rolls:
+                self._error(number, f"Roll number {roll} already exists")
+                continue
+            classroom_id = self.classrooms.get(class_name.lower())
+            if classroom_id is None:
+                self._error(number, f"Class '{class_name}' does not exist")
+                continue
+            section_id = self.sections.get((classroom_id, section_name.lower()))
+            if section_id is None:
+                self._error(number, f"Section '{section_name}' does not exist in {class_name}")
+                continue
+
+            fields = {
+                'username': username,
+                'first_name': _cell(row, 'first_name'),
+                'last_name': _cell(row, 'last_name'),
+                'email': _cell(row, 'email'),
+            }
+            # bulk_create skips validators — run them here, per row
+            errors = field_errors(CustomUser, fields) + field_errors(Student, {'roll_number': roll})
+            if errors:
+                self._error(number, '; '.join(errors))
+                continue
+
+            self.seen_usernames.add(username)
+            self.seen_rolls.add(roll)
+            users.append(CustomUser(
+                **fields,
+                role='student',
+                password=self.password_hash,
+                is_active=True,
+            ))
+            placements.append((roll, classroom_id, section_id))
+
+        if not users:
+            return
+
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users, batch_size=500)
+            if any(user.pk is None for user in users):
+                # Backends that cannot return ids from a bulk insert
+                ids = dict(CustomUser.objects.filter(
+                    username__in=[user.username for user in users]
+                ).values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+
+            Student.objects.bulk_create(
+                [
+                    Student(user_id=user.pk, roll_number=roll, classroom_id=classroom_id, section_id=section_id)
+                    for user, (roll, classroom_id, section_id) in zip(users, placements)
+                ],
+                batch_size=500,
+            )
+        self.imported += len(users)
+
@@ -0,0 +1,153 @@
+# core/file_cache.py — SIZE-CAPPED DISK CACHE FOR GENERATED FILES
+#
+# Bytes stored under MEDIA_ROOT/<name>/<key[:2]>/<key><suffix>, shared by every
+# process, with an optional in-process LRU in front. Writes are atomic (temp
+# file + rename) and the directory is kept under max_bytes by deleting the
+# least recently used files — mtime is refreshed on every disk hit. Keys are
+# expected to be content hashes or version stamps, so entries never go stale;
+# they only age out. A .tmp file younger than TMP_GRACE may be another
+# process's write in flight, so prune() leaves it alone; older ones were
+# abandoned by a crashed writer and are removed. Used by core/qr_cache.py and
+# reports/report_cards.py.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+PRUNE_EVERY = 200  # disk writes between size checks
+TMP_GRACE = 10 * 60  # seconds a .tmp file is presumed to be a write in progress
+
+
+class FileCache:
+    def __init__(self, name, max_bytes, suffix='', hot_items=0):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hot_items = hot_items
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._writes_since_prune = 0
+
+    @property
+    def directory(self):
+        return os.path.join(settings.MEDIA_ROOT, self.name)
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}{self.suffix}')
+
+    def count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def _remember(self, key, data):
+        if not self.hot_items:
+            return
+        with self._lock:
+            self._hot[key] = data
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.hot_items:
+                self._hot.popitem(last=False)
+
+    def get(self, key):
+        """Cached bytes or None; a miss is not counted — callers count it when they render"""
+        with self._lock:
+            data = self._hot.get(key)
+            if data is not None:
+                self._hot.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return data
+
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            os.utime(path)  # recently used — keeps it away from the LRU end
+        except FileNotFoundError:
+            return None
+        self.count('disk_hits')
+        self._remember(key, data)
+        return data
+
+    def set(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)  # atomic — readers never see half a file
+        self._remember(key, data)
+
+        with self._lock:
+            self._writes_since_prune += 1
+            due = self._writes_since_prune >= PRUNE_EVERY
+            if due:
+                self._writes_since_prune = 0
+        if due:
+            self.prune()
+
+    def clear_memory(self):
+        with self._lock:
+            self._hot.clear()
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield info.st_mtime, info.st_size, path
+
+    def prune(self, max_bytes=None):
+        """
+        Delete abandoned .tmp files, then least recently used files until the
+        directory fits in max_bytes; returns files removed. Recent .tmp files
+        are writes in progress and are neither counted nor touched.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        cutoff = time.time() - TMP_GRACE
+        files, abandoned = [], []
+        for mtime, size, path in self._files():
+            if not path.endswith('.tmp'):
+                files.append((mtime, size, path))
+            elif mtime < cutoff:
+                abandoned.append(path)
+        files.sort()
+        total = sum(size for _, size, _ in files)
+
+        removed = 0
+        for path in abandoned:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.count('evictions', removed)
+        return removed
+
+    def stats(self):
+        """This process's hit/miss counters plus the size of the shared disk layer"""
+        with self._lock:
+            stats = dict(self._stats, memory_items=len(self._hot))
+        files = list(self._files())
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats.update(
+            disk_files=len(files),
+            disk_bytes=sum(size for _, size, _ in files),
+            hit_rate=round((lookups - stats['misses']) / lookups * 100, 1) if lookups else 0.0,
+        )
+        return stats
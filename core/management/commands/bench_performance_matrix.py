@@ -0,0 +1,67 @@
+# core/management/commands/bench_performance_matrix.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.performance_matrix import DEFAULT_PAGE_SIZE, PerformanceMatrix
+
+TARGET_MS = 200
+SORTS = ['rank', 'name', 'subject:1']
+
+
+def synthetic_matrix_rows(students, subjects, coverage=0.9, seed=0):
+    """(students, subjects, cells) shaped like PerformanceMatrix.build() fetches them"""
+    rng = random.Random(seed)
+    student_rows = [
+        (i, f'First{i}', f'Last{i % 97}', f'student{i}', f'R-{i}', f'Grade {i % 12 + 1}')
+        for i in range(1, students + 1)
+    ]
+    subject_rows = [(j, f'Subject {j}') for j in range(1, subjects + 1)]
+    cells = [
+        (i, j, rng.uniform(30, 100))
+        for i in range(1, students + 1)
+        for j in range(1, subjects + 1)
+        if rng.random() < coverage
+    ]
+    return student_rows, subject_rows, cells
+
+
+class Command(BaseCommand):
+    help = "Time the performance matrix (pivot, stats, one sorted page) against the 5,000 × 15 target"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--subjects', type=int, default=15)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the median is reported")
+        parser.add_argument(
+            '--database', action='store_true',
+            help="Also time PerformanceMatrix.build() against the configured database, queries included",
+        )
+
+    def _median_ms(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        students, subjects, repeat = options['students'], options['subjects'], max(1, options['repeat'])
+        rows = synthetic_matrix_rows(students, subjects)
+        self.stdout.write(f"{students} students × {subjects} subjects, {len(rows[2])} cells, median of {repeat}")
+
+        def in_memory(sort):
+            return lambda: PerformanceMatrix(*rows).page(1, DEFAULT_PAGE_SIZE, sort)
+
+        results = [(f'in memory, sort={sort}', self._median_ms(in_memory(sort), repeat)) for sort in SORTS]
+        if options['database']:
+            matrix = PerformanceMatrix.build()
+            label = f'database ({len(matrix.student_ids)} × {len(matrix.subject_ids)}), sort=rank'
+            results.append((label, self._median_ms(lambda: PerformanceMatrix.build().page(), repeat)))
+
+        for label, elapsed in results:
+            style = self.style.SUCCESS if elapsed < TARGET_MS else self.style.ERROR
+            self.stdout.write(style(f"{label:<50} {elapsed:>8.1f} ms  (target {TARGET_MS} ms)"))
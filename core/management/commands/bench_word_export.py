@@ -0,0 +1,98 @@
+# core/management/commands/bench_word_export.py
+import datetime
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from docx import Document
+
+from core.attendance_export import STATUSES
+from core.attendance_word import write_detail_docx, write_summary_docx
+
+CLASSES = 12
+STUDENTS_PER_CLASS = 40
+SUBJECTS = ['Mathematics', 'English', 'Physics', 'Chemistry', 'Biology', 'History']
+
+
+def synthetic_rows(count):
+    """`count` attendance tuples shaped like attendance_export.ROW_FIELDS, in section order"""
+    recorded_at = datetime.datetime(2025, 1, 1, 8, 30, tzinfo=datetime.timezone.utc)
+    statuses = list(STATUSES)
+    rows = []
+    day = 0
+    while len(rows) < count:
+        date = datetime.date(2025, 1, 1) + datetime.timedelta(days=day)
+        for c in range(CLASSES):
+            for s in range(STUDENTS_PER_CLASS):
+                for subject in SUBJECTS:
+                    if len(rows) == count:
+                        break
+                    rows.append((
+                        len(rows) + 1, f'First{s}', f'Last{c}', f'R-{c}-{s}', f'Grade {c + 1}',
+                        subject, date, recorded_at, statuses[(s + day) % len(statuses)],
+                    ))
+        day += 1
+    rows.sort(key=lambda row: (row[4], -row[6].toordinal(), row[3], row[5], row[0]))
+    return rows
+
+
+def legacy_render(rows, output):
+    """The export before the engine: one table, a python-docx add_row() per record"""
+    doc = Document()
+    doc.add_heading('ELITE SCHOOL - ATTENDANCE REPORT', 0)
+    table = doc.add_table(rows=1, cols=8)
+    for cell, header in zip(table.rows[0].cells, ['ID', 'Name', 'Roll No', 'Class', 'Subject', 'Date', 'Time', 'Status']):
+        cell.text = header
+    for record_id, first_name, last_name, roll_number, classroom, subject, date, recorded_at, status in rows:
+        row_cells = table.add_row().cells
+        row_cells[0].text = str(record_id)
+        row_cells[1].text = f"{first_name} {last_name}"
+        row_cells[2].text = roll_number
+        row_cells[3].text = classroom
+        row_cells[4].text = subject
+        row_cells[5].text = date.strftime('%Y-%m-%d')
+        row_cells[6].text = recorded_at.strftime('%H:%M')
+        row_cells[7].text = STATUSES[status]
+    doc.save(output)
+
+
+def summarize(rows):
+    totals = {}
+    for _, first_name, last_name, roll_number, classroom, _, _, _, status in rows:
+        key = (classroom, roll_number, first_name, last_name)
+        totals.setdefault(key, dict.fromkeys(STATUSES, 0))[status] += 1
+    return [key + tuple(counts[status] for status in STATUSES) for key, counts in sorted(totals.items())]
+
+
+class Command(BaseCommand):
+    help = "Time the Word attendance export engine against the old row-by-row implementation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help="Row counts to benchmark")
+        parser.add_argument(
+            '--legacy-limit', type=int, default=None,
+            help="Skip the old implementation above this many rows (it takes minutes at 100k)",
+        )
+
+    def _time(self, render, *args):
+        output = io.BytesIO()
+        start = time.perf_counter()
+        render(*args, output)
+        return time.perf_counter() - start, output.tell()
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>8}  {'legacy':>10}  {'engine':>10}  {'summary':>10}  {'speedup':>8}  {'engine size':>12}")
+        for count in options['rows']:
+            rows = synthetic_rows(count)
+
+            engine, size = self._time(write_detail_docx, iter(rows))
+            summary, _ = self._time(write_summary_docx, summarize(rows))
+            if options['legacy_limit'] is None or count <= options['legacy_limit']:
+                legacy, _ = self._time(legacy_render, rows)
+                legacy_text, speedup = f"{legacy:.2f}s", f"{legacy / engine:.1f}x"
+            else:
+                legacy_text, speedup = 'skipped', '—'
+
+            self.stdout.write(
+                f"{count:>8}  {legacy_text:>10}  {engine:>9.2f}s  {summary:>9.2f}s  {speedup:>8}  {size / 1e6:>10.1f}MB"
+            )
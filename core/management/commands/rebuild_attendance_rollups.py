@@ -0,0 +1,24 @@
+# core/management/commands/rebuild_attendance_rollups.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.attendance_rollup import rebuild_attendance_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyAttendanceRollup from the Attendance table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First date to rebuild (YYYY-MM-DD). Default: all history")
+        parser.add_argument('--end', help="Last date to rebuild (YYYY-MM-DD). Default: all history")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        written = rebuild_attendance_rollups(start_date=start, end_date=end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} attendance rollup row(s)."))
@@ -0,0 +1,31 @@
+# core/management/commands/reconcile_absence_counters.py
+from django.core.management.base import BaseCommand
+
+from core.absence_counter import reconcile_absence_counters
+
+
+class Command(BaseCommand):
+    help = "Compare AbsenceCounter with the Attendance table and repair drifted counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not repair it")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Subjects checked per batch")
+
+    def handle(self, *args, **options):
+        drifted = reconcile_absence_counters(repair=not options['dry_run'], chunk_size=options['chunk_size'])
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All absence counters match the Attendance table."))
+            return
+
+        preview = ', '.join(
+            f"student {student_id}/subject {subject_id}: {stored} → {actual}"
+            for (student_id, subject_id), (stored, actual) in list(drifted.items())[:20]
+        )
+        more = f" (+{len(drifted) - 20} more)" if len(drifted) > 20 else ''
+        if options['dry_run']:
+            self.stdout.write(self.style.ERROR(
+                f"{len(drifted)} counter(s) out of sync: {preview}{more}. Run again without --dry-run to fix."
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(f"Repaired {len(drifted)} counter(s): {preview}{more}"))
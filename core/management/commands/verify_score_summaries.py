@@ -0,0 +1,28 @@
+# core/management/commands/verify_score_summaries.py
+from django.core.management.base import BaseCommand
+
+from core.score_summary import verify_score_summaries
+
+
+class Command(BaseCommand):
+    help = "Check StudentScoreSummary against the Score table and optionally repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Rebuild the summaries of drifted students")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Students checked per batch")
+
+    def handle(self, *args, **options):
+        drifted = verify_score_summaries(repair=options['repair'], chunk_size=options['chunk_size'])
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All score summaries match the Score table."))
+            return
+
+        preview = ', '.join(str(student_id) for student_id in drifted[:20])
+        more = f" (+{len(drifted) - 20} more)" if len(drifted) > 20 else ''
+        if options['repair']:
+            self.stdout.write(self.style.WARNING(f"Repaired {len(drifted)} student(s): {preview}{more}"))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"{len(drifted)} student(s) out of sync: {preview}{more}. Run again with --repair to fix."
+            ))
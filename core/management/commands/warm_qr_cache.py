@@ -0,0 +1,44 @@
+# core/management/commands/warm_qr_cache.py
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Student
+from core.qr_cache import prune_qr_cache, qr_cache_stats, qr_pngs
+from reports.id_cards import card_data
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Pre-render the QR codes of every ID card into the QR cache and print its counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Render processes (default: one per core)")
+        parser.add_argument('--prune', action='store_true', help="Trim the disk cache to its size cap afterwards")
+
+    def handle(self, *args, **options):
+        # The payloads each page encodes — see reports.views and student.views
+        payloads = {
+            'ID card PDFs': [card['qr'] for card in card_data(Student.objects.all())],
+            'staff ID cards': [
+                f"{user_id}|{role}"
+                for user_id, role in CustomUser.objects.filter(role__in=['student', 'teacher']).values_list('id', 'role')
+            ],
+            'student ID cards': [f"ID{student_id}" for student_id in Student.objects.values_list('id', flat=True)],
+        }
+
+        workers = options['workers'] or os.cpu_count() or 1
+        for label, items in payloads.items():
+            start = time.perf_counter()
+            qr_pngs(items, workers=workers)
+            self.stdout.write(f"  {label}: {len(items)} codes in {time.perf_counter() - start:.1f}s")
+
+        if options['prune']:
+            self.stdout.write(f"  pruned {prune_qr_cache()} files")
+
+        stats = qr_cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"QR cache: {stats['misses']} rendered, {stats['disk_hits']} already on disk, "
+            f"{stats['memory_hits']} from memory — {stats['disk_files']} files, {stats['disk_bytes'] / 1e6:.1f}MB"
+        ))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+STATUS_FIELDS = {
+    'present': 'present_count',
+    'absent': 'absent_count',
+    'late': 'late_count',
+    'excused': 'excused_count',
+}
+
+
+def populate_rollups(apps, schema_editor):
+    Attendance = apps.get_model('core', 'Attendance')
+    DailyAttendanceRollup = apps.get_model('core', 'DailyAttendanceRollup')
+
+    buckets = {}
+    rows = Attendance.objects.values('date', 'student__classroom_id', 'subject_id', 'status').annotate(n=Count('id'))
+    for row in rows.order_by():
+        field = STATUS_FIELDS.get(row['status'])
+        if field:
+            key = (row['date'], row['student__classroom_id'], row['subject_id'])
+            buckets.setdefault(key, dict.fromkeys(STATUS_FIELDS.values(), 0))[field] += row['n']
+
+    DailyAttendanceRollup.objects.bulk_create(
+        [
+            DailyAttendanceRollup(date=date, classroom_id=classroom_id, subject_id=subject_id, **counts)
+            for (date, classroom_id, subject_id), counts in buckets.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '000X_add_superuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('excused_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('classroom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='core.classroom')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='core.subject')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='core_dailya_date_0244e0_idx'), models.Index(fields=['classroom', 'date'], name='core_dailya_classro_be0ea8_idx'), models.Index(fields=['subject', 'date'], name='core_dailya_subject_221843_idx')],
+                'unique_together': {('date', 'classroom', 'subject')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
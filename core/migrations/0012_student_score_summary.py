@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_summaries(apps, schema_editor):
+    Score = apps.get_model('core', 'Score')
+    Student = apps.get_model('core', 'Student')
+    StudentScoreSummary = apps.get_model('core', 'StudentScoreSummary')
+
+    classrooms = dict(Student.objects.values_list('id', 'classroom_id'))
+    summaries = {}
+    rows = Score.objects.order_by('recorded_at', 'id').values_list('student_id', 'subject_id', 'score', 'recorded_at')
+    for student_id, subject_id, score, recorded_at in rows.iterator(chunk_size=2000):
+        for key in ((student_id, subject_id), (student_id, None)):
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = StudentScoreSummary(
+                    student_id=student_id,
+                    classroom_id=classrooms.get(student_id),
+                    subject_id=key[1],
+                    score_count=0,
+                    score_sum=Decimal('0.00'),
+                )
+            summary.score_count += 1
+            summary.score_sum += score
+            summary.latest_score = score
+            summary.latest_recorded_at = recorded_at
+
+    for summary in summaries.values():
+        summary.average = round(float(summary.score_sum) / summary.score_count, 2)
+    StudentScoreSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_daily_attendance_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('average', models.FloatField(default=0)),
+                ('latest_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('latest_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('classroom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='score_summaries', to='core.classroom')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='core.student')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='core.subject')),
+            ],
+            options={
+                'verbose_name': 'Student Score Summary',
+                'verbose_name_plural': 'Student Score Summaries',
+                'indexes': [models.Index(fields=['subject', 'average'], name='core_studen_subject_2b971f_idx'), models.Index(fields=['classroom', 'subject', 'average'], name='core_studen_classro_a4ee01_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'subject'), name='unique_student_subject_summary'), models.UniqueConstraint(condition=models.Q(('subject__isnull', True)), fields=('student',), name='unique_student_overall_summary')],
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
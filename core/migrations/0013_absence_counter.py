@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Attendance = apps.get_model('core', 'Attendance')
+    AbsenceCounter = apps.get_model('core', 'AbsenceCounter')
+
+    rows = Attendance.objects.filter(status='absent').order_by().values(
+        'student_id', 'subject_id'
+    ).annotate(n=Count('id'))
+    AbsenceCounter.objects.bulk_create(
+        [
+            AbsenceCounter(student_id=row['student_id'], subject_id=row['subject_id'], absences=row['n'])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_student_score_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('absences', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='absence_counters', to='core.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='absence_counters', to='core.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', 'absences'], name='core_absenc_subject_4b89fe_idx')],
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:33
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def populate_scores_updated_at(apps, schema_editor):
+    Score = apps.get_model('core', 'Score')
+    Student = apps.get_model('core', 'Student')
+
+    latest = Score.objects.filter(student=OuterRef('pk')).order_by().values('student').annotate(
+        latest=Max('recorded_at')
+    ).values('latest')
+    Student.objects.update(scores_updated_at=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_absence_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='score_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='scores_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_scores_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 # core/models.py — FINAL 100% WORKING VERSION — 2025 ELITE
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.conf import settings
 from django.core.validators import RegexValidator
@@ -82,12 +82,37 @@ class Student(models.Model):
     blood_group = models.CharField(max_length=5, blank=True)
     emergency_contact = models.CharField(max_length=15, blank=True)
 
+    # Bumped by refresh_score_summaries() on every Score write for this student
+    # (an F() update); report-card caches and ETags are keyed on it. save()
+    # never writes them back, so a stale instance cannot roll the version back.
+    score_version = models.PositiveIntegerField(default=0, editable=False)
+    scores_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    SCORE_STATE_FIELDS = ('score_version', 'scores_updated_at')
+
     class Meta:
         ordering = ['classroom__name', 'section__name', 'roll_number']
 
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.roll_number})"
 
+    def save(self, *args, **kwargs):
+        from core.attendance_rollup import student_moved
+
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SCORE_STATE_FIELDS
+            ]
+        with transaction.atomic():
+            stored = None  # (classroom_id,) of the row as stored
+            if not self._state.adding:
+                stored = Student.objects.select_for_update().filter(pk=self.pk).values_list('classroom_id').first()
+            super().save(*args, **kwargs)
+            # Keep the denormalized classroom on score summaries and rollups in step with promotions/moves
+            self.score_summaries.exclude(classroom_id=self.classroom_id).update(classroom_id=self.classroom_id)
+            if stored is not None and stored[0] != self.classroom_id:
+                student_moved(self.pk)
+
 
 # ─────────────────────────────────────
 # TEACHER
@@ -179,8 +204,38 @@ class Attendance(models.Model):
             raise ValidationError("Cannot mark attendance for future dates!")
 
     def save(self, *args, **kwargs):
+        from core.absence_counter import apply_absence_change
+        from core.attendance_rollup import apply_attendance_change
+
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Locked until commit, so a concurrent save cannot move the counters from the same old row
+            previous = self._stored_keys() if self.pk else None
+            super().save(*args, **kwargs)
+            apply_attendance_change(previous and previous[0], self.rollup_key())
+            apply_absence_change(previous and previous[1], self.absence_key())
+
+    def delete(self, *args, **kwargs):
+        from core.absence_counter import apply_absence_change
+        from core.attendance_rollup import apply_attendance_change
+
+        with transaction.atomic():
+            stored = self._stored_keys()
+            result = super().delete(*args, **kwargs)
+            if stored:
+                apply_attendance_change(stored[0], None)
+                apply_absence_change(stored[1], None)
+        return result
+
+    def _stored_keys(self):
+        """(rollup_key, absence_key) of the row as stored, locking it — None if it is not there"""
+        row = Attendance.objects.select_for_update(of=('self',)).filter(pk=self.pk).values_list(
+            'date', 'student__classroom_id', 'subject_id', 'status', 'student_id'
+        ).first()
+        if row is None:
+            return None
+        date, classroom_id, subject_id, status, student_id = row
+        return (date, classroom_id, subject_id, status), (student_id, subject_id, status)
 
     def __str__(self):
         return f"{self.student} - {self.subject} - {self.get_status_display()} ({self.date})"
@@ -189,6 +244,71 @@ class Attendance(models.Model):
     def is_absent(self):
         return self.status == 'absent'
 
+    def rollup_key(self):
+        """(date, classroom_id, subject_id, status) — the rollup bucket this row counts towards"""
+        return (self.date, self.student.classroom_id, self.subject_id, self.status)
+
+    def absence_key(self):
+        """(student_id, subject_id, status) — what this row means for the absence counters"""
+        return (self.student_id, self.subject_id, self.status)
+
+
+# ─────────────────────────────────────
+# DAILY ATTENDANCE ROLLUP — FOR DASHBOARDS
+# ─────────────────────────────────────
+class DailyAttendanceRollup(models.Model):
+    """Per day / classroom / subject attendance counts, kept in step with Attendance writes"""
+    date = models.DateField()
+    classroom = models.ForeignKey(
+        ClassRoom,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='attendance_rollups'
+    )
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='attendance_rollups')
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    excused_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('date', 'classroom', 'subject')
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['classroom', 'date']),
+            models.Index(fields=['subject', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.subject} (P{self.present_count} / A{self.absent_count})"
+
+    @property
+    def total(self):
+        return self.present_count + self.absent_count + self.late_count + self.excused_count
+
+
+# ─────────────────────────────────────
+# ABSENCE COUNTER — FOR PENALTIES & LOW ATTENDANCE
+# ─────────────────────────────────────
+class AbsenceCounter(models.Model):
+    """Absent Attendance rows per student and subject, kept in step with Attendance writes"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='absence_counters')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='absence_counters')
+    absences = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'subject')
+        indexes = [
+            models.Index(fields=['subject', 'absences']),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id}: {self.absences} absence(s)"
+
 
 from django.db import models
 from django.core.exceptions import ValidationError
@@ -284,9 +404,27 @@ class Score(models.Model):
             return 'F'
 
     def save(self, *args, **kwargs):
+        from core.score_summary import apply_score_change, lock_students, stored_score
+
         self.full_clean()  # Ensures validation runs
         self.grade = self.calculate_grade()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            lock_students([self.student_id])
+            previous = stored_score(self.pk) if self.pk else None
+            if previous and previous[0] != self.student_id:
+                lock_students([previous[0]])  # moved to another student
+            super().save(*args, **kwargs)
+            apply_score_change(previous, stored_score(self.pk))
+
+    def delete(self, *args, **kwargs):
+        from core.score_summary import apply_score_change, lock_students, stored_score
+
+        with transaction.atomic():
+            lock_students([self.student_id])
+            previous = stored_score(self.pk)
+            result = super().delete(*args, **kwargs)
+            apply_score_change(previous, None)
+        return result
 
     def __str__(self):
         return f"{self.student} - {self.subject.name} ({self.get_exam_type_display()}): {self.score} → {self.grade}"
@@ -294,6 +432,56 @@ class Score(models.Model):
     @property
     def is_passing(self):
         return self.grade not in ['F', '']
+
+
+# ─────────────────────────────────────
+# STUDENT SCORE SUMMARY — DENORMALIZED FOR DASHBOARDS
+# ─────────────────────────────────────
+class StudentScoreSummary(models.Model):
+    """
+    Score totals per student, kept in step with Score writes.
+    One overall row per student (subject is NULL) plus one row per subject.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='score_summaries')
+    classroom = models.ForeignKey(
+        ClassRoom,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='score_summaries'
+    )  # copy of student.classroom so class ranks stay on this table
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='score_summaries'
+    )
+    score_count = models.PositiveIntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    average = models.FloatField(default=0)
+    latest_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_recorded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject'], name='unique_student_subject_summary'),
+            models.UniqueConstraint(
+                fields=['student'],
+                condition=models.Q(subject__isnull=True),
+                name='unique_student_overall_summary'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['subject', 'average']),
+            models.Index(fields=['classroom', 'subject', 'average']),
+        ]
+        verbose_name = 'Student Score Summary'
+        verbose_name_plural = 'Student Score Summaries'
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id or 'Overall'}: {self.average:.1f} ({self.score_count})"
     # ─────────────────────────────────────
 # QR SESSION — FOR QR ATTENDANCE
 # ─────────────────────────────────────
@@ -0,0 +1,200 @@
+# core/performance_matrix.py — STUDENT × SUBJECT PERFORMANCE MATRIX
+#
+# Pulls (student_id, subject_id, average score) as flat rows straight from the
+# database cursor and pivots them into a NumPy matrix, so totals, averages,
+# ranks and per-subject z-scores are computed in vectorized form for the whole
+# school at once. performance_dashboard renders the first page and
+# performance_matrix_api serves every page, sorted however the table asks.
+
+import math
+
+import numpy as np
+from django.db import connection
+from django.db.models import Avg, FloatField, Q
+
+from core.models import Score, Student, Subject
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _fetch(queryset):
+    """Run a values_list/values queryset on the raw cursor — no per-row model/dict overhead"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _competition_rank(values):
+    """1224-style ranking, highest value first"""
+    ordered = np.sort(values)[::-1]
+    return np.searchsorted(-ordered, -values, side='left') + 1
+
+
+class PerformanceMatrix:
+    """
+    Scores pivoted to one row per student and one column per subject.
+    A cell is the student's mean score in that subject across exam types (NaN if none).
+    """
+
+    def __init__(self, students, subjects, cells):
+        # students: [(id, first_name, last_name, username, roll_number, classroom_name)]
+        # subjects: [(id, name)]
+        # cells:    [(student_id, subject_id, avg_score)]
+        self.subjects = subjects
+        self.student_ids = np.array([s[0] for s in students], dtype=np.int64)
+        self.names = [f"{s[1] or ''} {s[2] or ''}".strip() or s[3] for s in students]
+        self.roll_numbers = [s[4] or '-' for s in students]
+        self.classrooms = [s[5] or 'N/A' for s in students]
+        self.subject_ids = np.array([s[0] for s in subjects], dtype=np.int64)
+
+        self.scores = np.full((len(self.student_ids), len(self.subject_ids)), np.nan)
+        if cells and len(self.student_ids) and len(self.subject_ids):
+            data = np.asarray(cells, dtype=np.float64)
+            rows = self._positions(self.student_ids, data[:, 0])
+            cols = self._positions(self.subject_ids, data[:, 1])
+            keep = (rows >= 0) & (cols >= 0)
+            self.scores[rows[keep], cols[keep]] = data[keep, 2]
+
+        self._compute()
+
+    @staticmethod
+    def _positions(ids, values):
+        """Index of each value in ids (sorted lookup), -1 where missing"""
+        order = np.argsort(ids)
+        found = np.searchsorted(ids, values, sorter=order)
+        found = np.clip(found, 0, max(len(ids) - 1, 0))
+        positions = order[found] if len(ids) else np.zeros(len(values), dtype=np.int64)
+        return np.where(ids[positions] == values.astype(np.int64), positions, -1)
+
+    def _compute(self):
+        scored = ~np.isnan(self.scores)
+        self.counts = scored.sum(axis=1)
+        self.totals = np.where(scored, self.scores, 0.0).sum(axis=1)
+        self.averages = np.divide(
+            self.totals, self.counts, out=np.zeros_like(self.totals), where=self.counts > 0
+        )
+        self.ranks = _competition_rank(self.averages)
+
+        subject_counts = scored.sum(axis=0)
+        subject_totals = np.where(scored, self.scores, 0.0).sum(axis=0)
+        self.subject_means = np.divide(
+            subject_totals, subject_counts, out=np.zeros_like(subject_totals), where=subject_counts > 0
+        )
+        deviations = np.where(scored, self.scores - self.subject_means, 0.0)
+        variance = np.divide(
+            (deviations ** 2).sum(axis=0), subject_counts,
+            out=np.zeros_like(subject_totals), where=subject_counts > 0
+        )
+        self.subject_stds = np.sqrt(variance)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = deviations / self.subject_stds
+        self.z_scores = np.where(scored & (self.subject_stds > 0), z_scores, np.where(scored, 0.0, np.nan))
+
+    # ─────────────────────────────────────
+    # BUILD
+    # ─────────────────────────────────────
+    @classmethod
+    def build(cls, classroom=None):
+        students = Student.objects.order_by('id')
+        scores = Score.objects.order_by()
+        subjects = Subject.objects.order_by('name', 'id')
+        if classroom is not None:
+            students = students.filter(classroom=classroom)
+            scores = scores.filter(student__classroom=classroom)
+            subjects = subjects.filter(Q(classroom=classroom) | Q(scores__student__classroom=classroom)).distinct()
+
+        cells = scores.values('student_id', 'subject_id').annotate(
+            avg=Avg('score', output_field=FloatField())
+        ).values_list('student_id', 'subject_id', 'avg')
+
+        return cls(
+            students=_fetch(students.values_list(
+                'id', 'user__first_name', 'user__last_name', 'user__username', 'roll_number', 'classroom__name'
+            )),
+            subjects=list(subjects.values_list('id', 'name')),
+            cells=_fetch(cells),
+        )
+
+    # ─────────────────────────────────────
+    # SORT + PAGE
+    # ─────────────────────────────────────
+    SORT_KEYS = ('rank', 'average', 'total', 'name', 'roll_number', 'classroom')
+
+    def order(self, sort='rank', descending=None):
+        """Row positions in display order. sort is a SORT_KEYS entry or 'subject:<id>'"""
+        if sort.startswith('subject:'):
+            try:
+                column = int(np.flatnonzero(self.subject_ids == int(sort.split(':', 1)[1]))[0])
+            except (ValueError, IndexError):
+                column = None
+            if column is not None:
+                values = self.scores[:, column]
+                descending = True if descending is None else descending
+                # NaNs always last
+                key = np.where(np.isnan(values), -np.inf if descending else np.inf, values)
+                return np.argsort(-key if descending else key, kind='stable')
+            sort = 'rank'
+
+        if sort in ('name', 'roll_number', 'classroom'):
+            labels = {'name': self.names, 'roll_number': self.roll_numbers, 'classroom': self.classrooms}[sort]
+            order = np.array(sorted(range(len(labels)), key=lambda i: (labels[i].lower(), i)), dtype=np.int64)
+            return order[::-1] if descending else order
+
+        if sort == 'total':
+            values = self.totals
+        else:
+            values = self.averages  # rank / average
+        descending = True if descending is None else descending
+        return np.argsort(-values if descending else values, kind='stable')
+
+    def row(self, i):
+        def clean(value):
+            return None if math.isnan(value) else round(float(value), 2)
+
+        return {
+            'id': int(self.student_ids[i]),
+            'name': self.names[i],
+            'roll_number': self.roll_numbers[i],
+            'classroom': self.classrooms[i],
+            'rank': int(self.ranks[i]),
+            'total': round(float(self.totals[i]), 1),
+            'average': round(float(self.averages[i]), 1),
+            'scores': {
+                str(subject_id): clean(self.scores[i, j])
+                for j, subject_id in enumerate(self.subject_ids.tolist())
+                if not math.isnan(self.scores[i, j])
+            },
+            'z_scores': {
+                str(subject_id): clean(self.z_scores[i, j])
+                for j, subject_id in enumerate(self.subject_ids.tolist())
+                if not math.isnan(self.z_scores[i, j])
+            },
+        }
+
+    def page(self, number=1, page_size=DEFAULT_PAGE_SIZE, sort='rank', descending=None):
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        count = len(self.student_ids)
+        num_pages = max(1, math.ceil(count / page_size))
+        number = max(1, min(int(number), num_pages))
+
+        order = self.order(sort, descending)
+        start = (number - 1) * page_size
+        return {
+            'count': count,
+            'page': number,
+            'page_size': page_size,
+            'num_pages': num_pages,
+            'sort': sort,
+            'subjects': [
+                {
+                    'id': subject_id,
+                    'name': name,
+                    'mean': round(float(self.subject_means[j]), 2),
+                    'std': round(float(self.subject_stds[j]), 2),
+                }
+                for j, (subject_id, name) in enumerate(self.subjects)
+            ],
+            'results': [self.row(i) for i in order[start:start + page_size].tolist()],
+        }
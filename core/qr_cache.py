@@ -0,0 +1,122 @@
+# core/qr_cache.py — CONTENT-ADDRESSED QR CODE CACHE
+#
+# A QR image depends only on its payload and render options, so it is stored
+# under sha256(payload + options): in a small in-process LRU first, then as a
+# PNG under MEDIA_ROOT/qr-cache/ shared by every process (core/file_cache.py),
+# capped at QR_CACHE_MAX_BYTES with least-recently-used eviction. ID cards,
+# the student ID card page and QR attendance sessions all read through
+# qr_png()/qr_base64();
+# `manage.py warm_qr_cache` pre-renders the ID card payloads.
+#
+# render_qr_png() and _render_chunk() touch neither the ORM nor settings, so
+# they are safe to run on a process pool.
+
+import base64
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+
+from core.file_cache import FileCache
+
+QR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+HOT_ITEMS = 512  # PNGs kept in memory per process
+RENDER_CHUNK = 50  # payloads per pool task
+KEY_VERSION = 1  # bump when render_qr_png's output changes
+
+DEFAULT_OPTIONS = {'box_size': 10, 'border': 4, 'mode': 'L', 'error_correction': 'M'}
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+cache = FileCache('qr-cache', QR_CACHE_MAX_BYTES, suffix='.png', hot_items=HOT_ITEMS)
+
+
+def render_qr_png(data, box_size=10, border=4, mode='L', error_correction='M'):
+    """Encode `data` as a QR PNG — no caching"""
+    qr = qrcode.QRCode(
+        version=1, box_size=box_size, border=border, error_correction=ERROR_CORRECTION[error_correction],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    # Grayscale: smaller than RGB and cheap for reportlab to decode when drawn on a card
+    qr.make_image(fill_color="black", back_color="white").convert(mode).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _options(options):
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise TypeError(f"Unknown QR option(s): {', '.join(sorted(unknown))}")
+    return {**DEFAULT_OPTIONS, **options}
+
+
+def qr_key(data, **options):
+    raw = json.dumps([KEY_VERSION, data, _options(options)], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ─────────────────────────────────────
+# PUBLIC API
+# ─────────────────────────────────────
+def qr_png(data, **options):
+    """PNG bytes for `data`, rendered at most once per payload + options"""
+    key = qr_key(data, **options)
+    png = cache.get(key)
+    if png is None:
+        cache.count('misses')
+        png = render_qr_png(data, **_options(options))
+        cache.set(key, png)
+    return png
+
+
+def qr_base64(data, **options):
+    """For <img src="data:image/png;base64,…">"""
+    return base64.b64encode(qr_png(data, **options)).decode()
+
+
+def _render_chunk(job):
+    payloads, options = job
+    return [render_qr_png(data, **options) for data in payloads]
+
+
+def qr_pngs(payloads, workers=1, **options):
+    """
+    PNGs for many payloads, in order. Cache misses are rendered in chunks on a
+    process pool when workers > 1, then stored.
+    """
+    options = _options(options)
+    keys = [qr_key(data, **options) for data in payloads]
+    pngs = [cache.get(key) for key in keys]
+    missing = [i for i, png in enumerate(pngs) if png is None]
+    if not missing:
+        return pngs
+    cache.count('misses', len(missing))
+
+    chunks = [missing[start:start + RENDER_CHUNK] for start in range(0, len(missing), RENDER_CHUNK)]
+    jobs = [([payloads[i] for i in chunk], options) for chunk in chunks]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_render_chunk, jobs))
+    else:
+        results = map(_render_chunk, jobs)
+
+    for chunk, rendered in zip(chunks, results):
+        for i, png in zip(chunk, rendered):
+            cache.set(keys[i], png)
+            pngs[i] = png
+    return pngs
+
+
+def qr_cache_stats():
+    return cache.stats()
+
+
+def prune_qr_cache(max_bytes=None):
+    return cache.prune(max_bytes)
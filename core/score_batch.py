@@ -0,0 +1,171 @@
+# core/score_batch.py — BULK SCORE ENTRY
+#
+# ScoreBatchWriter takes a whole score grid (students × subjects for one exam
+# type), validates every cell in memory against three lookups (students,
+# subjects, absence counters), computes grades, and upserts the lot with one
+# bulk_create(update_conflicts=True) on (student, subject, exam_type) inside a
+# single transaction. Bad cells are reported back instead of being dropped.
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core.absence_counter import absence_counts_for_pairs
+from core.models import Score, Student, Subject
+from core.score_summary import refresh_score_summaries
+
+# Absences in a subject at which a submitted score is replaced by 0.00
+ABSENCE_LIMIT = 3
+
+
+class ScoreBatchWriter:
+    """
+    writer = ScoreBatchWriter(classroom, 'midterm', request.user)
+    writer.add(student_id, subject_id, '87.5', cell='score_12_3')
+    writer.save()
+    writer.saved, writer.errors {cell: message}, writer.zeroed [(student, subject, absences)]
+
+    Pass subjects=[...] to restrict the grid to some subjects of the classroom, and
+    absence_limit=None to store scores as submitted regardless of absences.
+    """
+
+    def __init__(self, classroom, exam_type, recorded_by, subjects=None, absence_limit=ABSENCE_LIMIT):
+        # bulk_create skips full_clean(), so the exam type is checked here
+        if exam_type not in dict(Score.EXAM_TYPES):
+            raise ValueError(f"Unknown exam type: {exam_type}")
+        self.classroom = classroom
+        self.exam_type = exam_type
+        self.recorded_by = recorded_by
+        self.subject_ids = None if subjects is None else {getattr(s, 'id', s) for s in subjects}
+        self.absence_limit = absence_limit
+
+        self.cells = []  # (cell, student_id, subject_id, raw value)
+        self.errors = {}
+        self._cell_ids = {}
+        self._students = {}
+        self._subjects = {}
+        self.zeroed = []
+        self.saved = 0
+
+    def add(self, student_id, subject_id, value, cell=None):
+        cell = cell or f'{student_id}_{subject_id}'
+        self.cells.append((cell, student_id, subject_id, value))
+
+    def add_post(self, data, prefix='score_'):
+        """Add every non-empty '<prefix><student_id>_<subject_id>' field of a POST"""
+        for key, value in data.items():
+            if not key.startswith(prefix) or not value.strip():
+                continue
+            try:
+                student_id, subject_id = key[len(prefix):].split('_')
+            except ValueError:
+                self.errors[key] = "Malformed field name"
+                continue
+            self.add(student_id, subject_id, value, cell=key)
+
+    # ─────────────────────────────────────
+    # VALIDATION — 3 queries for the whole grid
+    # ─────────────────────────────────────
+    def _parse_cells(self):
+        parsed = []
+        for cell, student_id, subject_id, value in self.cells:
+            try:
+                student_id, subject_id = int(student_id), int(subject_id)
+            except (TypeError, ValueError):
+                self.errors[cell] = "Unknown student or subject"
+                continue
+            self._cell_ids[cell] = (student_id, subject_id)
+            try:
+                score = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                self.errors[cell] = f'"{value}" is not a number'
+                continue
+            if not score.is_finite() or not (0 <= score <= 100):
+                self.errors[cell] = "Score must be between 0.00 and 100.00"
+                continue
+            parsed.append((cell, student_id, subject_id, score))
+        return parsed
+
+    def error_messages(self):
+        """Errors as 'Student — Subject: message' strings, in submission order"""
+        lines = []
+        for cell, error in self.errors.items():
+            student_id, subject_id = self._cell_ids.get(cell, (None, None))
+            student, subject = self._students.get(student_id), self._subjects.get(subject_id)
+            if student and subject:
+                label = f"{student.user.get_full_name() or student.user.username} — {subject.name}"
+            elif student:
+                label = student.user.get_full_name() or student.user.username
+            else:
+                label = cell
+            lines.append(f"{label}: {error}")
+        return lines
+
+    def _absences(self, pairs):
+        if self.absence_limit is None or not pairs:
+            return {}
+        return absence_counts_for_pairs(pairs)
+
+    def build(self):
+        """Validated, graded (unsaved) Score objects — one per distinct cell, last value wins"""
+        parsed = self._parse_cells()
+        student_ids = {ids[0] for ids in self._cell_ids.values()}
+        subject_ids = {ids[1] for ids in self._cell_ids.values()}
+
+        self._students = students = {
+            student.id: student
+            for student in Student.objects.filter(classroom=self.classroom, id__in=student_ids).select_related('user')
+        }
+        subjects = Subject.objects.filter(classroom=self.classroom, id__in=subject_ids)
+        if self.subject_ids is not None:
+            subjects = subjects.filter(id__in=self.subject_ids)
+        self._subjects = subjects = {subject.id: subject for subject in subjects}
+
+        valid = {}
+        for cell, student_id, subject_id, score in parsed:
+            if student_id not in students:
+                self.errors[cell] = "Student is not in this class"
+            elif subject_id not in subjects:
+                self.errors[cell] = "Subject is not taught in this class"
+            else:
+                valid[(student_id, subject_id)] = score
+
+        absences = self._absences(valid.keys())
+        scores = []
+        for (student_id, subject_id), score in valid.items():
+            missed = absences.get((student_id, subject_id), 0)
+            if self.absence_limit is not None and missed >= self.absence_limit:
+                score = Decimal('0.00')
+                self.zeroed.append((students[student_id], subjects[subject_id], missed))
+
+            row = Score(
+                student=students[student_id],
+                subject=subjects[subject_id],
+                exam_type=self.exam_type,
+                score=score,
+                recorded_by=self.recorded_by,
+            )
+            row.grade = row.calculate_grade()
+            scores.append(row)
+        return scores
+
+    # ─────────────────────────────────────
+    # WRITE — one upsert + summary refresh
+    # ─────────────────────────────────────
+    def save(self):
+        scores = self.build()
+        if not scores:
+            return self
+
+        with transaction.atomic():
+            Score.objects.bulk_create(
+                scores,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'exam_type'],
+                update_fields=['score', 'grade', 'recorded_by'],
+            )
+            refresh_score_summaries({score.student_id for score in scores})
+
+        self.saved = len(scores)
+        return self
@@ -0,0 +1,127 @@
+# core/score_export.py — SCORE EXPORTS (XLSX / CSV / NDJSON)
+#
+# Every format reads the same chunked .values_list() rows, so no Score model
+# instances are ever held in memory. XLSX goes through an openpyxl write-only
+# workbook (rows are serialized as they are appended) into a temp file; CSV and
+# NDJSON are generators for StreamingHttpResponse, so nightly dumps start
+# flowing immediately and never exist in full on the server. Filters are the
+# ones legacy_scores uses (?class=, ?exam_type=, ?year=). They are checked and
+# the queryset built before any response exists, so a bad filter is a 400 —
+# not an error halfway through a stream that has already started.
+
+import csv
+import json
+import tempfile
+
+from openpyxl import Workbook
+
+from core.models import Score
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+HEADERS = ['Student ID', 'Name', 'Roll No', 'Class', 'Subject', 'Exam Type', 'Score', 'Grade', 'Recorded Date']
+EXAM_TYPES = dict(Score.EXAM_TYPES)
+
+
+def score_filters(params):
+    """{'class', 'exam_type', 'year'} from a QueryDict — raises ValueError for a filter that is not valid"""
+    filters = {
+        'class': params.get('class') or None,
+        'exam_type': params.get('exam_type', '').lower() or None,
+        'year': params.get('year') or None,
+    }
+    if filters['class'] and not filters['class'].isdigit():
+        raise ValueError(f"Invalid class: {filters['class']}")
+    if filters['exam_type'] and filters['exam_type'] not in EXAM_TYPES:
+        raise ValueError(f"Invalid exam type: {filters['exam_type']}")
+    if filters['year'] and not filters['year'].isdigit():
+        raise ValueError(f"Invalid year: {filters['year']}")
+    return filters
+
+
+def filter_scores(scores, filters):
+    if filters['class']:
+        scores = scores.filter(student__classroom__id=filters['class'])
+    if filters['exam_type']:
+        scores = scores.filter(exam_type=filters['exam_type'])
+    if filters['year']:
+        scores = scores.filter(recorded_at__year=filters['year'])
+    return scores
+
+
+def score_rows(filters):
+    """
+    Export rows as (student_id, name, roll, class, subject, exam_type, score, grade, recorded_at).
+    The queryset is built here, not in the generator, so filter errors raise before streaming starts.
+    """
+    rows = filter_scores(Score.objects.all(), filters).order_by('id').values_list(
+        'student_id', 'student__user__first_name', 'student__user__last_name', 'student__roll_number',
+        'student__classroom__name', 'subject__name', 'exam_type', 'score', 'grade', 'recorded_at',
+    )
+    return _iter_rows(rows)
+
+
+def _iter_rows(rows):
+    for values in rows.iterator(chunk_size=CHUNK_SIZE):
+        student_id, first_name, last_name, roll, classroom, subject, exam_type, score, grade, recorded_at = values
+        yield (
+            student_id, f"{first_name} {last_name}".strip(), roll, classroom or '',
+            subject, exam_type, score, grade, recorded_at,
+        )
+
+
+def _display_row(row):
+    student_id, name, roll, classroom, subject, exam_type, score, grade, recorded_at = row
+    return [
+        student_id, name, roll, classroom, subject,
+        EXAM_TYPES.get(exam_type, exam_type), score, grade, recorded_at.strftime('%Y-%m-%d'),
+    ]
+
+
+# ─────────────────────────────────────
+# WRITERS
+# ─────────────────────────────────────
+def export_xlsx(rows):
+    """Anonymous temp file holding the workbook, rewound — removed once closed"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Student Scores")
+    ws.append(HEADERS)
+    for row in rows:
+        ws.append(_display_row(row))
+
+    handle = tempfile.TemporaryFile()
+    wb.save(handle)
+    handle.seek(0)
+    return handle
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back"""
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow(_display_row(row))
+
+
+def iter_ndjson(rows):
+    for student_id, name, roll, classroom, subject, exam_type, score, grade, recorded_at in rows:
+        yield json.dumps({
+            'student_id': student_id,
+            'name': name,
+            'roll_number': roll,
+            'class': classroom,
+            'subject': subject,
+            'exam_type': exam_type,
+            'score': float(score),
+            'grade': grade,
+            'recorded_at': recorded_at.isoformat(),
+        }) + '\n'
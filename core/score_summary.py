@@ -0,0 +1,262 @@
+# core/score_summary.py — PER-STUDENT SCORE SUMMARIES
+#
+# StudentScoreSummary holds count / sum / average / latest score per student,
+# overall (subject NULL) and per subject. Score.save()/delete() move the two
+# rows a score counts in by its count/sum delta (apply_score_change(), F()
+# updates); bulk writers call refresh_score_summaries(), which rebuilds every
+# row of the students they wrote for. Both lock the Student row first, so
+# writes for one student are serialized, and both bump Student.score_version,
+# which report-card caches are keyed on. `manage.py verify_score_summaries`
+# compares the table with Score and repairs drift.
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from core.models import Score, Student, StudentScoreSummary
+
+# Fields compared by verify_score_summaries()
+SUMMARY_FIELDS = ('classroom_id', 'score_count', 'score_sum', 'latest_score', 'latest_recorded_at')
+
+
+def _new_summary(student_id, classroom_id, subject_id):
+    return StudentScoreSummary(
+        student_id=student_id,
+        classroom_id=classroom_id,
+        subject_id=subject_id,
+        score_count=0,
+        score_sum=Decimal('0.00'),
+    )
+
+
+def _add_score(summary, score, recorded_at):
+    summary.score_count += 1
+    summary.score_sum += score
+    if summary.latest_recorded_at is None or recorded_at >= summary.latest_recorded_at:
+        summary.latest_score = score
+        summary.latest_recorded_at = recorded_at
+
+
+def build_score_summaries(student_ids):
+    """
+    Compute the summaries the given students should have, straight from Score.
+    Returns {(student_id, subject_id or None): StudentScoreSummary (unsaved)}.
+    """
+    classrooms = dict(Student.objects.filter(id__in=student_ids).values_list('id', 'classroom_id'))
+    summaries = {}
+
+    rows = Score.objects.filter(student_id__in=student_ids).order_by('recorded_at', 'id').values_list(
+        'student_id', 'subject_id', 'score', 'recorded_at'
+    )
+    for student_id, subject_id, score, recorded_at in rows:
+        classroom_id = classrooms.get(student_id)
+        for key in ((student_id, subject_id), (student_id, None)):
+            if key not in summaries:
+                summaries[key] = _new_summary(student_id, classroom_id, key[1])
+            _add_score(summaries[key], score, recorded_at)
+
+    for summary in summaries.values():
+        summary.average = round(float(summary.score_sum) / summary.score_count, 2)
+    return summaries
+
+
+def lock_students(student_ids):
+    """Lock the Student rows until commit — every summary write for a student goes through this first"""
+    list(Student.objects.select_for_update().filter(id__in=student_ids).order_by('id').values_list('id'))
+
+
+def _bump_version(student_ids):
+    Student.objects.filter(id__in=student_ids).update(
+        score_version=F('score_version') + 1, scores_updated_at=timezone.now(),
+    )
+
+
+def refresh_score_summaries(student_ids):
+    """Replace the summary rows of the given students with freshly computed ones and bump their score version"""
+    student_ids = {sid for sid in student_ids if sid is not None}
+    if not student_ids:
+        return
+
+    with transaction.atomic():
+        lock_students(student_ids)  # so a concurrent write cannot land between the read and the rebuild
+        summaries = build_score_summaries(student_ids)
+        StudentScoreSummary.objects.filter(student_id__in=student_ids).delete()
+        StudentScoreSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+        _bump_version(student_ids)
+
+
+# ─────────────────────────────────────
+# SINGLE SCORE WRITES — DELTAS
+# ─────────────────────────────────────
+def _rows(student_id, subject_id):
+    """The per-subject and overall summary rows a score counts in"""
+    return StudentScoreSummary.objects.filter(
+        Q(subject_id=subject_id) | Q(subject__isnull=True), student_id=student_id,
+    )
+
+
+def _add(student_id, subject_id, score, recorded_at):
+    newest = Q(latest_recorded_at__isnull=True) | Q(latest_recorded_at__lte=recorded_at)
+    rows = _rows(student_id, subject_id)
+    updated = rows.update(
+        score_count=F('score_count') + 1,
+        score_sum=F('score_sum') + score,
+        average=Cast(F('score_sum') + score, FloatField()) / Cast(F('score_count') + 1, FloatField()),
+        latest_score=Case(When(newest, then=Value(score)), default=F('latest_score')),
+        latest_recorded_at=Case(When(newest, then=Value(recorded_at)), default=F('latest_recorded_at')),
+    )
+    if updated == 2:
+        return
+
+    # The student's first score (in this subject)
+    classroom_id = Student.objects.filter(id=student_id).values_list('classroom_id', flat=True).first()
+    existing = set(rows.values_list('subject_id', flat=True))
+    StudentScoreSummary.objects.bulk_create([
+        StudentScoreSummary(
+            student_id=student_id, classroom_id=classroom_id, subject_id=key, score_count=1, score_sum=score,
+            average=float(score), latest_score=score, latest_recorded_at=recorded_at,
+        )
+        for key in (subject_id, None) if key not in existing
+    ])
+
+
+def _remove(student_id, subject_id, score, recorded_at):
+    rows = _rows(student_id, subject_id)
+    rows.filter(score_count__lte=1).delete()
+    rows.update(
+        score_count=F('score_count') - 1,
+        score_sum=F('score_sum') - score,
+        average=Cast(F('score_sum') - score, FloatField()) / Cast(F('score_count') - 1, FloatField()),
+    )
+    # Rows whose latest score this was take the next newest one
+    for summary in rows.filter(latest_recorded_at=recorded_at):
+        scores = Score.objects.filter(student_id=student_id)
+        if summary.subject_id is not None:
+            scores = scores.filter(subject_id=summary.subject_id)
+        latest = scores.order_by('-recorded_at', '-id').values_list('score', 'recorded_at').first()
+        summary.latest_score, summary.latest_recorded_at = latest or (None, None)
+        summary.save(update_fields=['latest_score', 'latest_recorded_at', 'updated_at'])
+
+
+def stored_score(score_id):
+    """(student_id, subject_id, score, recorded_at) of a stored Score row, or None"""
+    return Score.objects.filter(pk=score_id).values_list('student_id', 'subject_id', 'score', 'recorded_at').first()
+
+
+def apply_score_change(old, new):
+    """
+    Move the summaries for one Score row changing — inside the write's
+    transaction, after lock_students(). Keys are stored_score() tuples, or
+    None for "no row".
+    """
+    if old == new:
+        return
+    if old is not None:
+        _remove(*old)
+    if new is not None:
+        _add(*new)
+    _bump_version({key[0] for key in (old, new) if key is not None})
+
+
+def verify_score_summaries(repair=False, chunk_size=500):
+    """
+    Compare every student's summaries with Score, chunk by chunk.
+    Returns the ids of students whose summaries had drifted (and repairs them if asked).
+    """
+    drifted = []
+    student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        expected = build_score_summaries(chunk)
+        stored = {
+            (summary.student_id, summary.subject_id): summary
+            for summary in StudentScoreSummary.objects.filter(student_id__in=chunk)
+        }
+
+        bad = set()
+        for key in expected.keys() | stored.keys():
+            want, have = expected.get(key), stored.get(key)
+            if want is None or have is None or any(
+                getattr(want, field) != getattr(have, field) for field in SUMMARY_FIELDS
+            ):
+                bad.add(key[0])
+
+        if bad:
+            drifted.extend(sorted(bad))
+            if repair:
+                refresh_score_summaries(bad)
+    return drifted
+
+
+# ─────────────────────────────────────
+# READ SIDE
+# ─────────────────────────────────────
+def overall_summaries(classroom=None):
+    """Overall (all subjects) summary rows, optionally limited to one classroom"""
+    summaries = StudentScoreSummary.objects.filter(subject__isnull=True)
+    if classroom is not None:
+        summaries = summaries.filter(classroom=classroom)
+    return summaries
+
+
+def subject_summaries(classroom=None):
+    """Per-subject summary rows, optionally limited to one classroom"""
+    summaries = StudentScoreSummary.objects.filter(subject__isnull=False)
+    if classroom is not None:
+        summaries = summaries.filter(classroom=classroom)
+    return summaries
+
+
+def weighted_average():
+    """Sum(score_sum) / Sum(score_count) — the plain average over every Score row behind a group"""
+    return Cast(Sum('score_sum'), FloatField()) / Cast(Sum('score_count'), FloatField())
+
+
+def ranked_students(summaries, limit=10, lowest_first=False):
+    """
+    Students for the best (or worst) overall summary rows, each with .avg_score set
+    — a drop-in for the old Student.objects.annotate(avg_score=Avg('scores__score')) lists.
+    """
+    order = 'average' if lowest_first else '-average'
+    rows = summaries.select_related('student__user', 'student__classroom', 'student__section').order_by(order)[:limit]
+    students = []
+    for summary in rows:
+        student = summary.student
+        student.avg_score = summary.average
+        student.score_count = summary.score_count
+        students.append(student)
+    return students
+
+
+def class_rank(student):
+    """1-based rank of a student's overall average within their classroom, or None if unscored"""
+    mine = overall_summaries().filter(student=student).values_list('average', flat=True).first()
+    if mine is None:
+        return None
+    return overall_summaries(student.classroom_id).filter(average__gt=mine).count() + 1
+
+
+def class_averages():
+    """[{'id', 'name', 'avg_score'}] per classroom, best first"""
+    rows = overall_summaries().filter(classroom__isnull=False).values(
+        'classroom_id', name=F('classroom__name')
+    ).annotate(avg_score=weighted_average()).order_by('-avg_score')
+    return [{'id': row['classroom_id'], 'name': row['name'], 'avg_score': row['avg_score']} for row in rows]
+
+
+def subject_averages(classroom=None):
+    """[{'name', 'avg'}] per subject, by name"""
+    rows = subject_summaries(classroom).values(
+        'subject_id', name=F('subject__name')
+    ).annotate(avg=weighted_average()).order_by('name')
+    return [{'name': row['name'], 'avg': row['avg']} for row in rows]
+
+
+def overall_average(classroom=None):
+    """Average over every Score of the school (or one classroom)"""
+    return overall_summaries(classroom).aggregate(avg=weighted_average())['avg']
+
@@ -0,0 +1,52 @@
+# core/tasks.py — BACKGROUND JOB HANDLERS (run by `manage.py run_jobs`)
+from django.core.files import File
+
+from jobs.queue import register
+
+from core.attendance_export import FILENAME, attendance_rows, export_to_tempfile
+from core.attendance_word import FILENAME as WORD_FILENAME, export_word_to_tempfile
+from core.bulk_import import StudentImporter, discard_upload, local_upload, preview
+
+
+@register('core.bulk_import', max_attempts=1)  # re-running would report every imported row as a duplicate
+def bulk_import(job):
+    token = job.payload['token']
+    try:
+        # The upload is in shared storage; read from a local copy on this worker
+        with local_upload(token) as path:
+            if path is None:
+                raise FileNotFoundError("The uploaded file is no longer available")
+            _, total = preview(path, limit=0)
+            job.set_progress(0, total)
+            importer = StudentImporter(path, on_progress=lambda importer: job.set_progress(importer.processed)).run()
+    finally:
+        discard_upload(token)
+
+    summary = f"Successfully imported {importer.imported} students!"
+    if importer.error_count:
+        summary = f"{importer.imported} imported. Errors: {importer.error_count}"
+    return {
+        'summary': summary,
+        'imported': importer.imported,
+        'error_count': importer.error_count,
+        'errors': importer.errors,
+    }
+
+
+@register('core.attendance_export')
+def attendance_export(job):
+    rows = attendance_rows(job.payload)
+    job.set_progress(0, rows.count())
+    with export_to_tempfile(rows, on_progress=job.set_progress) as handle:
+        job.save_artifact(FILENAME, File(handle))
+    job.set_progress(job.total)
+    return {'summary': f"Exported {job.total} attendance records."}
+
+
+@register('core.attendance_word')
+def attendance_word(job):
+    job.set_progress(0, attendance_rows(job.payload).count())
+    with export_word_to_tempfile(job.payload, on_progress=job.set_progress) as handle:
+        job.save_artifact(WORD_FILENAME, File(handle))
+    job.set_progress(job.total)
+    return {'summary': f"Exported {job.total} attendance records."}
@@ -1,3 +1,396 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.absence_counter import reconcile_absence_counters
+from core.attendance_batch import AttendanceBatch
+from core.attendance_rollup import STATUS_FIELDS, _count_attendance, rebuild_attendance_rollups
+from core.bulk_import import StudentImporter, discard_upload, local_upload, save_upload, upload_name
+from core.file_cache import TMP_GRACE, FileCache
+from core.models import AbsenceCounter, Attendance, ClassRoom, DailyAttendanceRollup, Score, Section, Student, StudentScoreSummary, Subject
+from core.performance_matrix import PerformanceMatrix
+from core.score_batch import ScoreBatchWriter
+from core.score_summary import verify_score_summaries
+from users.models import CustomUser
+
+
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classroom = ClassRoom.objects.create(name='Grade 10')
+        Section.objects.create(name='A', classroom=cls.classroom)
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        storage = {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': self.media.name}}
+        settings = override_settings(STORAGES={'default': storage, 'files': storage})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, *rows):
+        lines = ['Username,First Name,Last Name,Email,Roll Number,Class,Section', *rows]
+        return save_upload(SimpleUploadedFile('students.csv', '\n'.join(lines).encode()))
+
+    def test_upload_round_trips_through_file_storage(self):
+        token = self.upload('amy,Amy,Lee,amy@example.com,R-1,Grade 10,A')
+        self.assertEqual(upload_name(token), f'imports/{token}.csv')
+        with local_upload(token) as path:
+            self.assertTrue(os.path.exists(path))
+        discard_upload(token)
+        with local_upload(token) as path:
+            self.assertIsNone(path)
+
+    def test_rows_failing_field_validators_are_reported_not_inserted(self):
+        token = self.upload(
+            'amy,Amy,Lee,amy@example.com,R-1,Grade 10,A',
+            'ben,Ben,Ng,ben@example.com,r-2,Grade 10,A',  # lowercase: fails the roll number RegexValidator
+            'cal,Cal,Ro,not-an-email,R-3,Grade 10,A',
+        )
+        with local_upload(token) as path:
+            importer = StudentImporter(path).run()
+
+        self.assertEqual((importer.imported, importer.error_count), (1, 2))
+        self.assertTrue(importer.errors[0].startswith('Row 3: roll number:'))
+        self.assertTrue(importer.errors[1].startswith('Row 4: email address:'))
+        self.assertEqual(list(Student.objects.values_list('roll_number', flat=True)), ['R-1'])
+        self.assertEqual(list(CustomUser.objects.filter(username__in=['amy', 'ben', 'cal']).values_list('username', flat=True)), ['amy'])
+
+
+class FileCachePruneTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache = FileCache('test-cache', max_bytes=0)
+
+    def test_only_abandoned_tmp_files_are_pruned(self):
+        self.cache.set('aa11', b'cached')
+        in_flight = self.cache.path('aa22') + '.1.1.tmp'
+        abandoned = self.cache.path('aa33') + '.2.2.tmp'
+        for path in (in_flight, abandoned):
+            with open(path, 'wb') as handle:
+                handle.write(b'partial')
+        old = time.time() - TMP_GRACE - 1
+        os.utime(abandoned, (old, old))
+
+        self.assertEqual(self.cache.prune(), 2)
+        self.assertIsNone(self.cache.get('aa11'))
+        self.assertTrue(os.path.exists(in_flight))
+        self.assertFalse(os.path.exists(abandoned))
+
+
+class CounterTestCase(TestCase):
+    """Two classrooms with a subject and two students each, for the denormalized-counter tests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = CustomUser.objects.create_user('teacher', password='pw', role='teacher')
+        cls.subjects, cls.students = [], []
+        for c in range(2):
+            classroom = ClassRoom.objects.create(name=f'Grade {10 + c}')
+            cls.subjects.append(Subject.objects.create(name='Maths', classroom=classroom, teacher=cls.teacher))
+            for i in range(2):
+                user = CustomUser.objects.create_user(f'student{c}{i}', password='pw', role='student')
+                cls.students.append(Student.objects.create(user=user, roll_number=f'R-{c}{i}', classroom=classroom))
+        cls.day = datetime.date(2024, 3, 4)
+
+    def attend(self, student, status, date=None):
+        subject = self.subjects[self.students.index(student) // 2]
+        return Attendance.objects.create(
+            student=student, subject=subject, date=date or self.day, status=status, marked_by=self.teacher
+        )
+
+    def assertRollupsMatchAttendance(self):
+        stored = {
+            (rollup.date, rollup.classroom_id, rollup.subject_id): {field: getattr(rollup, field) for field in STATUS_FIELDS.values()}
+            for rollup in DailyAttendanceRollup.objects.all()
+            if any(getattr(rollup, field) for field in STATUS_FIELDS.values())
+        }
+        self.assertEqual(stored, dict(_count_attendance(Attendance.objects.all())))
+
+
+class AttendanceRollupTests(CounterTestCase):
+    def test_rollups_follow_create_update_and_delete(self):
+        rows = [self.attend(student, 'present') for student in self.students]
+        self.assertRollupsMatchAttendance()
+
+        rows[0].status = 'absent'
+        rows[0].save()
+        rows[2].date = self.day - datetime.timedelta(days=1)  # moves bucket
+        rows[2].save()
+        self.assertRollupsMatchAttendance()
+
+        rows[1].delete()
+        rows[3].delete()
+        self.assertRollupsMatchAttendance()
+
+        self.assertEqual(rebuild_attendance_rollups(), 2)
+        self.assertRollupsMatchAttendance()
+
+    def test_rollups_follow_a_student_into_a_new_class(self):
+        student = self.students[0]
+        row = self.attend(student, 'absent')
+        self.attend(student, 'present', self.day - datetime.timedelta(days=1))
+        self.attend(self.students[1], 'present')
+
+        student.classroom = self.students[2].classroom
+        student.save()
+        self.assertRollupsMatchAttendance()
+
+        row.delete()  # decrements the bucket it is counted in now
+        self.assertRollupsMatchAttendance()
+
+
+class ScoreSummaryTests(CounterTestCase):
+    def score(self, student, exam_type, value):
+        subject = self.subjects[self.students.index(student) // 2]
+        return Score.objects.create(student=student, subject=subject, exam_type=exam_type, score=value, recorded_by=self.teacher)
+
+    def test_summaries_follow_create_update_and_delete(self):
+        quiz = self.score(self.students[0], 'quiz', 80)
+        self.score(self.students[0], 'final', 60)
+        self.score(self.students[2], 'quiz', 90)
+        self.assertEqual(verify_score_summaries(), [])
+        overall = StudentScoreSummary.objects.get(student=self.students[0], subject__isnull=True)
+        self.assertEqual((overall.score_count, float(overall.average)), (2, 70.0))
+
+        quiz.score = 100
+        quiz.save()
+        self.assertEqual(verify_score_summaries(), [])
+
+        quiz.delete()
+        Score.objects.get(student=self.students[2]).delete()
+        self.assertEqual(verify_score_summaries(), [])
+        self.assertFalse(StudentScoreSummary.objects.filter(student=self.students[2]).exists())
+
+    def test_single_writes_move_the_rows_in_place(self):
+        self.score(self.students[0], 'quiz', 80)
+        final = self.score(self.students[0], 'final', 60)
+        rows = dict(StudentScoreSummary.objects.values_list('subject_id', 'id'))
+
+        final.score = 90
+        final.save()
+        self.assertEqual(dict(StudentScoreSummary.objects.values_list('subject_id', 'id')), rows)  # not rebuilt
+        self.assertEqual(verify_score_summaries(), [])
+
+        final.delete()  # the latest score: the quiz becomes the latest again
+        overall = StudentScoreSummary.objects.get(student=self.students[0], subject__isnull=True)
+        self.assertEqual((overall.score_count, overall.latest_score, overall.average), (1, 80, 80.0))
+        self.assertEqual(verify_score_summaries(), [])
+
+    def test_drift_is_reported_and_repaired(self):
+        self.score(self.students[0], 'quiz', 80)
+        StudentScoreSummary.objects.filter(student=self.students[0]).update(score_count=5)
+        self.assertEqual(verify_score_summaries(repair=True), [self.students[0].id])
+        self.assertEqual(verify_score_summaries(), [])
+
+
+class ScoreBatchWriterTests(CounterTestCase):
+    def write(self, values, **kwargs):
+        classroom = self.subjects[0].classroom
+        writer = ScoreBatchWriter(classroom, 'midterm', self.teacher, **kwargs)
+        for student, value in zip(self.students[:2], values):
+            writer.add(student.id, self.subjects[0].id, value)
+        return writer.save()
+
+    def test_upserts_keep_summaries_in_step(self):
+        self.assertEqual(self.write(['70', '80']).saved, 2)
+        self.assertEqual(verify_score_summaries(), [])
+
+        writer = self.write(['90', 'abc'])
+        self.assertEqual((writer.saved, list(writer.errors.values())), (1, ['"abc" is not a number']))
+        self.assertEqual(Score.objects.get(student=self.students[0]).score, 90)
+        self.assertEqual(verify_score_summaries(), [])
+
+        Score.objects.get(student=self.students[1]).delete()
+        self.assertEqual(verify_score_summaries(), [])
+
+    def test_absences_zero_the_score(self):
+        for days_ago in range(3):
+            self.attend(self.students[0], 'absent', self.day - datetime.timedelta(days=days_ago))
+        writer = self.write(['70', '80'])
+        self.assertEqual(Score.objects.get(student=self.students[0]).score, 0)
+        self.assertEqual(len(writer.zeroed), 1)
+        self.assertEqual(verify_score_summaries(), [])
+
+
+class PerformanceMatrixTests(CounterTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.physics = Subject.objects.create(name='Physics', classroom=cls.subjects[0].classroom, teacher=cls.teacher)
+        maths = cls.subjects[0]
+        for student, subject, exam_type, value in [
+            (cls.students[0], maths, 'quiz', 80), (cls.students[0], maths, 'final', 60), (cls.students[0], cls.physics, 'quiz', 90),
+            (cls.students[1], maths, 'quiz', 90), (cls.students[1], cls.physics, 'quiz', 70),
+            (cls.students[2], cls.subjects[1], 'quiz', 50),
+        ]:
+            Score.objects.create(student=student, subject=subject, exam_type=exam_type, score=value, recorded_by=cls.teacher)
+
+    def rows(self, matrix=None, **page):
+        matrix = matrix or PerformanceMatrix.build()
+        return {row['id']: row for row in matrix.page(page_size=100, **page)['results']}
+
+    def test_pivot_averages_exam_types(self):
+        rows = self.rows()
+        first = rows[self.students[0].id]
+        self.assertEqual(first['scores'], {str(self.subjects[0].id): 70.0, str(self.physics.id): 90.0})
+        self.assertEqual((first['total'], first['average']), (160.0, 80.0))
+        self.assertEqual((rows[self.students[3].id]['scores'], rows[self.students[3].id]['z_scores']), ({}, {}))
+
+    def test_tied_averages_share_a_rank(self):
+        rows = self.rows()
+        self.assertEqual([rows[student.id]['rank'] for student in self.students], [1, 1, 3, 4])
+
+    def test_z_scores_per_subject(self):
+        rows = self.rows()
+        maths, physics, other_maths = (str(subject.id) for subject in (self.subjects[0], self.physics, self.subjects[1]))
+        self.assertEqual(rows[self.students[0].id]['z_scores'], {maths: -1.0, physics: 1.0})
+        self.assertEqual(rows[self.students[1].id]['z_scores'], {maths: 1.0, physics: -1.0})
+        self.assertEqual(rows[self.students[2].id]['z_scores'], {other_maths: 0.0})  # one score: no spread
+        means = {subject['id']: (subject['mean'], subject['std']) for subject in PerformanceMatrix.build().page()['subjects']}
+        self.assertEqual(means[self.physics.id], (80.0, 10.0))
+
+    def test_classroom_keeps_its_students_and_subjects(self):
+        matrix = PerformanceMatrix.build(self.subjects[0].classroom)
+        self.assertEqual(matrix.student_ids.tolist(), [self.students[0].id, self.students[1].id])
+        self.assertEqual([name for _, name in matrix.subjects], ['Maths', 'Physics'])
+        self.assertEqual(matrix.scores.tolist(), [[70.0, 90.0], [90.0, 70.0]])
+
+    def test_pages_and_sorts(self):
+        matrix = PerformanceMatrix.build()
+        page = matrix.page(2, page_size=1, sort='name', descending=True)
+        self.assertEqual((page['count'], page['num_pages'], [row['name'] for row in page['results']]), (4, 4, ['student10']))
+        self.assertEqual(matrix.page(99, page_size=3)['page'], 2)  # clamped to the last page
+
+        subject = f'subject:{self.physics.id}'
+        ascending = [row['id'] for row in matrix.page(sort=subject, descending=False)['results']]
+        descending = [row['id'] for row in matrix.page(sort=subject)['results']]
+        self.assertEqual(ascending[:2], [self.students[1].id, self.students[0].id])
+        self.assertEqual(descending[:2], [self.students[0].id, self.students[1].id])
+        self.assertEqual(set(ascending[2:]), {self.students[2].id, self.students[3].id})  # unscored last either way
+
+    def test_api_pages_and_rejects_bad_parameters(self):
+        self.client.force_login(self.teacher)
+        url = reverse('performance_matrix_api')
+        for query in ('grade=abc', 'page=x', 'sort=bogus'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400)
+
+        page = self.client.get(f'{url}?grade={self.subjects[0].classroom_id}&sort=total&order=asc').json()
+        self.assertEqual([row['id'] for row in page['results']], [self.students[0].id, self.students[1].id])
+
+    def test_bench_command_runs(self):
+        out = io.StringIO()
+        call_command('bench_performance_matrix', students=50, subjects=3, repeat=1, stdout=out)
+        self.assertIn('in memory, sort=rank', out.getvalue())
+
+
+class AttendanceBatchTests(CounterTestCase):
+    def mark(self, statuses, **kwargs):
+        batch = AttendanceBatch(self.subjects[0], date=self.day, marked_by=self.teacher, **kwargs)
+        for student, status in zip(self.students[:2], statuses):
+            batch.add(student, status)
+        return batch.save()
+
+    def assertCountersMatch(self):
+        self.assertRollupsMatchAttendance()
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+        self.assertEqual(verify_score_summaries(), [])
+
+    def test_rosters_keep_every_counter_in_step(self):
+        first, second = self.students[:2]
+        batch = self.mark(['absent', 'present'])
+        batch.apply_penalties()
+        self.assertEqual(batch.created, [first.id, second.id])
+        self.assertCountersMatch()
+
+        batch = self.mark(['present', 'absent'])
+        self.assertEqual(batch.apply_penalties(), {first.id: 0, second.id: 1})
+        self.assertEqual(Score.objects.get(student=second, exam_type='attendance').score, 95)
+        self.assertCountersMatch()
+
+        self.assertEqual(self.mark(['absent', 'absent'], overwrite=False).skipped, [first.id, second.id])
+        Attendance.objects.get(student=second).delete()
+        self.assertCountersMatch()
+
+    def test_unknown_students_are_reported_not_written(self):
+        batch = AttendanceBatch(self.subjects[0], date=self.day, marked_by=self.teacher)
+        batch.add(self.students[0], 'present')
+        batch.add(999999, 'absent')
+        batch.save()
+        self.assertEqual((batch.created, batch.errors), ([self.students[0].id], {999999: "Unknown student"}))
+        self.assertCountersMatch()
+
+    def rival_marks_first(self, status):
+        # Another marking inserts the first student's row after this batch read the day
+        read = AttendanceBatch._existing_rows
+
+        def existing_rows(batch):
+            rows = read(batch)
+            self.attend(self.students[0], status)
+            return rows
+
+        return mock.patch.object(AttendanceBatch, '_existing_rows', existing_rows)
+
+    def test_a_row_inserted_concurrently_is_overwritten(self):
+        with self.rival_marks_first('absent'):
+            self.mark(['present', 'absent'])
+        self.assertEqual(Attendance.objects.get(student=self.students[0]).status, 'present')
+        self.assertEqual(Attendance.objects.count(), 2)
+        self.assertCountersMatch()
+
+    def test_a_row_inserted_concurrently_is_kept_without_overwrite(self):
+        with self.rival_marks_first('absent'):
+            self.mark(['present', 'present'], overwrite=False)
+        self.assertEqual(Attendance.objects.get(student=self.students[0]).status, 'absent')
+        self.assertCountersMatch()
+
+
+class AbsenceCounterTests(CounterTestCase):
+    def test_counters_follow_create_update_and_delete(self):
+        student = self.students[0]
+        rows = [self.attend(student, 'absent', self.day - datetime.timedelta(days=n)) for n in range(3)]
+        self.attend(self.students[1], 'present')
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+        self.assertEqual(AbsenceCounter.objects.get(student=student).absences, 3)
+
+        rows[0].status = 'late'
+        rows[0].save()
+        rows[1].status = 'absent'  # unchanged status
+        rows[1].save()
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+
+        rows[2].delete()
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+        self.assertEqual(AbsenceCounter.objects.get(student=student).absences, 1)
+
+    def test_drift_is_reported_and_repaired(self):
+        self.attend(self.students[0], 'absent')
+        AbsenceCounter.objects.update(absences=4)
+        pair = (self.students[0].id, self.subjects[0].id)
+        self.assertEqual(reconcile_absence_counters(), {pair: (4, 1)})
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+
+    def test_stale_instances_move_the_stored_row(self):
+        row = self.attend(self.students[0], 'absent')
+        stale = Attendance.objects.get(pk=row.pk)
+        row.status = 'present'
+        row.save()
+
+        stale.status = 'late'  # still thinks the row is absent
+        stale.save()
+        row.delete()  # still thinks the row is present
+        self.assertEqual(reconcile_absence_counters(repair=False), {})
+        self.assertRollupsMatchAttendance()
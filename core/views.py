@@ -95,12 +95,9 @@ def add_teacher(request):
 
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.decorators import login_required
-import pandas as pd
-from io import BytesIO
-from core.models import Student, ClassRoom, Section
-from users.models import CustomUser
+from core.bulk_import import discard_upload, local_upload, preview, save_upload, upload_name
+from jobs.queue import enqueue
 
 @login_required
 def bulk_import(request):
@@ -110,12 +107,20 @@ def bulk_import(request):
 
     if request.method == 'POST' and request.FILES.get('file'):
         file = request.FILES['file']
+        # Only the stored upload's token goes in the session, never the rows
+        previous = request.session.pop('bulk_import_token', None)
+        if previous:
+            discard_upload(previous)
+        token = save_upload(file)
         try:
-            df = pd.read_excel(file) if file.name.endswith('.xlsx') else pd.read_csv(file)
-            request.session['bulk_data'] = df.to_dict('records')
-            return redirect('bulk_import_preview')
+            with local_upload(token) as path:
+                preview(path, limit=1)
         except Exception as e:
+            discard_upload(token)
             messages.error(request, f"Error reading file: {e}")
+        else:
+            request.session['bulk_import_token'] = token
+            return redirect('bulk_import_preview')
 
     return render(request, 'core/bulk_import.html')
 
@@ -124,63 +129,19 @@ def bulk_import_preview(request):
     if not request.user.is_superuser:
         return redirect('all_users_list')
 
-    data = request.session.get('bulk_data', [])
-    if not data:
+    token = request.session.get('bulk_import_token')
+    if not token or upload_name(token) is None:
         messages.error(request, "No data to import!")
         return redirect('bulk_import')
 
     if request.method == 'POST':
-        success = 0
-        errors = []
-        for i, row in enumerate(data):
-            try:
-                username = str(row.get('username') or row.get('Username') or '').strip()
-                if not username:
-                    errors.append(f"Row {i+2}: Username missing")
-                    continue
-                if CustomUser.objects.filter(username=username).exists():
-                    errors.append(f"Row {i+2}: Username {username} already exists")
-                    continue
-
-                # Create user
-                user = CustomUser.objects.create(
-                    username=username,
-                    first_name=row.get('first_name') or row.get('First Name') or '',
-                    last_name=row.get('last_name') or row.get('Last Name') or '',
-                    email=row.get('email') or row.get('Email') or '',
-                    role='student',
-                    password=make_password("123456"),  # default password
-                    is_active=True
-                )
-
-                # Create student
-                roll = str(row.get('roll_number') or row.get('Roll Number') or '')
-                class_name = str(row.get('class') or row.get('Class') or '')
-                section_name = str(row.get('section') or row.get('Section') or '')
-
-                classroom = ClassRoom.objects.get(name__iexact=class_name)
-                section = Section.objects.get(name__iexact=section_name, classroom=classroom)
+        del request.session['bulk_import_token']
+        job = enqueue('core.bulk_import', {'token': token}, user=request.user, title="Student Bulk Import")
+        return redirect('jobs:job_detail', job_id=job.id)
 
-                Student.objects.create(
-                    user=user,
-                    roll_number=roll,
-                    classroom=classroom,
-                    section=section
-                )
-                success += 1
-            except Exception as e:
-                errors.append(f"Row {i+2}: {str(e)}")
-
-        if errors:
-            messages.warning(request, f"{success} imported. Errors: {len(errors)}")
-            for err in errors[:10]:
-                messages.error(request, err)
-        else:
-            messages.success(request, f"Successfully imported {success} students!")
-        del request.session['bulk_data']
-        return redirect('all_users_list')
-
-    context = {'data': data[:20], 'total': len(data)}  # Show preview
+    with local_upload(token) as path:
+        data, total = preview(path)
+    context = {'data': data, 'total': total}  # Show preview
     return render(request, 'core/bulk_import_preview.html', context)
 
 # core/views.py — ADD THESE TWO FUNCTIONS
@@ -325,6 +286,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from core.models import Student, ClassRoom, Subject, Attendance
+from core.attendance_batch import AttendanceBatch
 
 
 @login_required
@@ -368,29 +330,24 @@ def mark_attendance(request):
             messages.error(request, "Please fill all fields!")
         else:
             try:
-                student = Student.objects.get(id=student_id)
+                student = Student.objects.select_related('user').get(id=student_id)
                 subject = Subject.objects.get(id=subject_id)
 
-                # Prevent double entry today
-                if Attendance.objects.filter(student=student, subject=subject, date=today).exists():
+                # Prevent double entry today — existing rows are skipped, not overwritten
+                batch = AttendanceBatch(subject, today, marked_by=request.user, overwrite=False)
+                batch.add(student, status)
+                batch.save()
+
+                if batch.errors:
+                    messages.error(request, batch.errors[student.id])
+                elif batch.skipped:
                     messages.error(request, f"Attendance already marked today for {student} in {subject}!")
                 else:
-                    Attendance.objects.create(
-                        student=student,
-                        subject=subject,
-                        status=status,
-                        marked_by=request.user
-                    )
-
                     status_display = dict(Attendance.STATUS_CHOICES).get(status, status).title()
                     messages.success(request, f"{student.user.get_full_name()} → {status_display}")
 
                     # Auto warning system
-                    absences = Attendance.objects.filter(
-                        student=student,
-                        subject=subject,
-                        status='absent'
-                    ).count()
+                    absences = batch.absence_counts()[student.id]
                     if absences == 2:
                         messages.warning(request, f"Warning: {student} has 2 absences in {subject} — ONE MORE = SCORE 0!")
                     elif absences >= 3:
@@ -450,6 +407,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Avg, Count, FloatField
 from django.shortcuts import render
 from django.core.serializers.json import DjangoJSONEncoder
+from core.score_export import filter_scores, score_filters
 
 @login_required
 def legacy_scores(request):
@@ -457,26 +415,20 @@ def legacy_scores(request):
         messages.error(request, "Access restricted to teachers and admins.")
         return redirect('staff_dashboard')
 
-    # Filters
-    selected_class_id = request.GET.get('class')
-    selected_exam_type = request.GET.get('exam_type', '').lower() or None
-    selected_year = request.GET.get('year')
+    # Filters — shared with the score export (core/score_export.py)
+    try:
+        filters = score_filters(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        filters = score_filters({})
+    selected_class_id = filters['class']
+    selected_exam_type = filters['exam_type']
+    selected_year = filters['year']
 
     # Base querysets
-    scores_qs = Score.objects.select_related(
+    scores_qs = filter_scores(Score.objects.select_related(
         'student', 'subject', 'student__user', 'student__classroom'
-    ).order_by('-recorded_at')
-
-    # Apply filters SAFELY using field names, not _id
-    if selected_class_id:
-        scores_qs = scores_qs.filter(student__classroom__id=selected_class_id)
-        # Or even safer: scores_qs = scores_qs.filter(student__classroom=selected_class_id)
-
-    if selected_exam_type:
-        scores_qs = scores_qs.filter(exam_type=selected_exam_type)
-
-    if selected_year:
-        scores_qs = scores_qs.filter(recorded_at__year=selected_year)
+    ).order_by('-recorded_at'), filters)
 
     # Available filters
     classrooms = ClassRoom.objects.all().order_by('name')
@@ -632,93 +584,53 @@ from io import BytesIO
 from docx import Document
 from docx.shared import Inches
 
-# EXCEL EXPORT — 100% WORKING
+# EXCEL EXPORT — STREAMED FROM A TEMP FILE, LARGE EXPORTS RUN AS A JOB
+from django.http import FileResponse
+from core.attendance_export import (
+    EXPORT_JOB_THRESHOLD, FILENAME, attendance_rows, export_filters, export_to_tempfile,
+)
+
 @login_required
 def export_attendance_excel(request):
-    output = BytesIO()
-    workbook = xlsxwriter.Workbook(output)
-    worksheet = workbook.add_worksheet('Attendance')
-
-    # Header
-    title_format = workbook.add_format({'bold': True, 'font_size': 16, 'align': 'center'})
-    worksheet.merge_range('A1:I1', 'ELITE SCHOOL - ATTENDANCE REPORT', title_format)
-    worksheet.write('A2', f"Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}")
-
-    # Data
-    records = Attendance.objects.select_related('student', 'student__user', 'subject', 'student__classroom')
-    if request.GET.get('grade'):
-        records = records.filter(student__classroom_id=request.GET['grade'])
-    if request.GET.get('subject'):
-        records = records.filter(subject_id=request.GET['subject'])
-
-    headers = ['ID', 'Name', 'Roll No', 'Class', 'Subject', 'Date', 'Time', 'Status']
-    row = 3
-    worksheet.write_row(row, 0, headers)
-    row += 1
-
-    for r in records:
-        worksheet.write_row(row, 0, [
-            r.id,
-            r.student.user.get_full_name(),
-            r.student.roll_number,
-            r.student.classroom.name,
-            r.subject.name,
-            r.date.strftime('%Y-%m-%d'),
-            r.recorded_at.strftime('%H:%M'),
-            r.get_status_display()
-        ])
-        row += 1
-
-    workbook.close()
-    output.seek(0)
-
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=attendance_elite_school.xlsx'
-    return response
+    filters = export_filters(request.GET)
+    try:
+        rows = attendance_rows(filters)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('student_info')
+
+    if rows.count() > EXPORT_JOB_THRESHOLD:
+        job = enqueue('core.attendance_export', filters, user=request.user, title="Attendance Excel Export")
+        return redirect('jobs:job_detail', job_id=job.id)
+
+    return FileResponse(export_to_tempfile(rows), as_attachment=True, filename=FILENAME)
+
+# WORD EXPORT — SECTIONED TABLES, ?mode=summary FOR PER-STUDENT TOTALS
+from core.attendance_word import (
+    CONTENT_TYPE as WORD_CONTENT_TYPE, FILENAME as WORD_FILENAME, SUMMARY_FILENAME as WORD_SUMMARY_FILENAME,
+    WORD_JOB_THRESHOLD, export_word_to_tempfile,
+)
 
-# WORD EXPORT — 100% WORKING
 @login_required
 def export_attendance_word(request):
-    doc = Document()
-    doc.add_heading('ELITE SCHOOL - ATTENDANCE REPORT', 0)
-    doc.add_paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M')}")
-
-    table = doc.add_table(rows=1, cols=8)
-    hdr_cells = table.rows[0].cells
-    headers = ['ID', 'Name', 'Roll No', 'Class', 'Subject', 'Date', 'Time', 'Status']
-    for i, header in enumerate(headers):
-        hdr_cells[i].text = header
-
-    records = Attendance.objects.select_related('student', 'student__user', 'subject', 'student__classroom')
-    if request.GET.get('grade'):
-        records = records.filter(student__classroom_id=request.GET['grade'])
-    if request.GET.get('subject'):
-        records = records.filter(subject_id=request.GET['subject'])
-
-    for r in records:
-        row_cells = table.add_row().cells
-        row_cells[0].text = str(r.id)
-        row_cells[1].text = r.student.user.get_full_name()
-        row_cells[2].text = r.student.roll_number
-        row_cells[3].text = r.student.classroom.name
-        row_cells[4].text = r.subject.name
-        row_cells[5].text = r.date.strftime('%Y-%m-%d')
-        row_cells[6].text = r.recorded_at.strftime('%H:%M')
-        row_cells[7].text = r.get_status_display()
-
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-
-    response = HttpResponse(
-        buffer.read(),
-        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    filters = export_filters(request.GET)
+    summary = request.GET.get('mode') == 'summary'
+    try:
+        rows = attendance_rows(filters)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('student_info')
+
+    if not summary and rows.count() > WORD_JOB_THRESHOLD:
+        job = enqueue('core.attendance_word', filters, user=request.user, title="Attendance Word Report")
+        return redirect('jobs:job_detail', job_id=job.id)
+
+    return FileResponse(
+        export_word_to_tempfile(filters, summary=summary),
+        as_attachment=True,
+        filename=WORD_SUMMARY_FILENAME if summary else WORD_FILENAME,
+        content_type=WORD_CONTENT_TYPE,
     )
-    response['Content-Disposition'] = 'attachment; filename=attendance_elite_school.docx'
-    return response
 
 # core/views.py
 # core/views.py — TOP OF FILE
@@ -727,6 +639,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from core.models import Student, ClassRoom, Subject, Attendance, QRSession  # ← QRSession ADDED HERE
+from core.qr_cache import qr_base64
 @login_required
 def qr_attendance_home(request):
     if request.user.is_superuser:
@@ -734,10 +647,17 @@ def qr_attendance_home(request):
         classrooms = ClassRoom.objects.all()
         subjects = Subject.objects.all()
         active_session = QRSession.objects.filter(is_active=True).first()
+        session_qr = None
+        if active_session:
+            # Same payload the page has always encoded; re-rendered only when the session changes
+            session_qr = qr_base64(
+                f"{request.build_absolute_uri()}qr/scan/{active_session.token}/", error_correction='H',
+            )
         return render(request, 'core/qr_create.html', {
             'classrooms': classrooms,
             'subjects': subjects,
             'active_session': active_session,
+            'session_qr': session_qr,
         })
     else:
         # Teacher or Student — Only scan
@@ -794,13 +714,14 @@ def qr_scan_view(request, token):
     except QRSession.DoesNotExist:
         return render(request, 'core/qr_invalid.html')
 
+    student = getattr(request.user, 'student_profile', None)
+    if student is None or session.subject_id is None:
+        return render(request, 'core/qr_invalid.html')
+
     # Mark attendance
-    Attendance.objects.update_or_create(
-        student=request.user.student,
-        subject=session.subject,
-        date=timezone.now().date(),
-        defaults={'status': 'present', 'marked_by': session.created_by}
-    )
+    batch = AttendanceBatch(session.subject_id, marked_by=session.created_by)
+    batch.add(student, 'present')
+    batch.save()
     return render(request, 'core/qr_success.html', {'session': session})
 
 
@@ -818,6 +739,8 @@ from django.urls import reverse
 from urllib.parse import urlencode
 from decimal import Decimal
 
+from core.score_batch import ScoreBatchWriter
+
 @login_required
 def enter_scores(request):
     # Permission check: Only teachers or superusers
@@ -874,62 +797,31 @@ def enter_scores(request):
             messages.error(request, "Selected class does not exist.")
             selected_class_id = None
 
-    # POST: Save all scores
+    # POST: Save all scores — validated and upserted as one batch
     if request.method == 'POST' and selected_class_id:
-        saved_count = 0
-        warning_shown = set()  # Prevent duplicate absence warnings
-
-        with transaction.atomic():
-            for key, value in request.POST.items():
-                if not key.startswith('score_') or not value.strip():
-                    continue
-
-                try:
-                    _, student_id, subject_id = key.split('_')
-                    raw_score = Decimal(value.strip())
-
-                    # Basic validation
-                    if not (0 <= raw_score <= 100):
-                        continue
-
-                    student = Student.objects.get(id=student_id, classroom=selected_classroom)
-                    subject = Subject.objects.get(id=subject_id, classroom=selected_classroom)
-
-                    # Check absences → auto-set to 0.00 if ≥3
-                    absences = Attendance.objects.filter(
-                        student=student,
-                        subject=subject,
-                        status='absent'
-                    ).count()
-
-                    final_score = Decimal('0.00') if absences >= 3 else raw_score
-
-                    if absences >= 3 and student_id not in warning_shown:
-                        messages.warning(
-                            request,
-                            f"{student.user.get_full_name()} has {absences} absences in {subject.name} → score set to 0.00"
-                        )
-                        warning_shown.add(student_id)
-
-                    # Save or update score — model handles grade, validation, recorded_by, timestamp
-                    Score.objects.update_or_create(
-                        student=student,
-                        subject=subject,
-                        exam_type=exam_type,
-                        defaults={
-                            'score': final_score,
-                            'recorded_by': request.user,
-                        }
-                    )
-                    saved_count += 1
-
-                except (ValueError, Student.DoesNotExist, Subject.DoesNotExist):
-                    continue  # Skip invalid/malformed inputs
+        writer = ScoreBatchWriter(selected_classroom, exam_type, request.user)
+        writer.add_post(request.POST)
+        writer.save()
+
+        # Absence warnings — one per student
+        warning_shown = set()
+        for student, subject, absences in writer.zeroed:
+            if student.id not in warning_shown:
+                messages.warning(
+                    request,
+                    f"{student.user.get_full_name()} has {absences} absences in {subject.name} → score set to 0.00"
+                )
+                warning_shown.add(student.id)
+
+        errors = writer.error_messages()
+        if errors:
+            more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+            messages.error(request, f"{len(errors)} score(s) were not saved — " + "; ".join(errors[:5]) + more)
 
         # Success messages
-        if saved_count > 0:
-            messages.success(request, f"Successfully saved {saved_count} score(s)! Grades auto-calculated.")
-        else:
+        if writer.saved > 0:
+            messages.success(request, f"Successfully saved {writer.saved} score(s)! Grades auto-calculated.")
+        elif not writer.errors:
             messages.info(request, "No valid scores were submitted.")
 
         # FIXED REDIRECT: Properly preserve query parameters using reverse()
@@ -980,6 +872,9 @@ from django.db.models import Avg, Count, FloatField
 from django.shortcuts import render, redirect
 from django.utils import timezone
 
+from core.attendance_rollup import daily_attendance
+from core.score_summary import class_averages, overall_summaries, subject_averages
+
 @login_required
 def analytics_dashboard(request):
     if not request.user.is_superuser:
@@ -993,14 +888,7 @@ def analytics_dashboard(request):
             return super().default(obj)
 
     # 1. Class Performance (Average Score per Class)
-    class_performance = list(
-        ClassRoom.objects.annotate(
-            avg_score=Avg('students__scores__score', output_field=FloatField())
-        )
-        .filter(avg_score__isnull=False)
-        .values('id', 'name', 'avg_score')
-        .order_by('-avg_score')
-    )
+    class_performance = class_averages()
 
     # Calculate School-Wide Average (from class averages)
     school_wide_avg = 0.0
@@ -1009,48 +897,35 @@ def analytics_dashboard(request):
         school_wide_avg = round(total / len(class_performance), 1)
 
     # 2. Top 10 Students Overall
-    top_students_list = list(
-        Student.objects.annotate(
-            avg_score=Avg('scores__score', output_field=FloatField()),
-            total_scores=Count('scores')
-        )
-        .filter(total_scores__gte=3, avg_score__isnull=False)
-        .order_by('-avg_score')[:10]
-        .values(
-            'user__first_name', 'user__last_name',
-            'roll_number', 'classroom__name',
-            'avg_score'
+    summary_fields = ('user__first_name', 'user__last_name', 'roll_number', 'classroom__name', 'avg_score')
+    top_students_list = [
+        dict(zip(summary_fields, row))
+        for row in overall_summaries().filter(score_count__gte=3).order_by('-average')[:10].values_list(
+            'student__user__first_name', 'student__user__last_name',
+            'student__roll_number', 'student__classroom__name',
+            'average'
         )
-    )
+    ]
 
     top_performer_avg = None
     if top_students_list:
         top_performer_avg = round(top_students_list[0]['avg_score'], 1)
 
     # 3. Bottom 10 Students (Needs Attention)
-    bottom_students = list(
-        Student.objects.annotate(
-            avg_score=Avg('scores__score', output_field=FloatField()),
-            total_scores=Count('scores')
-        )
-        .filter(total_scores__gte=1, avg_score__isnull=False)
-        .order_by('avg_score')[:10]
-        .values(
-            'user__first_name', 'user__last_name',
-            'roll_number', 'classroom__name',
-            'avg_score'
+    bottom_students = [
+        dict(zip(summary_fields, row))
+        for row in overall_summaries().filter(score_count__gte=1).order_by('average')[:10].values_list(
+            'student__user__first_name', 'student__user__last_name',
+            'student__roll_number', 'student__classroom__name',
+            'average'
         )
-    )
+    ]
 
     # 4. Subject Performance Radar
-    subjects_radar = list(
-        Subject.objects.annotate(
-            avg_score=Avg('scores__score', output_field=FloatField())
-        )
-        .filter(avg_score__isnull=False)
-        .values('name', 'avg_score')
-        .order_by('name')
-    )
+    subjects_radar = [
+        {'name': item['name'], 'avg_score': item['avg']}
+        for item in subject_averages()
+    ]
 
     # 5. 30-Day Attendance Trend
     end_date = timezone.localdate()
@@ -1060,10 +935,9 @@ def analytics_dashboard(request):
     total_present = 0
     total_absent = 0
 
-    current = start_date
-    while current <= end_date:
-        present = Attendance.objects.filter(date=current, status='present').count()
-        absent = Attendance.objects.filter(date=current, status='absent').count()
+    for current, counts in daily_attendance(start_date, end_date).items():
+        present = counts['present']
+        absent = counts['absent']
 
         total_present += present
         total_absent += absent
@@ -1075,7 +949,6 @@ def analytics_dashboard(request):
             'absent': absent,
             'total': present + absent,
         })
-        current += timedelta(days=1)
 
     # Attendance Rate
     total_attended = total_present + total_absent
@@ -1105,6 +978,11 @@ from django.db.models import Avg, Count, FloatField
 from django.shortcuts import render
 from django.core.serializers.json import DjangoJSONEncoder
 
+from django.http import JsonResponse
+
+from core.performance_matrix import DEFAULT_PAGE_SIZE, PerformanceMatrix
+from core.score_summary import overall_summaries, subject_averages as subject_averages_for
+
 @login_required
 def performance_dashboard(request):
     selected_grade = request.GET.get('grade')  # '' means All Grades
@@ -1142,51 +1020,34 @@ def performance_dashboard(request):
         if score_stats['total_scores'] > 0 else 0.0
     )
 
-    at_risk = students_qs.annotate(
-        student_avg=Avg('scores__score', output_field=FloatField())
-    ).filter(student_avg__lt=60).count()
+    # Summaries are read from StudentScoreSummary instead of re-averaging Score rows
+    summaries = overall_summaries(selected_classroom)
 
-    # === SUBJECT AVERAGES FOR RADAR CHART ===
-    subject_averages_qs = Subject.objects.annotate(
-        avg=Avg('scores__score', output_field=FloatField())
-    ).filter(avg__isnull=False)
+    at_risk = summaries.filter(average__lt=60).count()
 
-    if selected_grade:
-        subject_averages_qs = subject_averages_qs.filter(
-            scores__student__classroom=selected_classroom
-        ).distinct()
-
-    subject_averages = list(
-        subject_averages_qs.values('name', 'avg').order_by('name')
-    )
+    # === SUBJECT AVERAGES FOR RADAR CHART ===
+    subject_averages = subject_averages_for(selected_classroom)
     for item in subject_averages:
         item['avg'] = round(item['avg'] or 0, 1)
 
     # === TOP 10 & BOTTOM 10 STUDENTS ===
-    ranked_students = students_qs.annotate(
-        avg_score=Avg('scores__score', output_field=FloatField())
-    ).filter(avg_score__isnull=False).values(
-        'user__first_name', 'user__last_name',
-        'roll_number', 'avg_score',
-        'classroom__name'
-    ).order_by('-avg_score')
-
-    top_10 = []
-    bottom_10 = []
-
-    for s in ranked_students:
-        avg = round(s['avg_score'] or 0, 1)
-        student_data = {
-            'name': f"{s['user__first_name']} {s['user__last_name']}".strip(),
-            'roll_number': s['roll_number'] or '-',
-            'classroom': s['classroom__name'],
-            'avg': avg,
-        }
-        top_10.append(student_data)
-        bottom_10.insert(0, student_data)  # Efficient reverse
-
-    top_10 = top_10[:10]
-    bottom_10 = bottom_10[:10]
+    def ranked(order):
+        rows = summaries.order_by(order)[:10].values_list(
+            'student__user__first_name', 'student__user__last_name',
+            'student__roll_number', 'student__classroom__name', 'average'
+        )
+        return [
+            {
+                'name': f"{first} {last}".strip(),
+                'roll_number': roll_number or '-',
+                'classroom': classroom,
+                'avg': round(avg or 0, 1),
+            }
+            for first, last, roll_number, classroom, avg in rows
+        ]
+
+    top_10 = ranked('-average')
+    bottom_10 = ranked('average')
 
     # === GENDER DISTRIBUTION PIE CHART ===
     gender_data = list(
@@ -1202,36 +1063,8 @@ def performance_dashboard(request):
         gender_pie.append({'label': label, 'value': item['count']})
 
     # === STUDENT PERFORMANCE MATRIX ===
-    subjects = list(Subject.objects.all().order_by('name'))
-
-    relevant_scores = scores_qs.values(
-        'student_id', 'subject__name', 'score'
-    )
-
-    scores_by_student = {}
-    for sc in relevant_scores:
-        if sc['score'] is not None:
-            scores_by_student.setdefault(sc['student_id'], {})[sc['subject__name']] = float(sc['score'])
-
-    student_matrix = []
-    for student in students_qs:
-        student_scores = scores_by_student.get(student.id, {})
-        total = sum(student_scores.values())
-        count = len(student_scores)
-        average = round(total / count, 1) if count > 0 else 0.0
-
-        student_matrix.append({
-            'id': student.id,
-            'name': student.user.get_full_name() or student.user.username,
-            'roll_number': student.roll_number or '-',
-            'classroom': student.classroom.name if student.classroom else 'N/A',
-            'scores': student_scores,
-            'total': round(total, 1),
-            'average': average,
-        })
-
-    student_matrix.sort(key=lambda x: x['average'], reverse=True)
-    student_matrix = student_matrix[:200]  # Safe limit
+    # First page only — the table pages/sorts through performance_matrix_api
+    matrix_page = PerformanceMatrix.build(selected_classroom).page(1)
 
     # === CONTEXT ===
     context = {
@@ -1249,12 +1082,45 @@ def performance_dashboard(request):
         'bottom_10': json.dumps(bottom_10, cls=DjangoJSONEncoder),
         'gender_pie': json.dumps(gender_pie, cls=DjangoJSONEncoder),
 
-        'student_matrix': student_matrix,
-        'subjects': subjects,
+        'student_matrix': matrix_page['results'],
+        'subjects': matrix_page['subjects'],
+        'matrix_count': matrix_page['count'],
+        'matrix_num_pages': matrix_page['num_pages'],
     }
 
     return render(request, 'core/performance_dashboard.html', context)
 
+
+@login_required
+def performance_matrix_api(request):
+    """
+    JSON pages of the student × subject matrix.
+    ?grade=<classroom id>&page=1&page_size=50&sort=rank|average|total|name|roll_number|classroom|subject:<id>&order=asc|desc
+    """
+    classroom = None
+    grade = request.GET.get('grade')
+    if grade:
+        try:
+            classroom = ClassRoom.objects.get(id=grade)
+        except (ValueError, ClassRoom.DoesNotExist):
+            return JsonResponse({'error': 'Unknown grade'}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers'}, status=400)
+
+    sort = request.GET.get('sort', 'rank')
+    if sort not in PerformanceMatrix.SORT_KEYS and not sort.startswith('subject:'):
+        return JsonResponse({'error': f'Unknown sort "{sort}"'}, status=400)
+
+    order = request.GET.get('order')
+    descending = None if order not in ('asc', 'desc') else order == 'desc'
+
+    matrix = PerformanceMatrix.build(classroom)
+    return JsonResponse(matrix.page(page, page_size, sort, descending))
+
 from django.contrib.auth import login
 from django.contrib.auth.views import LoginView
 from django.shortcuts import redirect
@@ -0,0 +1,63 @@
+# jobs/management/commands/run_jobs.py
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import sweep, work
+
+
+def _worker(once, poll_interval, stop):
+    # Ctrl+C reaches every process in the group — let the parent set `stop` instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(once=once, poll_interval=poll_interval, stop=stop)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls of an empty queue")
+
+    def handle(self, *args, **options):
+        # Workers sweep again every SWEEP_INTERVAL while they run
+        requeued, released = sweep()
+        if requeued or released:
+            self.stdout.write(self.style.WARNING(
+                f"Requeued {requeued} job(s) left running by a dead worker, released {released} orphaned lock(s)."
+            ))
+
+        workers = max(1, options['workers'])
+        if workers == 1:
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+            ran = work(once=options['once'], poll_interval=options['poll_interval'], stop=stop)
+            self.stdout.write(self.style.SUCCESS(f"Worker stopped after {ran} job(s)."))
+            return
+
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        stop = multiprocessing.Event()
+        # Not daemonic: handlers may start process pools of their own (e.g. ID card batches)
+        processes = [
+            multiprocessing.Process(target=_worker, args=(options['once'], options['poll_interval'], stop))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {workers} workers.")
+
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write("Stopping — waiting for running jobs to finish…")
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("All workers stopped."))
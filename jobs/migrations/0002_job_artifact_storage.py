@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:12
+
+import jobs.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='artifact',
+            field=models.FileField(blank=True, storage=jobs.models.file_storage, upload_to='jobs/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# jobs/models.py — DATABASE-BACKED BACKGROUND JOBS
+#
+# A Job is one unit of heavy work (an export, a batch of PDFs, a bulk import)
+# queued by a view and executed by `manage.py run_jobs`. Workers claim queued
+# jobs with SELECT … FOR UPDATE SKIP LOCKED; on databases without it (SQLite)
+# they claim through JobLock, whose primary key lets only one worker insert
+# a lock row per job. See jobs/queue.py.
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import models
+from django.utils import timezone
+
+
+def file_storage():
+    """Shared storage for non-image files (settings.STORAGES['files']) — workers and web both reach it"""
+    return storages['files']
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=100)  # registered handler name, e.g. 'core.bulk_import'
+    title = models.CharField(max_length=200, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+
+    # Scheduling + retries
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    # Progress
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+
+    # Outcome
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    artifact = models.FileField(upload_to='jobs/%Y/%m/', storage=file_storage, blank=True)
+    artifact_name = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.title or self.kind} #{self.pk} ({self.get_status_display()})"
+
+    def delete(self, *args, **kwargs):
+        if self.artifact:
+            self.artifact.delete(save=False)
+        super().delete(*args, **kwargs)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.processed * 100 // self.total)
+
+    def set_progress(self, processed, total=None, message=None):
+        """Record progress from inside a handler — also serves as the worker's heartbeat"""
+        self.processed = processed
+        fields = {'processed': processed, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            self.total = fields['total'] = total
+        if message is not None:
+            self.message = fields['message'] = message[:255]
+        Job.objects.filter(pk=self.pk).update(**fields)
+
+    def save_artifact(self, filename, content):
+        """Store the job's downloadable output; content is a django File"""
+        if self.artifact:
+            self.artifact.delete(save=False)
+        self.artifact.save(f'{self.pk}-{os.path.basename(filename)}', content, save=False)
+        self.artifact_name = os.path.basename(filename)
+        Job.objects.filter(pk=self.pk).update(artifact=self.artifact.name, artifact_name=self.artifact_name)
+
+
+class JobLock(models.Model):
+    """Claim marker for databases without SKIP LOCKED — one row per running job"""
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='lock')
+    worker = models.CharField(max_length=100)
+    acquired_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Job #{self.job_id} held by {self.worker}"
@@ -0,0 +1,245 @@
+# jobs/queue.py — ENQUEUE, CLAIM, RUN
+#
+# Handlers are plain functions registered by name in an app's tasks.py:
+#
+#     @register('core.bulk_import', max_attempts=1)
+#     def bulk_import(job):
+#         ...
+#         job.set_progress(done, total)
+#         return {'summary': "...", 'errors': [...]}
+#
+# Views call enqueue() and hand the user jobs:job_detail to poll. Workers
+# (`manage.py run_jobs`) loop over claim() → run_job(). A failing job is
+# retried with exponential backoff until max_attempts, then marked failed.
+#
+# While a handler runs, a thread beats the job's heartbeat every
+# HEARTBEAT_INTERVAL, and every worker sweeps the queue every SWEEP_INTERVAL:
+# running jobs without a heartbeat for STALE_AFTER go back in the queue, and
+# lock rows left by a worker that died mid-claim are removed.
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job, JobLock
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 30  # seconds before the first retry; doubles with every attempt
+STALE_AFTER = timedelta(minutes=10)  # running jobs silent for longer are presumed dead
+HEARTBEAT_INTERVAL = 60  # seconds between heartbeats of a running job
+SWEEP_INTERVAL = 60  # seconds between a worker's sweeps for stale jobs
+LOCK_GRACE = timedelta(minutes=1)  # a lock row on a queued job older than this is orphaned
+CLAIM_CANDIDATES = 10  # jobs a lock-table worker tries per claim
+
+_handlers = {}
+
+
+def register(kind, max_attempts=3):
+    """Decorator registering a job handler under `kind`"""
+    def decorator(func):
+        _handlers[kind] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, title='', run_after=None):
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for '{kind}'")
+    return Job.objects.create(
+        kind=kind,
+        title=title,
+        payload=payload or {},
+        created_by=user,
+        max_attempts=_handlers[kind][1],
+        run_after=run_after or timezone.now(),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ─────────────────────────────────────
+# CLAIM
+# ─────────────────────────────────────
+def _due():
+    return Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now()).order_by('run_after', 'id')
+
+
+def _mark_running(queryset, worker):
+    now = timezone.now()
+    return queryset.update(
+        status=Job.RUNNING, locked_by=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+    )
+
+
+def _claim_skip_locked(worker):
+    with transaction.atomic():
+        job = _due().select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        _mark_running(Job.objects.filter(pk=job.pk), worker)
+    return Job.objects.get(pk=job.pk)
+
+
+def _claim_with_lock_table(worker):
+    for job_id in _due().values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+        try:
+            with transaction.atomic():
+                JobLock.objects.create(job_id=job_id, worker=worker)
+        except IntegrityError:
+            continue  # another worker holds it
+        # The job may have been finished by the previous lock holder since we read it
+        if _mark_running(Job.objects.filter(pk=job_id, status=Job.QUEUED), worker):
+            return Job.objects.get(pk=job_id)
+        JobLock.objects.filter(job_id=job_id, worker=worker).delete()
+    return None
+
+
+def claim(worker=None):
+    """Take the next due job for this worker, or None if there is nothing to do"""
+    worker = worker or worker_name()
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_skip_locked(worker)
+    return _claim_with_lock_table(worker)
+
+
+# ─────────────────────────────────────
+# RUN
+# ─────────────────────────────────────
+def _release(job, **fields):
+    """Record the outcome — unless the job was requeued as stale and someone else holds it now"""
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(locked_by='', **fields)
+    JobLock.objects.filter(job_id=job.pk, worker=job.locked_by).delete()
+
+
+def _retry_or_fail(job, error):
+    if job.attempts < job.max_attempts:
+        delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+        _release(job, status=Job.QUEUED, error=error, run_after=timezone.now() + timedelta(seconds=delay))
+    else:
+        _release(job, status=Job.FAILED, error=error, finished_at=timezone.now())
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome"""
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        _release(job, status=Job.FAILED, error=f"No job handler registered for '{job.kind}'", finished_at=timezone.now())
+        return
+    try:
+        with Heartbeat(job):
+            result = handler[0](job)
+    except Exception:
+        _retry_or_fail(job, traceback.format_exc())
+    else:
+        _release(job, status=Job.DONE, result=result, error='', finished_at=timezone.now())
+
+
+class Heartbeat:
+    """Context manager beating a running job's heartbeat from a thread, however quiet the handler is"""
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-{job.pk}-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def beat(self):
+        Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, locked_by=self.job.locked_by).update(
+            heartbeat_at=timezone.now()
+        )
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.beat()
+                except OperationalError:
+                    pass  # e.g. SQLite busy — the next beat will do
+        finally:
+            connection.close()  # this thread's own connection
+
+
+# ─────────────────────────────────────
+# RECOVERY
+# ─────────────────────────────────────
+def requeue_stale(stale_after=STALE_AFTER):
+    """Put running jobs whose worker stopped sending heartbeats back in the queue"""
+    cutoff = timezone.now() - stale_after
+    requeued = 0
+    for job in Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff):
+        # Only if it is still silent — a late heartbeat or a finish wins
+        if Job.objects.filter(pk=job.pk, status=Job.RUNNING, heartbeat_at__lt=cutoff).exists():
+            _retry_or_fail(job, f"Worker {job.locked_by} stopped responding")
+            requeued += 1
+    return requeued
+
+
+def release_orphaned_locks(grace=LOCK_GRACE):
+    """
+    Delete JobLock rows nobody will release: on queued jobs, left by a worker
+    that died between taking the lock and marking the job running, and on
+    finished jobs. Returns how many were deleted.
+    """
+    cutoff = timezone.now() - grace
+    deleted, _ = JobLock.objects.filter(
+        job__status__in=[Job.QUEUED, Job.DONE, Job.FAILED], acquired_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+def sweep():
+    """requeue_stale() + release_orphaned_locks(), logged"""
+    requeued, released = requeue_stale(), release_orphaned_locks()
+    if requeued or released:
+        logger.warning("Requeued %d stale job(s), released %d orphaned lock(s)", requeued, released)
+    return requeued, released
+
+
+def work(worker=None, once=False, poll_interval=1.0, stop=None):
+    """
+    Worker loop: claim and run jobs until `stop` (an Event) is set.
+    once=True returns as soon as the queue is empty. Returns the number of jobs run.
+    """
+    worker = worker or worker_name()
+    ran = 0
+    swept_at = float('-inf')
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        if time.monotonic() - swept_at >= SWEEP_INTERVAL:
+            try:
+                sweep()
+            except OperationalError:
+                pass  # another worker is writing — sweep next time
+            swept_at = time.monotonic()
+        try:
+            job = claim(worker)
+        except OperationalError:
+            job = None  # e.g. SQLite busy under several workers — try again shortly
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        ran += 1
+    close_old_connections()
+    return ran
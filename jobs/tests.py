@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job, JobLock
+from jobs.queue import (
+    STALE_AFTER, Heartbeat, _release, claim, enqueue, register, release_orphaned_locks, requeue_stale, run_job, work,
+)
+
+calls = []
+
+
+@register('jobs.tests.ok')
+def ok(job):
+    calls.append(job.pk)
+    return {'summary': 'done'}
+
+
+@register('jobs.tests.fail', max_attempts=2)
+def fail(job):
+    raise RuntimeError('boom')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_a_job_is_claimed_once(self):
+        job = enqueue('jobs.tests.ok')
+        claimed = claim('worker-1')
+        self.assertEqual((claimed.pk, claimed.status, claimed.locked_by), (job.pk, Job.RUNNING, 'worker-1'))
+        self.assertIsNone(claim('worker-2'))
+
+    def test_a_locked_job_is_skipped(self):
+        job = enqueue('jobs.tests.ok')
+        JobLock.objects.create(job=job, worker='worker-1')  # worker-1 is between lock and _mark_running
+        self.assertIsNone(claim('worker-2'))
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        job = enqueue('jobs.tests.fail')
+        run_job(claim('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertFalse(JobLock.objects.exists())
+        self.assertIsNone(claim('worker-1'))  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_job(claim('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_success(self):
+        job = enqueue('jobs.tests.ok')
+        self.assertEqual(work(worker='worker-1', once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, calls), (Job.DONE, {'summary': 'done'}, [job.pk]))
+
+    def test_silent_job_is_requeued_and_its_old_worker_cannot_finish_it(self):
+        job = enqueue('jobs.tests.ok')
+        stale = claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1))
+
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.QUEUED, ''))
+        self.assertIn('worker-1 stopped responding', job.error)
+
+        _release(stale, status=Job.DONE)  # the presumed-dead worker finishes after all
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_heartbeat_keeps_a_quiet_job_alive(self):
+        job = enqueue('jobs.tests.ok')
+        running = claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1))
+        Heartbeat(running).beat()
+        self.assertEqual(requeue_stale(), 0)
+
+    def test_worker_loop_sweeps_stale_jobs(self):
+        job = enqueue('jobs.tests.ok')
+        claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1))
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            work(worker='worker-2', once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)  # requeued, waiting out its retry delay
+
+    def test_orphaned_lock_is_released(self):
+        job = enqueue('jobs.tests.ok')
+        JobLock.objects.create(job=job, worker='worker-1')
+        JobLock.objects.filter(job=job).update(acquired_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(release_orphaned_locks(), 1)
+        self.assertEqual(claim('worker-2').pk, job.pk)
@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import job_detail, job_status, job_download
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('<int:job_id>/', job_detail, name='job_detail'),
+    path('<int:job_id>/status/', job_status, name='job_status'),
+    path('<int:job_id>/download/', job_download, name='job_download'),
+]
@@ -0,0 +1,52 @@
+# jobs/views.py — JOB STATUS, POLLING + DOWNLOADS
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+
+from .models import Job
+
+
+def _visible_job(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise Http404("No such job")
+    return job
+
+
+def job_json(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'title': job.title,
+        'status': job.status,
+        'processed': job.processed,
+        'total': job.total,
+        'percent': job.percent,
+        'message': job.message,
+        'attempts': job.attempts,
+        'result': job.result,
+        # Only the last line of a traceback is meant for users
+        'error': job.error.strip().splitlines()[-1] if job.error.strip() else '',
+        'download_url': reverse('jobs:job_download', args=[job.id]) if job.artifact else None,
+    }
+
+
+@login_required
+def job_detail(request, job_id):
+    job = _visible_job(request, job_id)
+    return render(request, 'jobs/job_detail.html', {'job': job})
+
+
+@login_required
+def job_status(request, job_id):
+    job = _visible_job(request, job_id)
+    return JsonResponse(job_json(job))
+
+
+@login_required
+def job_download(request, job_id):
+    job = _visible_job(request, job_id)
+    if not job.artifact:
+        raise Http404("This job has no file to download")
+    return FileResponse(job.artifact.open('rb'), as_attachment=True, filename=job.artifact_name)
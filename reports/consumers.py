@@ -0,0 +1,49 @@
+# reports/consumers.py — LIVE NOTIFICATIONS
+#
+# One socket per open page. It joins the user's own group plus one group per
+# audience that can include them (see reports/notifications.py), so a
+# broadcast reaches every socket with a single group_send. The unread count
+# is sent on connect and kept current from the cached counter.
+
+import json
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from reports.notifications import bump_unread, unread_count, user_groups
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.groups_joined = await database_sync_to_async(user_groups)(self.user)
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+        await self.send_count(await database_sync_to_async(unread_count)(self.user))
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, 'groups_joined', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def send_count(self, count):
+        await self.send(text_data=json.dumps({'type': 'unread_count', 'count': count}))
+
+    async def notification_created(self, event):
+        notification = event['notification']
+        count = await sync_to_async(bump_unread)(self.user.id, notification['id'], event['previous_id'])
+        if count is None:
+            count = await database_sync_to_async(unread_count)(self.user)
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': notification,
+            'count': count,
+        }))
+
+    async def unread_count(self, event):
+        await self.send_count(event['count'])
@@ -0,0 +1,92 @@
+# reports/id_card_render.py — ID CARD DRAWING (no ORM access)
+#
+# Everything here works on plain card dicts — {'name', 'roll_number',
+# 'classroom', 'section', 'qr'} and PNG bytes, so the functions can run in a
+# process pool. QR images come from core/qr_cache.py; the parent process looks
+# them up (rendering only the misses) and lays the cards out ten to an A4 sheet.
+
+from io import BytesIO
+
+from core.qr_cache import render_qr_png
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+CARD_WIDTH, CARD_HEIGHT = 3.5 * inch, 2.2 * inch
+
+# A4 sheet: 2 × 5 cards, centred
+SHEET_COLUMNS, SHEET_ROWS = 2, 5
+CARDS_PER_SHEET = SHEET_COLUMNS * SHEET_ROWS
+SHEET_MARGIN_X = (A4[0] - SHEET_COLUMNS * CARD_WIDTH) / 2
+SHEET_MARGIN_Y = (A4[1] - SHEET_ROWS * CARD_HEIGHT) / 2
+
+
+def draw_card(p, x, y, card, qr):
+    """Draw one card with its lower-left corner at (x, y); qr is PNG bytes"""
+    # Background
+    p.setFillColorRGB(0.05, 0.05, 0.2)
+    p.rect(x, y, CARD_WIDTH, CARD_HEIGHT, fill=1)
+
+    # Title
+    p.setFillColor(colors.white)
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(x + 0.7 * inch, y + 1.8 * inch, "ELITE SCHOOL 2025")
+
+    # Student Data
+    p.setFont("Helvetica-Bold", 11)
+    p.drawString(x + 0.7 * inch, y + 1.5 * inch, card['name'])
+
+    p.setFont("Helvetica", 10)
+    p.drawString(x + 0.7 * inch, y + 1.3 * inch, f"Roll: {card['roll_number']}")
+    p.drawString(x + 0.7 * inch, y + 1.1 * inch, f"Class: {card['classroom']}")
+    if card['section']:
+        p.drawString(x + 0.7 * inch, y + 0.9 * inch, f"Section: {card['section']}")
+
+    p.drawImage(ImageReader(BytesIO(qr)), x + 2.3 * inch, y + 0.7 * inch, width=1 * inch, height=1 * inch)
+
+
+def card_pdf(card, qr=None):
+    """A single card as its own card-sized PDF"""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=(CARD_WIDTH, CARD_HEIGHT))
+    draw_card(p, 0, 0, card, qr or render_qr_png(card['qr']))
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def card_filename(card):
+    return f"{card['roll_number']}_ID_Card.pdf"
+
+
+# ─────────────────────────────────────
+# POOL TASK — one chunk of (card, qr) pairs per call
+# ─────────────────────────────────────
+def render_pdf_chunk(cards):
+    return [(card_filename(card), card_pdf(card, qr)) for card, qr in cards]
+
+
+class SheetWriter:
+    """Lays cards out CARDS_PER_SHEET to an A4 page as they arrive"""
+
+    def __init__(self, output):
+        self.canvas = canvas.Canvas(output, pagesize=A4)
+        self.count = 0
+
+    def add(self, card, qr):
+        slot = self.count % CARDS_PER_SHEET
+        if self.count and not slot:
+            self.canvas.showPage()
+        column, row = slot % SHEET_COLUMNS, slot // SHEET_COLUMNS
+        x = SHEET_MARGIN_X + column * CARD_WIDTH
+        y = A4[1] - SHEET_MARGIN_Y - (row + 1) * CARD_HEIGHT  # fill from the top of the page
+        draw_card(self.canvas, x, y, card, qr)
+        self.count += 1
+
+    def close(self):
+        if not self.count:
+            self.canvas.drawString(inch, A4[1] - inch, "No students selected.")
+        self.canvas.showPage()
+        self.canvas.save()
@@ -0,0 +1,106 @@
+# reports/id_cards.py — BATCH ID CARDS FOR A CLASS, SECTION OR LIST OF STUDENTS
+#
+# Student data is read once into plain card dicts and their QR codes are taken
+# from the QR cache (core/qr_cache.py — misses are rendered on a process
+# pool). The cards are then written in order: either one PDF of A4 sheets, or
+# a ZIP with one PDF per student rendered in chunks on the pool
+# (reports/id_card_render.py). Runs as the 'reports.id_cards' job from
+# the web, or directly through `manage.py generate_id_cards`.
+
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from core.models import Student
+from core.qr_cache import qr_pngs
+from reports.id_card_render import SheetWriter, render_pdf_chunk
+
+CHUNK_SIZE = 50  # cards per pool task
+FORMATS = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+
+
+def select_students(classroom=None, section=None, student_ids=None):
+    """Students matching any combination of filters — at least one is required"""
+    if not (classroom or section or student_ids):
+        raise ValueError("Choose a class, a section or a list of students.")
+    students = Student.objects.all()
+    if classroom:
+        students = students.filter(classroom_id=classroom)
+    if section:
+        students = students.filter(section_id=section)
+    if student_ids:
+        students = students.filter(id__in=student_ids)
+    return students
+
+
+def parse_student_ids(value):
+    """'12, 15,18' → [12, 15, 18]; raises ValueError on anything else"""
+    try:
+        return [int(part) for part in str(value or '').replace(' ', '').split(',') if part]
+    except ValueError:
+        raise ValueError(f"Invalid student id list: {value}")
+
+
+def card_data(students):
+    """Plain, picklable card dicts — one query"""
+    rows = students.order_by('classroom__name', 'section__name', 'roll_number').values_list(
+        'user__first_name', 'user__last_name', 'roll_number', 'classroom__name', 'section__name',
+    )
+    cards = []
+    for first_name, last_name, roll_number, classroom, section in rows:
+        name = f"{first_name} {last_name}".strip()
+        cards.append({
+            'name': name,
+            'roll_number': roll_number,
+            'classroom': classroom,
+            'section': f"{classroom} - {section}" if section else '',  # as Section.__str__
+            'qr': f"Student: {name}\nRoll: {roll_number}\nClass: {classroom}",
+        })
+    return cards
+
+
+def _map_chunks(func, chunks, workers):
+    """func over chunks in order — on a process pool when more than one worker is available"""
+    if workers <= 1 or len(chunks) <= 1:
+        return map(func, chunks), None
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+    return pool.map(func, chunks), pool
+
+
+def render_id_cards(cards, output, export_format='pdf', workers=None, on_progress=None):
+    """
+    Write cards to `output` (a path or binary file) as an A4 sheet PDF or a ZIP
+    of per-student PDFs. Returns the number of cards written.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown format: {export_format}")
+    workers = workers or os.cpu_count() or 1
+    pairs = list(zip(cards, qr_pngs([card['qr'] for card in cards], workers=workers)))
+    chunks = [pairs[start:start + CHUNK_SIZE] for start in range(0, len(pairs), CHUNK_SIZE)]
+
+    done = 0
+    if export_format == 'pdf':
+        sheets = SheetWriter(output)
+        for chunk in chunks:
+            for card, qr in chunk:
+                sheets.add(card, qr)
+            done += len(chunk)
+            if on_progress:
+                on_progress(done)
+        sheets.close()
+        return done
+
+    results, pool = _map_chunks(render_pdf_chunk, chunks, workers)
+    try:
+        # Card PDFs are already compressed — store them as they are
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for chunk, files in zip(chunks, results):
+                for filename, content in files:
+                    archive.writestr(filename, content)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return done
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_read_rows_only(apps, schema_editor):
+    # Unread is now the default: the per-recipient rows written at send time go,
+    # rows for notifications already read stay as read markers
+    NotificationRead = apps.get_model('reports', 'NotificationRead')
+    NotificationRead.objects.filter(is_read=False).delete()
+    NotificationRead.objects.filter(read_at__isnull=True).update(read_at=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_alter_notification_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_read_rows_only, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notificationread',
+            name='is_read',
+        ),
+        migrations.AlterField(
+            model_name='notificationread',
+            name='read_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.CreateModel(
+            name='NotificationWatermark',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_watermark', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('read_up_to', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_type', 'created_at'], name='reports_not_recipie_847f09_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['specific_class', 'recipient_type'], name='reports_not_specifi_eb7c43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['specific_user', 'recipient_type'], name='reports_not_specifi_33db8b_idx'),
+        ),
+    ]
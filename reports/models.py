@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from core.models import ClassRoom
 
@@ -37,10 +37,26 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Audience lookups in reports/notifications.py: broadcast / role rows by type,
+            # class and individual rows through their foreign keys
+            models.Index(fields=['recipient_type', 'created_at']),
+            models.Index(fields=['specific_class', 'recipient_type']),
+            models.Index(fields=['specific_user', 'recipient_type']),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_recipient_type_display()})"
 
+    def save(self, *args, **kwargs):
+        from reports.notifications import push_notification
+
+        created = self.pk is None
+        super().save(*args, **kwargs)
+        if created:
+            # Pushed once the row is visible to the readers it announces itself to
+            transaction.on_commit(lambda: push_notification(self), robust=True)
+
     def get_recipients(self):
         """Returns queryset of users who should receive this notification"""
         if self.recipient_type == 'all':
@@ -57,14 +73,27 @@ class Notification(models.Model):
 
 
 class NotificationRead(models.Model):
+    """
+    Read marker — a row exists only for a notification the user has read and
+    that is newer than their NotificationWatermark. Unread is the default.
+    """
     notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='read_by')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    is_read = models.BooleanField(default=False)
-    read_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('notification', 'user')
         verbose_name = "Notification Read Status"
 
     def __str__(self):
-        return f"{self.user} read '{self.notification.title}'"
\ No newline at end of file
+        return f"{self.user} read '{self.notification.title}'"
+
+
+class NotificationWatermark(models.Model):
+    """Every notification with id <= read_up_to counts as read for this user ("mark all read")"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_watermark')
+    read_up_to = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} read up to #{self.read_up_to}"
@@ -0,0 +1,248 @@
+# reports/notifications.py — NOTIFICATION AUDIENCES AND READ STATE
+#
+# Sending a notification writes one Notification row, whoever it is for. Who
+# sees it is decided at read time from recipient_type: every user ('all'),
+# a role ('students' / 'teachers'), the students of specific_class ('class')
+# or specific_user ('individual') — limited to notifications sent after the
+# user joined, as when recipients were fanned out at send time.
+#
+# Read state is sparse: a NotificationWatermark per user ("everything up to
+# id N is read", moved by mark-all-read) plus a NotificationRead marker for
+# each notification read individually above the watermark. Unread is the
+# default, so neither a broadcast nor a new user writes anything.
+#
+# Unread counts are cached per user as (latest notification id seen, count)
+# and topped up with a query for the newer ids only, so a dashboard reads the
+# cache instead of recounting. Ids can commit out of order: a notification
+# committing below the latest id already announced may have been skipped by
+# a top-up, so instead of moving the latest id it starts a new generation of
+# cached counts, and each user recounts once. New notifications are pushed over Channels
+# (reports/consumers.py) to one group per audience — notifications.all,
+# notifications.role.<role>, notifications.class.<id>, notifications.user.<id>
+# — so a broadcast is a single group_send, not one per recipient.
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+
+from core.models import Student
+from reports.models import Notification, NotificationRead, NotificationWatermark
+
+logger = logging.getLogger(__name__)
+
+LATEST_KEY = 'notifications:latest'
+GENERATION_KEY = 'notifications:generation'
+UNREAD_TIMEOUT = 10 * 60  # backstop for changes that bypass this module (admin deletes)
+AUDIENCE_GROUPS = {'all': 'notifications.all', 'students': 'notifications.role.student', 'teachers': 'notifications.role.teacher'}
+
+
+def audience_filter(user):
+    """Q matching the notifications addressed to `user`"""
+    q = Q(recipient_type='all') | Q(recipient_type='individual', specific_user=user)
+    if user.role == 'teacher':
+        q |= Q(recipient_type='teachers')
+    elif user.role == 'student':
+        q |= Q(recipient_type='students')
+        classroom_id = Student.objects.filter(user=user).values_list('classroom_id', flat=True).first()
+        if classroom_id:
+            q |= Q(recipient_type='class', specific_class_id=classroom_id)
+    return q
+
+
+def visible_notifications(user):
+    return Notification.objects.filter(audience_filter(user), created_at__gte=user.date_joined)
+
+
+def watermark(user):
+    return NotificationWatermark.objects.filter(user=user).values_list('read_up_to', flat=True).first() or 0
+
+
+def unread_notifications(user, read_up_to=None):
+    read_up_to = watermark(user) if read_up_to is None else read_up_to
+    return visible_notifications(user).filter(id__gt=read_up_to).exclude(
+        Exists(NotificationRead.objects.filter(notification=OuterRef('pk'), user=user))
+    )
+
+
+# ─────────────────────────────────────
+# CACHED UNREAD COUNTS
+# ─────────────────────────────────────
+def _unread_key(user_id):
+    return f'notifications:unread:{cache.get(GENERATION_KEY, 0)}:{user_id}'
+
+
+def _invalidate_counts():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def latest_notification_id():
+    latest = cache.get(LATEST_KEY)
+    if latest is None:
+        latest = Notification.objects.aggregate(latest=Max('id'))['latest'] or 0
+        cache.set(LATEST_KEY, latest, UNREAD_TIMEOUT)
+    return latest
+
+
+def unread_count(user):
+    """
+    Cached unread count. No query while nothing new has been sent; otherwise
+    only notifications newer than the cached entry are counted.
+    """
+    latest = latest_notification_id()
+    entry = cache.get(_unread_key(user.id))
+    if entry is not None and entry[0] == latest:
+        return entry[1]
+    if entry is not None and entry[0] < latest:
+        count = entry[1] + unread_notifications(user).filter(id__gt=entry[0]).count()
+    else:
+        count = unread_notifications(user).count()
+    cache.set(_unread_key(user.id), (latest, count), UNREAD_TIMEOUT)
+    return count
+
+
+def bump_unread(user_id, notification_id, previous_id):
+    """
+    Count a pushed notification without a query — only when the cached entry
+    is exactly up to the notification sent before it. Returns the new count,
+    or None when unread_count() has to top the entry up itself.
+    """
+    key = _unread_key(user_id)
+    entry = cache.get(key)
+    if entry is None or entry[0] != previous_id:
+        return None
+    count = entry[1] + 1
+    cache.set(key, (notification_id, count), UNREAD_TIMEOUT)
+    return count
+
+
+def _count_read(user_id, notification_id):
+    """One notification was read — take it off the cached count if the entry included it"""
+    key = _unread_key(user_id)
+    entry = cache.get(key)
+    if entry is not None and notification_id <= entry[0]:
+        cache.set(key, (entry[0], max(entry[1] - 1, 0)), UNREAD_TIMEOUT)
+
+
+def _push_count(user_id, count):
+    _send(user_group(user_id), {'type': 'unread.count', 'count': count})
+
+
+def notifications_for(user):
+    """
+    Visible notifications, newest first, each with .is_read set — sender and
+    class loaded. Returns (notifications, unread_count).
+    """
+    read_up_to = watermark(user)
+    notifications = list(
+        visible_notifications(user).select_related('sender', 'specific_class').annotate(
+            has_marker=Exists(NotificationRead.objects.filter(notification=OuterRef('pk'), user=user))
+        ).order_by('-created_at', '-id')
+    )
+    unread = 0
+    for notification in notifications:
+        notification.is_read = notification.id <= read_up_to or notification.has_marker
+        unread += not notification.is_read
+    return notifications, unread
+
+
+def mark_read(user, notification_id):
+    """Mark one visible notification read; False if it is not addressed to the user"""
+    notification = visible_notifications(user).filter(id=notification_id).values_list('id', flat=True).first()
+    if notification is None:
+        return False
+    if notification > watermark(user):
+        _, created = NotificationRead.objects.get_or_create(notification_id=notification, user=user)
+        if created:
+            _count_read(user.id, notification)
+            _push_count(user.id, unread_count(user))
+    return True
+
+
+def mark_all_read(user):
+    """Move the user's watermark past every visible notification; returns how many were unread"""
+    with transaction.atomic():
+        read_up_to = watermark(user)
+        newly_read = unread_notifications(user, read_up_to).count()
+        latest = visible_notifications(user).aggregate(latest=Max('id'))['latest'] or 0
+        if latest > read_up_to:
+            NotificationWatermark.objects.update_or_create(user=user, defaults={'read_up_to': latest})
+            # Markers at or below the watermark say nothing any more
+            NotificationRead.objects.filter(user=user, notification_id__lte=latest).delete()
+    # Nothing unread up to `latest`; anything newer is counted on the next read
+    cache.set(_unread_key(user.id), (max(latest, read_up_to), 0), UNREAD_TIMEOUT)
+    _push_count(user.id, 0)
+    return newly_read
+
+
+# ─────────────────────────────────────
+# PUSH
+# ─────────────────────────────────────
+def user_group(user_id):
+    return f'notifications.user.{user_id}'
+
+
+def user_groups(user):
+    """Every group a user's socket joins — one per audience that can include them"""
+    groups = [user_group(user.id), AUDIENCE_GROUPS['all']]
+    if user.role in ('student', 'teacher'):
+        groups.append(f'notifications.role.{user.role}')
+    if user.role == 'student':
+        classroom_id = Student.objects.filter(user=user).values_list('classroom_id', flat=True).first()
+        if classroom_id:
+            groups.append(f'notifications.class.{classroom_id}')
+    return groups
+
+
+def audience_group(notification):
+    if notification.recipient_type == 'class':
+        return f'notifications.class.{notification.specific_class_id}' if notification.specific_class_id else None
+    if notification.recipient_type == 'individual':
+        return user_group(notification.specific_user_id) if notification.specific_user_id else None
+    return AUDIENCE_GROUPS.get(notification.recipient_type)
+
+
+def notification_json(notification):
+    sender = notification.sender
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'recipient_type': notification.get_recipient_type_display(),
+        'sender': (sender.get_full_name() or sender.username) if sender else 'System',
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _send(group, event):
+    if group is None:
+        return
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(group, event)
+    except Exception:
+        # Pushing is best effort — the page still shows it on the next load
+        logger.warning("Could not push %s to %s", event['type'], group, exc_info=True)
+
+
+def push_notification(notification):
+    """Announce a committed notification to its audience group; called by Notification.save()"""
+    previous = latest_notification_id()
+    if notification.id > previous:
+        cache.set(LATEST_KEY, notification.id, UNREAD_TIMEOUT)
+    else:
+        # Committed after a later id: cached entries may already be past it
+        _invalidate_counts()
+        previous = None  # nothing to bump — every socket recounts
+    _send(audience_group(notification), {
+        'type': 'notification.created',
+        'notification': notification_json(notification),
+        'previous_id': previous,
+    })
@@ -0,0 +1,68 @@
+# reports/report_card_render.py — REPORT CARD DRAWING (no ORM access)
+#
+# Works on plain report-card dicts — {'name', 'roll_number', 'classroom',
+# 'section', 'rows': [[subject, exam type, marks, grade], ...]} —
+# so whole classes can be rendered in a process pool (reports/report_cards.py).
+
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#003366')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 1.5, colors.black),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 14),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f0f8ff')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f8ff')]),
+])
+
+
+def report_card_pdf(card):
+    """One student's official report card as a one-page A4 PDF"""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # Header
+    p.setFillColorRGB(0, 0.2, 0.4)
+    p.rect(0, height - 110, width, 110, fill=1)
+    p.setFillColor(colors.white)
+    p.setFont("Helvetica-Bold", 32)
+    p.drawCentredString(width / 2, height - 60, "ELITE INTERNATIONAL SCHOOL")
+    p.setFont("Helvetica-Bold", 20)
+    p.drawCentredString(width / 2, height - 95, "OFFICIAL REPORT CARD • 2025")
+
+    # Student Info
+    p.setFillColor(colors.black)
+    p.setFont("Helvetica-Bold", 16)
+    y = height - 150
+    p.drawString(50, y, f"Student: {card['name']}")
+    p.drawString(50, y - 30, f"Roll No: {card['roll_number']}")
+    p.drawString(50, y - 60, f"Class: {card['classroom']} | Section: {card['section']}")
+
+    # Table
+    data = [['Subject', 'Exam Type', 'Marks', 'Grade']] + (card['rows'] or [['-', 'No scores recorded', '-', '-']])
+    table = Table(data, colWidths=[180, 130, 80, 80])
+    table.setStyle(TABLE_STYLE)
+    table.wrapOn(p, width, height)
+    table.drawOn(p, 50, height - 600)
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def report_card_filename(card):
+    return f"{card['roll_number']}_Report_Card_2025.pdf"
+
+
+def render_report_chunk(cards):
+    """Pool task — one chunk of cards per call"""
+    return [report_card_pdf(card) for card in cards]
@@ -0,0 +1,243 @@
+# reports/report_cards.py — REPORT CARDS: BATCHES, CACHES AND HTTP VALIDATORS
+#
+# Report cards are built from plain dicts: the student's details plus their
+# Score rows. Every Score write bumps Student.score_version (see
+# core/score_summary.py), so a card's details + version + a digest of the
+# subject names it may print identify its content without reading a single
+# score (nothing else goes on the card — no generation date):
+#   - PDFs are cached on disk under that key (core/file_cache.py); only the
+#     misses load their scores, and they are rendered in chunks on a process
+#     pool (reports/report_card_render.py)
+#   - the on-screen report card context is cached in the Django cache under
+#     the same key plus the classroom's subject list
+#   - the PDF download sends it as an ETag (with Last-Modified =
+#     scores_updated_at), so repeat downloads become 304s. The HTML pages
+#     get no validators: they also show badges and flash messages, which the
+#     score version knows nothing about.
+# Batches are merged into one PDF or stored in a ZIP with one PDF per student,
+# and run as the 'reports.report_cards' job for large selections.
+
+import calendar
+import hashlib
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.cache import cache as django_cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from pypdf import PdfWriter
+
+from core.file_cache import FileCache
+from core.models import Score, Subject
+from reports.report_card_render import render_report_chunk, report_card_filename
+from student.dashboard import get_letter_grade
+
+CHUNK_SIZE = 20  # cards per pool task
+FORMATS = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+REPORT_CARD_JOB_THRESHOLD = 200  # bigger selections are rendered by run_jobs
+REPORT_CARD_CACHE_MAX_BYTES = 256 * 1024 * 1024
+CONTEXT_TIMEOUT = 24 * 60 * 60
+KEY_VERSION = 3  # bump when report_card_pdf's layout or the card fields change
+KEY_FIELDS = ('student_id', 'name', 'roll_number', 'classroom', 'section', 'version', 'subjects')
+SCREEN_EXAMS = ('midterm', 'final', 'quiz', 'assignment')  # columns of the on-screen report card
+
+cache = FileCache('report-cards', REPORT_CARD_CACHE_MAX_BYTES, suffix='.pdf')
+
+
+def subject_names_digest():
+    """Digest of every subject's name — score rows print them, so a rename must change the key (one query)"""
+    names = list(Subject.objects.order_by('id').values_list('id', 'name'))
+    return hashlib.sha256(json.dumps(names).encode()).hexdigest()[:16]
+
+
+def _card(student_id, first_name, last_name, roll_number, classroom, section, version, updated_at, subjects):
+    return {
+        'student_id': student_id,
+        'name': f"{first_name} {last_name}".strip(),
+        'roll_number': roll_number,
+        'classroom': classroom or 'N/A',
+        'section': f"{classroom} - {section}" if section else 'N/A',  # as Section.__str__
+        'version': version,
+        'updated_at': updated_at,
+        'subjects': subjects,
+    }
+
+
+def student_card(student):
+    """Card header for a Student instance (load it with user, classroom and section)"""
+    return _card(
+        student.id, student.user.first_name, student.user.last_name, student.roll_number,
+        student.classroom.name if student.classroom else None,
+        student.section.name if student.section else None,
+        student.score_version, student.scores_updated_at, subject_names_digest(),
+    )
+
+
+def report_card_data(students):
+    """
+    Plain, picklable report-card headers in class / section / roll order — two
+    queries. Scores are attached by report_card_pdfs() for the cards it must render.
+    """
+    rows = students.order_by('classroom__name', 'section__name', 'roll_number').values_list(
+        'id', 'user__first_name', 'user__last_name', 'roll_number', 'classroom__name', 'section__name',
+        'score_version', 'scores_updated_at',
+    )
+    subjects = subject_names_digest()
+    return [_card(*row, subjects) for row in rows]
+
+
+def attach_scores(cards):
+    """Fill in each card's score rows — one query"""
+    exam_types = dict(Score.EXAM_TYPES)
+    by_student = {}
+    for card in cards:
+        card['rows'] = []
+        by_student[card['student_id']] = card
+
+    scores = Score.objects.filter(student_id__in=by_student).order_by('student_id', '-recorded_at').values_list(
+        'student_id', 'subject__name', 'exam_type', 'score', 'grade',
+    )
+    for student_id, subject, exam_type, score, grade in scores:
+        by_student[student_id]['rows'].append([subject, exam_types.get(exam_type, exam_type), str(score), grade or '-'])
+
+
+def report_card_key(card):
+    """Student details + score version + subject names — changes whenever anything printed on the card does"""
+    raw = json.dumps([KEY_VERSION] + [card[field] for field in KEY_FIELDS])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def report_card_pdfs(cards, workers=1, on_progress=None):
+    """
+    PDF bytes per card, in order, from the cache where possible; misses are
+    rendered in chunks on a process pool when workers > 1, then stored.
+    Returns (pdfs, rebuilt).
+    """
+    keys = [report_card_key(card) for card in cards]
+    pdfs = [cache.get(key) for key in keys]
+    missing = [i for i, pdf in enumerate(pdfs) if pdf is None]
+    cache.count('misses', len(missing))
+    attach_scores([cards[i] for i in missing])
+    done = len(cards) - len(missing)
+    if on_progress:
+        on_progress(done)
+
+    chunks = [missing[start:start + CHUNK_SIZE] for start in range(0, len(missing), CHUNK_SIZE)]
+    jobs = [[cards[i] for i in chunk] for chunk in chunks]
+    pool = None
+    if workers > 1 and len(chunks) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+        results = pool.map(render_report_chunk, jobs)
+    else:
+        results = map(render_report_chunk, jobs)
+
+    try:
+        for chunk, rendered in zip(chunks, results):
+            for i, pdf in zip(chunk, rendered):
+                cache.set(keys[i], pdf)
+                pdfs[i] = pdf
+            done += len(chunk)
+            if on_progress:
+                on_progress(done)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return pdfs, len(missing)
+
+
+def render_report_cards(cards, output, export_format='pdf', workers=None, on_progress=None):
+    """
+    Write cards to `output` (a path or binary file) as one merged PDF or a ZIP
+    of per-student PDFs. Returns (cards written, cards rebuilt).
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown format: {export_format}")
+    pdfs, rebuilt = report_card_pdfs(cards, workers or os.cpu_count() or 1, on_progress)
+
+    if export_format == 'pdf':
+        writer = PdfWriter()
+        for pdf in pdfs:
+            writer.append(BytesIO(pdf))
+        writer.write(output)
+    else:
+        # Card PDFs are already compressed — store them as they are
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for card, pdf in zip(cards, pdfs):
+                archive.writestr(report_card_filename(card), pdf)
+    return len(pdfs), rebuilt
+
+
+# ─────────────────────────────────────
+# ON-SCREEN REPORT CARD
+# ─────────────────────────────────────
+def report_card_context_key(student):
+    """Cache key for the on-screen context — the card key plus the classroom's subjects (one query)"""
+    subjects = list(Subject.objects.filter(classroom_id=student.classroom_id).order_by('name').values_list('id', 'name'))
+    digest = hashlib.sha256(json.dumps(subjects).encode()).hexdigest()[:16]
+    return f'report-card:{report_card_key(student_card(student))}:{digest}'
+
+
+def report_card_context(student, key=None):
+    """
+    {'subject_scores', 'overall_average', 'overall_grade'} — the average of each
+    classroom subject's midterm / final / quiz / assignment, as plain values.
+    One Score query on a miss, none on a hit.
+    """
+    key = key or report_card_context_key(student)
+    context = django_cache.get(key)
+    if context is not None:
+        return context
+
+    marks = {
+        (subject_id, exam_type): score
+        for subject_id, exam_type, score in Score.objects.filter(
+            student=student, exam_type__in=SCREEN_EXAMS,
+        ).values_list('subject_id', 'exam_type', 'score')
+    }
+    subject_scores = []
+    for subject_id, name in Subject.objects.filter(classroom_id=student.classroom_id).order_by('name').values_list('id', 'name'):
+        row = {exam: marks.get((subject_id, exam)) for exam in SCREEN_EXAMS}
+        values = [float(score) for score in row.values() if score is not None]
+        average = round(sum(values) / len(values), 1) if values else 0
+        subject_scores.append({
+            'subject': {'id': subject_id, 'name': name},
+            **row,
+            'average': average,
+            'letter_grade': get_letter_grade(average),
+        })
+
+    overall_average = (
+        round(sum(row['average'] for row in subject_scores) / len(subject_scores), 1) if subject_scores else 0
+    )
+    context = {
+        'subject_scores': subject_scores,
+        'overall_average': overall_average,
+        'overall_grade': get_letter_grade(overall_average),
+    }
+    django_cache.set(key, context, CONTEXT_TIMEOUT)
+    return context
+
+
+# ─────────────────────────────────────
+# HTTP VALIDATORS
+# ─────────────────────────────────────
+def report_card_etag(*parts):
+    return quote_etag(hashlib.sha256(json.dumps([str(part) for part in parts]).encode()).hexdigest()[:32])
+
+
+def not_modified(request, etag, updated_at):
+    """A 304 (or 412) response when the client's copy is current, else None"""
+    last_modified = calendar.timegm(updated_at.utctimetuple()) if updated_at else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, updated_at):
+    """ETag / Last-Modified, and make browsers revalidate instead of guessing freshness"""
+    response.headers['ETag'] = etag
+    if updated_at:
+        response.headers['Last-Modified'] = http_date(calendar.timegm(updated_at.utctimetuple()))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
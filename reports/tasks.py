@@ -0,0 +1,39 @@
+# reports/tasks.py — BACKGROUND JOB HANDLERS (run by `manage.py run_jobs`)
+import tempfile
+
+from django.core.files import File
+
+from jobs.queue import register
+
+from reports.id_cards import card_data, render_id_cards, select_students
+from reports.report_cards import render_report_cards, report_card_data
+
+
+@register('reports.id_cards')
+def id_cards(job):
+    payload = job.payload
+    students = select_students(payload.get('classroom'), payload.get('section'), payload.get('students'))
+    cards = card_data(students)
+    job.set_progress(0, len(cards))
+
+    export_format = payload.get('format', 'pdf')
+    with tempfile.TemporaryFile() as handle:
+        written = render_id_cards(cards, handle, export_format, on_progress=job.set_progress)
+        handle.seek(0)
+        job.save_artifact(f'id_cards.{export_format}', File(handle))
+    return {'summary': f"Generated {written} ID cards."}
+
+
+@register('reports.report_cards')
+def report_cards(job):
+    payload = job.payload
+    students = select_students(payload.get('classroom'), payload.get('section'), payload.get('students'))
+    cards = report_card_data(students)
+    job.set_progress(0, len(cards))
+
+    export_format = payload.get('format', 'pdf')
+    with tempfile.TemporaryFile() as handle:
+        written, rebuilt = render_report_cards(cards, handle, export_format, on_progress=job.set_progress)
+        handle.seek(0)
+        job.save_artifact(f'report_cards.{export_format}', File(handle))
+    return {'summary': f"Generated {written} report cards ({rebuilt} rebuilt, {written - rebuilt} unchanged)."}
@@ -1,3 +1,274 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.models import ClassRoom, Student, Subject
+from core.score_summary import refresh_score_summaries
+from reports.models import Notification, NotificationRead, NotificationWatermark
+from reports.notifications import (
+    mark_all_read, mark_read, push_notification, unread_count, unread_notifications, visible_notifications,
+)
+from reports.routing import websocket_urlpatterns
+from users.models import CustomUser
+
+
+class ScoreExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('teacher', password='pw')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_bad_filters_are_rejected_before_the_response(self):
+        for query in ('class=abc', 'exam_type=nope', 'year=20x4'):
+            for export_format in ('xlsx', 'csv', 'ndjson'):
+                with self.subTest(query=query, format=export_format):
+                    response = self.client.get(f"{reverse('export_excel')}?{query}&format={export_format}")
+                    self.assertEqual(response.status_code, 400)
+
+    def test_valid_filters_stream(self):
+        response = self.client.get(f"{reverse('export_excel')}?class=1&exam_type=Quiz&year=2024&format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'Student ID,'))
+
+
+class ReportCardValidatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user('staff', password='pw', is_staff=True)
+        user = CustomUser.objects.create_user('amy', password='pw', role='student', first_name='Amy')
+        cls.student = Student.objects.create(user=user, roll_number='R-1', classroom=ClassRoom.objects.create(name='Grade 10'))
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_stale_instance_cannot_roll_the_score_version_back(self):
+        stale = Student.objects.get(pk=self.student.pk)
+        refresh_score_summaries([self.student.pk])
+        stale.blood_group = 'O+'
+        stale.save()
+
+        fresh = Student.objects.get(pk=self.student.pk)
+        self.assertEqual((fresh.score_version, fresh.blood_group), (1, 'O+'))
+        self.assertIsNotNone(fresh.scores_updated_at)
+
+    def test_only_the_pdf_is_revalidated(self):
+        page = self.client.get(reverse('report_card', args=[self.student.pk]))
+        self.assertEqual(page.status_code, 200)
+        self.assertNotIn('ETag', page.headers)
+
+        url = reverse('report_card_pdf', args=[self.student.pk])
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        refresh_score_summaries([self.student.pk])  # a Score write
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renaming_a_subject_changes_the_pdf(self):
+        subject = Subject.objects.create(name='Maths', classroom=self.student.classroom)
+        url = reverse('report_card_pdf', args=[self.student.pk])
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        subject.name = 'Mathematics'
+        subject.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationReadStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.grade_10, cls.grade_11 = ClassRoom.objects.create(name='Grade 10'), ClassRoom.objects.create(name='Grade 11')
+        cls.amy = CustomUser.objects.create_user('amy', password='pw', role='student')
+        cls.ben = CustomUser.objects.create_user('ben', password='pw', role='student')
+        Student.objects.create(user=cls.amy, roll_number='R-1', classroom=cls.grade_10)
+        Student.objects.create(user=cls.ben, roll_number='R-2', classroom=cls.grade_11)
+        cls.tess = CustomUser.objects.create_user('tess', password='pw', role='teacher')
+        cls.pat = CustomUser.objects.create_user('pat', password='pw', role='parent')
+
+    def setUp(self):
+        cache.clear()
+
+    def send(self, title, recipient_type='all', **audience):
+        # Committed, so push_notification() moves the cached latest id as in production
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(title=title, message=title, recipient_type=recipient_type, **audience)
+
+    def titles(self, user, queryset=None):
+        return sorted((queryset if queryset is not None else visible_notifications(user)).values_list('title', flat=True))
+
+    def assertCountConsistent(self, user, expected):
+        self.assertEqual(unread_notifications(user).count(), expected)
+        self.assertEqual(unread_count(user), expected)
+
+    def test_audiences(self):
+        self.send('everyone')
+        self.send('students', 'students')
+        self.send('teachers', 'teachers')
+        self.send('grade 10', 'class', specific_class=self.grade_10)
+        self.send('ben only', 'individual', specific_user=self.ben)
+
+        self.assertEqual(self.titles(self.amy), ['everyone', 'grade 10', 'students'])
+        self.assertEqual(self.titles(self.ben), ['ben only', 'everyone', 'students'])
+        self.assertEqual(self.titles(self.tess), ['everyone', 'teachers'])
+        self.assertEqual(self.titles(self.pat), ['everyone'])
+
+    def test_only_notifications_sent_after_joining(self):
+        Notification.objects.filter(pk=self.send('old news').pk).update(created_at=self.amy.date_joined.replace(year=2000))
+        self.send('news')
+        self.assertEqual(self.titles(self.amy), ['news'])
+
+    def test_mark_read_writes_a_marker_above_the_watermark(self):
+        first, second = self.send('one'), self.send('two')
+        self.assertFalse(mark_read(self.amy, self.send('for ben', 'individual', specific_user=self.ben).id))
+
+        self.assertTrue(mark_read(self.amy, second.id))
+        self.assertTrue(mark_read(self.amy, second.id))  # again: no second marker
+        self.assertEqual(list(NotificationRead.objects.filter(user=self.amy).values_list('notification_id', flat=True)), [second.id])
+        self.assertEqual(self.titles(self.amy, unread_notifications(self.amy)), ['one'])
+        self.assertCountConsistent(self.amy, 1)
+
+        mark_all_read(self.amy)
+        self.assertTrue(mark_read(self.amy, first.id))  # under the watermark: nothing to write
+        self.assertFalse(NotificationRead.objects.filter(user=self.amy).exists())
+
+    def test_mark_all_read_moves_the_watermark_and_drops_markers(self):
+        self.send('one')
+        second = self.send('two')
+        self.send('for ben', 'individual', specific_user=self.ben)
+        mark_read(self.amy, second.id)
+
+        self.assertEqual(mark_all_read(self.amy), 1)
+        self.assertEqual(NotificationWatermark.objects.get(user=self.amy).read_up_to, second.id)
+        self.assertFalse(NotificationRead.objects.filter(user=self.amy).exists())
+        self.assertCountConsistent(self.amy, 0)
+        self.assertCountConsistent(self.ben, 3)
+
+        self.send('three')
+        self.assertCountConsistent(self.amy, 1)
+        self.assertEqual(mark_all_read(self.amy), 1)
+        self.assertCountConsistent(self.amy, 0)
+
+    def test_cached_count_tops_up_like_a_recount(self):
+        self.assertCountConsistent(self.amy, 0)
+        self.send('one')
+        self.send('grade 11', 'class', specific_class=self.grade_11)
+        self.assertCountConsistent(self.amy, 1)  # topped up past the cached entry
+
+        read = self.send('two')
+        self.send('grade 10', 'class', specific_class=self.grade_10)
+        mark_read(self.amy, read.id)
+        self.assertCountConsistent(self.amy, 2)
+        self.assertCountConsistent(self.tess, 2)
+
+        Notification.objects.filter(pk=read.pk).delete()  # bypasses the cache
+        cache.clear()
+        self.assertCountConsistent(self.amy, 2)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.grade_10, self.grade_11 = ClassRoom.objects.create(name='Grade 10'), ClassRoom.objects.create(name='Grade 11')
+        self.amy = CustomUser.objects.create_user('amy', password='pw', role='student')
+        self.ben = CustomUser.objects.create_user('ben', password='pw', role='student')
+        Student.objects.create(user=self.amy, roll_number='R-1', classroom=self.grade_10)
+        Student.objects.create(user=self.ben, roll_number='R-2', classroom=self.grade_11)
+        self.tess = CustomUser.objects.create_user('tess', password='pw', role='teacher')
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread_count', 'count': 0})
+        return communicator
+
+    async def send(self, title, recipient_type='all', **audience):
+        return await sync_to_async(Notification.objects.create)(title=title, message=title, recipient_type=recipient_type, **audience)
+
+    async def assertPushed(self, communicator, title, count):
+        event = await communicator.receive_json_from()
+        self.assertEqual((event['type'], event['notification']['title'], event['count']), ('notification', title, count))
+
+    async def test_pushes_reach_only_the_audience(self):
+        amy, ben, tess = await self.connect(self.amy), await self.connect(self.ben), await self.connect(self.tess)
+
+        await self.send('grade 10', 'class', specific_class=self.grade_10)
+        await self.assertPushed(amy, 'grade 10', 1)
+
+        await self.send('students', 'students')
+        await self.assertPushed(amy, 'students', 2)
+        await self.assertPushed(ben, 'students', 1)
+
+        await self.send('for tess', 'individual', specific_user=self.tess)
+        await self.assertPushed(tess, 'for tess', 1)
+
+        await self.send('everyone')
+        for communicator, count in ((amy, 3), (ben, 2), (tess, 2)):
+            await self.assertPushed(communicator, 'everyone', count)
+        for communicator in (amy, ben, tess):
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+    async def test_reading_pushes_the_new_count(self):
+        amy = await self.connect(self.amy)
+        notification = await self.send('everyone')
+        await self.assertPushed(amy, 'everyone', 1)
+
+        await sync_to_async(mark_read)(self.amy, notification.id)
+        self.assertEqual(await amy.receive_json_from(), {'type': 'unread_count', 'count': 0})
+        await amy.disconnect()
+
+    async def test_out_of_order_commit_is_counted_once(self):
+        # Ids 9 and 10 handed out in order, 10 committing first
+        amy = await self.connect(self.amy)
+        later = await sync_to_async(Notification.objects.create)(id=10, title='later', message='m')
+        await sync_to_async(push_notification)(later)
+        await self.assertPushed(amy, 'later', 1)
+
+        earlier = await sync_to_async(Notification.objects.create)(id=9, title='earlier', message='m')
+        await sync_to_async(push_notification)(earlier)
+        await self.assertPushed(amy, 'earlier', 2)
+        self.assertEqual(await sync_to_async(unread_count)(self.amy), 2)
+
+        await sync_to_async(mark_read)(self.amy, later.id)
+        self.assertEqual(await amy.receive_json_from(), {'type': 'unread_count', 'count': 1})
+        self.assertEqual(await sync_to_async(lambda: unread_notifications(self.amy).get())(), earlier)
+        await amy.disconnect()
+
+
+class NotificationReadMigrationTests(TransactionTestCase):
+    before = [('reports', '0002_alter_notification_options_and_more')]
+    after = [('reports', '0003_notification_read_markers')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_unread_rows_go_and_read_rows_stay(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        User = apps.get_model('users', 'CustomUser')
+        Notification = apps.get_model('reports', 'Notification')
+        NotificationRead = apps.get_model('reports', 'NotificationRead')
+        amy, ben = User.objects.create(username='amy'), User.objects.create(username='ben')
+        notification = Notification.objects.create(title='t', message='m')
+        NotificationRead.objects.bulk_create([
+            NotificationRead(notification=notification, user=amy, is_read=False),
+            NotificationRead(notification=notification, user=ben, is_read=True),
+        ])
+
+        apps = self.migrate(self.after)
+        reads = apps.get_model('reports', 'NotificationRead').objects.all()
+        self.assertEqual([(read.user_id, read.read_at is not None) for read in reads], [(ben.id, True)])
+        self.assertFalse(apps.get_model('reports', 'NotificationWatermark').objects.exists())
@@ -1,16 +1,11 @@
 # reports/views.py — MAC COMPATIBLE / FIXED QR ERROR
 
 from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.utils import ImageReader
-from io import BytesIO
-import qrcode
 from django.utils import timezone
 from core.models import Score
+from reports.id_card_render import card_filename, card_pdf
+from core.qr_cache import qr_base64, qr_png
+from reports.id_cards import card_data
 from core.models import Student
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
@@ -27,62 +22,58 @@ from core.views import Score,Subject,Student
 # 2) STUDENT ID CARD (PDF + QR)
 # ===================================================
 def generate_id_card(request, student_id):
-    student = Student.objects.get(id=student_id)
-
-    buffer = BytesIO()
-
-    # Make QR Code
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(
-        f"Student: {student.user.get_full_name()}\n"
-        f"Roll: {student.roll_number}\n"
-        f"Class: {student.classroom}"
-    )
-    qr.make(fit=True)
-
-    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-
-    qr_buffer = BytesIO()
-    qr_img.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
-
-    # Convert QR → ImageReader (IMPORTANT FIX)
-    qr_reader = ImageReader(qr_buffer)
-
-    # Create ID Card PDF
-    p = canvas.Canvas(buffer, pagesize=(3.5*inch, 2.2*inch))
-    width, height = 3.5*inch, 2.2*inch
-
-    # Background
-    p.setFillColorRGB(0.05, 0.05, 0.2)
-    p.rect(0, 0, width, height, fill=1)
-
-    # Title
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(0.7*inch, 1.8*inch, "ELITE SCHOOL 2025")
+    student = get_object_or_404(Student, id=student_id)
+    card = card_data(Student.objects.filter(id=student.id))[0]
 
-    # Student Data
-    p.setFont("Helvetica-Bold", 11)
-    p.drawString(0.7*inch, 1.5*inch, student.user.get_full_name())
+    response = HttpResponse(card_pdf(card, qr_png(card['qr'])), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{card_filename(card)}"'
+    return response
 
-    p.setFont("Helvetica", 10)
-    p.drawString(0.7*inch, 1.3*inch, f"Roll: {student.roll_number}")
-    p.drawString(0.7*inch, 1.1*inch, f"Class: {student.classroom}")
 
-    if student.section:
-        p.drawString(0.7*inch, 0.9*inch, f"Section: {student.section}")
+# ===================================================
+# 2b) BATCH ID CARDS — whole class / section / id list, as a job
+# ===================================================
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
+from core.models import ClassRoom, Section
+from jobs.queue import enqueue
+from reports.id_cards import FORMATS as ID_CARD_FORMATS, parse_student_ids, select_students
 
-    # Draw QR Code (NOW WORKS)
-    p.drawImage(qr_reader, 2.3*inch, 0.7*inch, width=1*inch, height=1*inch)
+@login_required
+def id_cards_batch(request):
+    if not request.user.is_staff:
+        messages.error(request, "Access denied! Staff only.")
+        return redirect('staff_dashboard')
 
-    p.showPage()
-    p.save()
+    if request.method == 'POST':
+        classroom = request.POST.get('classroom') or None
+        section = request.POST.get('section') or None
+        export_format = request.POST.get('format', 'pdf')
+        try:
+            student_ids = parse_student_ids(request.POST.get('students'))
+            count = select_students(classroom, section, student_ids).count()
+            if export_format not in ID_CARD_FORMATS:
+                raise ValueError(f"Unknown format: {export_format}")
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            if not count:
+                messages.error(request, "No students match that selection.")
+            else:
+                job = enqueue(
+                    'reports.id_cards',
+                    {'classroom': classroom, 'section': section, 'students': student_ids, 'format': export_format},
+                    user=request.user,
+                    title=f"ID Cards ({count} students)",
+                )
+                return redirect('jobs:job_detail', job_id=job.id)
 
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{student.roll_number}_ID_Card.pdf"'
-    return response
+    context = {
+        'classrooms': ClassRoom.objects.order_by('name'),
+        'sections': Section.objects.select_related('classroom').order_by('classroom__name', 'name'),
+    }
+    return render(request, 'reports/id_cards_batch.html', context)
 
 
 
@@ -90,38 +81,27 @@ def generate_id_card(request, student_id):
 # 3) EXCEL EXPORT
 # ===================================================
 from django.contrib.auth.decorators import login_required
-from openpyxl import Workbook
+from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+from core.score_export import FORMATS, export_xlsx, iter_csv, iter_ndjson, score_filters, score_rows
+
 @login_required
 def export_scores_excel(request):
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=scores_elite_school.xlsx'
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Student Scores"
-
-    # Headers
-    headers = ['Student ID', 'Name', 'Roll No', 'Class', 'Subject', 'Exam Type', 'Score', 'Grade', 'Recorded Date']
-    ws.append(headers)
+    # ?format=csv|ndjson stream straight to the client; xlsx (default) is built in a temp file
+    export_format = request.GET.get('format', 'xlsx')
+    if export_format not in FORMATS:
+        return HttpResponseBadRequest(f"Unknown format: {export_format}")
+    try:
+        rows = score_rows(score_filters(request.GET))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
-    # Data
-    scores = Score.objects.select_related('student__user', 'student__classroom', 'subject').all()
+    filename = f'scores_elite_school.{export_format}'
+    if export_format == 'xlsx':
+        return FileResponse(export_xlsx(rows), as_attachment=True, filename=filename, content_type=FORMATS['xlsx'])
 
-    for score in scores:
-        row = [
-            score.student.id,
-            score.student.user.get_full_name(),
-            score.student.roll_number,
-            score.student.classroom.name,
-            score.subject.name,
-            score.get_exam_type_display(),  # <-- FIXED: use display
-            score.score,
-            score.grade,
-            score.recorded_at.strftime('%Y-%m-%d')
-        ]
-        ws.append(row)
-
-    wb.save(response)
+    stream = iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+    response = StreamingHttpResponse(stream, content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
 
@@ -133,6 +113,8 @@ from django.shortcuts import render
 from django.db.models import Avg, Count
 from django.utils import timezone
 from core.models import Student, Score
+from core.attendance_rollup import attendance_totals
+from core.score_summary import overall_summaries, ranked_students
 
 def staff_dashboard(request):
     today = timezone.now().date()
@@ -140,34 +122,19 @@ def staff_dashboard(request):
     # Basic stats
     total_students = Student.objects.count()
 
-    # Attendance today
-    attendance_percent = 0
-    present_today = 0
-    try:
-        from attendance.models import Attendance
-        present_today = Attendance.objects.filter(date=today, status='Present').count()
-        attendance_percent = round((present_today / total_students * 100), 1) if total_students > 0 else 0
-    except ImportError:
-        pass
-
-    # === FIXED HERE ===
-    top_students = Student.objects.filter(
-        scores__isnull=False  # ← changed from score__isnull
-    ).annotate(
-        avg_score=Avg('scores__score')  # ← changed from score__score
-    ).select_related(
-        'user', 'classroom', 'section'
-    ).order_by('-avg_score')[:10]
+    # Attendance today — read from the daily rollups
+    today_counts = attendance_totals(today, today)
+    present_today = today_counts['present']
+    marked_today = sum(today_counts.values())
+    attendance_percent = round((present_today / marked_today * 100), 1) if marked_today > 0 else 0
 
-    weak_students = Student.objects.filter(
-        scores__isnull=False
-    ).annotate(
-        avg_score=Avg('scores__score')
-    ).select_related(
-        'user', 'classroom', 'section'
-    ).filter(
-        avg_score__lt=70  # adjust threshold as needed
-    ).order_by('avg_score')[:10]
+    # Ranked straight from the precomputed score summaries
+    top_students = ranked_students(overall_summaries())
+
+    weak_students = ranked_students(
+        overall_summaries().filter(average__lt=70),  # adjust threshold as needed
+        lowest_first=True
+    )
 
     # Optional: Add these if you want in stats
     total_teachers = CustomUser.objects.filter(role='teacher').count()  # adjust based on your user model
@@ -189,14 +156,13 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse
 from django.utils import timezone
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import Table, TableStyle
-from reportlab.pdfgen import canvas
 
 from core.models import Student, Subject, Score
+from reports.report_card_render import report_card_filename
+from reports.report_cards import (
+    not_modified, report_card_context, report_card_etag, report_card_key, report_card_pdfs, set_validators,
+    student_card,
+)
 
 @login_required
 def report_list(request):
@@ -216,52 +182,11 @@ def report_card(request, student_id):
         messages.error(request, "Access denied! Staff only.")
         return redirect('staff_dashboard')
 
-    student = get_object_or_404(Student, id=student_id)
-
-    subjects = Subject.objects.filter(classroom=student.classroom).order_by('name')
-    scores = Score.objects.filter(student=student).select_related('subject')
-
-    subject_scores = []
-    total_average = 0
-    subject_count = 0
-
-    for subject in subjects:
-        midterm = scores.filter(subject=subject, exam_type='midterm').first()
-        final = scores.filter(subject=subject, exam_type='final').first()
-        quiz = scores.filter(subject=subject, exam_type='quiz').first()
-        assignment = scores.filter(subject=subject, exam_type='assignment').first()
-
-        score_values = []
-        if midterm: score_values.append(float(midterm.score))
-        if final: score_values.append(float(final.score))
-        if quiz: score_values.append(float(quiz.score))
-        if assignment: score_values.append(float(assignment.score))
-
-        avg = sum(score_values) / len(score_values) if score_values else 0
-        avg = round(avg, 1)
-
-        subject_scores.append({
-            'subject': subject,
-            'midterm': midterm,
-            'final': final,
-            'quiz': quiz,
-            'assignment': assignment,
-            'average': avg,
-            'letter_grade': get_letter_grade(avg),
-        })
+    student = get_object_or_404(Student.objects.select_related('user', 'classroom', 'section'), id=student_id)
 
-        total_average += avg
-        subject_count += 1
-
-    overall_average = round(total_average / subject_count, 1) if subject_count else 0
-    overall_grade = get_letter_grade(overall_average)
-
-    context = {
-        'student': student,
-        'subject_scores': subject_scores,
-        'overall_average': overall_average,
-        'overall_grade': overall_grade,
-    }
+    # Subject averages are cached per score version. No ETag: the page also carries
+    # the header badges and flash messages, so a 304 could show stale ones
+    context = {'student': student, **report_card_context(student)}
     return render(request, 'reports/report_card.html', context)
 
 
@@ -272,69 +197,75 @@ def generate_report_card_pdf(request, student_id):
         messages.error(request, "Access denied! Staff only.")
         return redirect('staff_dashboard')
 
-    student = get_object_or_404(Student, id=student_id)
-    scores = Score.objects.filter(student=student).select_related('subject')
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # Header
-    p.setFillColorRGB(0, 0.2, 0.4)
-    p.rect(0, height - 110, width, 110, fill=1)
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 32)
-    p.drawCentredString(width / 2, height - 60, "ELITE INTERNATIONAL SCHOOL")
-    p.setFont("Helvetica-Bold", 20)
-    p.drawCentredString(width / 2, height - 95, "OFFICIAL REPORT CARD • 2025")
-
-    # Student Info
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica-Bold", 16)
-    y = height - 150
-    p.drawString(50, y, f"Student: {student.user.get_full_name()}")
-    p.drawString(50, y - 30, f"Roll No: {getattr(student, 'roll_number', 'N/A')}")
-    p.drawString(50, y - 60, f"Class: {student.classroom} | Section: {student.section}")
-    p.drawString(50, y - 90, f"Generated: {timezone.now().strftime('%d %B %Y')}")
-
-    # Table Data
-    data = [['Subject', 'Exam Type', 'Marks', 'Grade']]
-    for s in scores:
-        data.append([
-            s.subject.name,
-            s.get_exam_type_display(),
-            str(s.score),
-            s.grade or '-'
-        ])
-
-    if len(data) == 1:
-        data.append(['-', 'No scores recorded', '-', '-'])
-
-    # Table
-    table = Table(data, colWidths=[180, 130, 80, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#003366')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1.5, colors.black),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 14),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f0f8ff')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f8ff')]),
-    ]))
-
-    table.wrapOn(p, width, height)
-    table.drawOn(p, 50, height - 600)
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type='application/pdf')
-    filename = f"{getattr(student, 'roll_number', 'student')}_Report_Card_2025.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    student = get_object_or_404(Student.objects.select_related('user', 'classroom', 'section'), id=student_id)
+    card = student_card(student)
+
+    # The PDF is cached per score version — a repeat download is a 304 or a file read
+    etag = report_card_etag(report_card_key(card))
+    cached = not_modified(request, etag, student.scores_updated_at)
+    if cached:
+        return cached
+
+    (pdf,), _ = report_card_pdfs([card])
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{report_card_filename(card)}"'
+    return set_validators(response, etag, student.scores_updated_at)
+
+
+# ===================================================
+# BATCH REPORT CARDS — merged PDF or ZIP for a class / section / id list
+# ===================================================
+import tempfile
+from reports.report_cards import (
+    FORMATS as REPORT_CARD_FORMATS, REPORT_CARD_JOB_THRESHOLD, render_report_cards, report_card_data,
+)
+
+@login_required
+def report_cards_batch(request):
+    if not request.user.is_staff:
+        messages.error(request, "Access denied! Staff only.")
+        return redirect('staff_dashboard')
+
+    if request.method == 'POST':
+        classroom = request.POST.get('classroom') or None
+        section = request.POST.get('section') or None
+        export_format = request.POST.get('format', 'pdf')
+        try:
+            student_ids = parse_student_ids(request.POST.get('students'))
+            students = select_students(classroom, section, student_ids)
+            if export_format not in REPORT_CARD_FORMATS:
+                raise ValueError(f"Unknown format: {export_format}")
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            count = students.count()
+            if not count:
+                messages.error(request, "No students match that selection.")
+            elif count > REPORT_CARD_JOB_THRESHOLD:
+                job = enqueue(
+                    'reports.report_cards',
+                    {'classroom': classroom, 'section': section, 'students': student_ids, 'format': export_format},
+                    user=request.user,
+                    title=f"Report Cards ({count} students)",
+                )
+                return redirect('jobs:job_detail', job_id=job.id)
+            else:
+                # A class at a time: render now, stream the file back from disk
+                handle = tempfile.TemporaryFile()
+                render_report_cards(report_card_data(students), handle, export_format)
+                handle.seek(0)
+                return FileResponse(
+                    handle,
+                    as_attachment=True,
+                    filename=f'report_cards.{export_format}',
+                    content_type=REPORT_CARD_FORMATS[export_format],
+                )
+
+    context = {
+        'classrooms': ClassRoom.objects.order_by('name'),
+        'sections': Section.objects.select_related('classroom').order_by('classroom__name', 'name'),
+    }
+    return render(request, 'reports/report_cards_batch.html', context)
 
 
 def get_letter_grade(score):
@@ -365,9 +296,6 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse
 from users.models import CustomUser
-import qrcode
-from io import BytesIO
-from base64 import b64encode
 from django.utils import timezone
 
 @login_required
@@ -382,21 +310,10 @@ def id_card(request, user_id):
         messages.error(request, "ID card only for students and teachers.")
         return redirect('staff_dashboard')
 
-    # Generate real QR code (scan will give user.id|role)
-    qr_data = f"{user.id}|{user.role}"
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-
-    # Convert image to base64 so we can show it in HTML
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    qr_base64 = b64encode(buffer.getvalue()).decode('utf-8')
-
+    # Real QR code (scan will give user.id|role), from the QR cache as base64 for the HTML
     context = {
         'user': user,
-        'qr_base64': qr_base64,
+        'qr_base64': qr_base64(f"{user.id}|{user.role}"),
         'today': timezone.now().date(),
     }
 
@@ -499,8 +416,7 @@ def qr_scan_process(request):
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db import transaction
-from .models import Notification, NotificationRead
+from .models import Notification
 from core.models import ClassRoom
 from users.models import CustomUser
 
@@ -524,33 +440,25 @@ def send_notification(request):
         elif recipient_type not in dict(Notification.RECIPIENT_CHOICES):
             messages.error(request, "Invalid recipient type.")
         else:
-            with transaction.atomic():
-                notification = Notification.objects.create(
-                    title=title,
-                    message=message,
-                    recipient_type=recipient_type,
-                    sender=request.user,
-                )
+            notification = Notification(
+                title=title,
+                message=message,
+                recipient_type=recipient_type,
+                sender=request.user,
+            )
 
-                # Handle specific targets
-                if recipient_type == 'class':
-                    class_id = request.POST.get('classroom')
-                    if class_id:
-                        notification.specific_class = get_object_or_404(ClassRoom, id=class_id)
-                        notification.save()
-                elif recipient_type == 'individual':
-                    user_id = request.POST.get('user')
-                    if user_id:
-                        notification.specific_user = get_object_or_404(CustomUser, id=user_id)
-                        notification.save()
-
-                # Create NotificationRead entries for all recipients
-                recipients = notification.get_recipients()
-                read_entries = [
-                    NotificationRead(notification=notification, user=user)
-                    for user in recipients
-                ]
-                NotificationRead.objects.bulk_create(read_entries)
+            # Handle specific targets
+            if recipient_type == 'class':
+                class_id = request.POST.get('classroom')
+                if class_id:
+                    notification.specific_class = get_object_or_404(ClassRoom, id=class_id)
+            elif recipient_type == 'individual':
+                user_id = request.POST.get('user')
+                if user_id:
+                    notification.specific_user = get_object_or_404(CustomUser, id=user_id)
+
+            # One row whatever the audience — recipients are resolved when they read (reports/notifications.py)
+            notification.save()
 
             messages.success(request, f"Notification '{title}' sent successfully!")
             return redirect('send_notification')
@@ -577,7 +485,8 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from .models import Notification, NotificationRead
+from reports.notifications import mark_all_read, mark_read, notifications_for
+import json
 
 User = get_user_model()
 
@@ -591,13 +500,6 @@ def my_notifications(request):
     role = None
     template = None
 
-    # Base queryset: all NotificationRead entries for this user
-    # This ensures we only show notifications that were explicitly delivered to them
-    reads = NotificationRead.objects.filter(user=user).select_related(
-        'notification__sender',
-        'notification__specific_class'
-    ).order_by('-notification__created_at')
-
     # Determine user role for template selection
     if hasattr(user, 'student'):
         role = 'student'
@@ -623,11 +525,11 @@ def my_notifications(request):
             'message': 'Notification access not configured for your role.'
         })
 
-    # Calculate unread count
-    unread_count = reads.filter(is_read=False).count()
+    # Everything addressed to this user, with read state from markers + watermark
+    notifications, unread_count = notifications_for(user)
 
     context = {
-        'notifications': reads,        # This contains NotificationRead objects
+        'notifications': notifications,  # Notification objects with .is_read
         'unread_count': unread_count,
         'role': role,
     }
@@ -646,18 +548,11 @@ def teacher_notifications(request):
     role = None
     template = None
 
-    # Base queryset: all NotificationRead entries for this user
-    # This ensures we only show notifications that were explicitly delivered to them
-    reads = NotificationRead.objects.filter(user=user).select_related(
-        'notification__sender',
-        'notification__specific_class'
-    ).order_by('-notification__created_at')
-
-    # Calculate unread count
-    unread_count = reads.filter(is_read=False).count()
+    # Everything addressed to this user, with read state from markers + watermark
+    notifications, unread_count = notifications_for(user)
 
     context = {
-        'notifications': reads,        # This contains NotificationRead objects
+        'notifications': notifications,  # Notification objects with .is_read
         'unread_count': unread_count,
         'role': role,
     }
@@ -671,16 +566,11 @@ def mark_notification_read(request):
         try:
             data = json.loads(request.body)
             notif_id = data.get('notification_id')
-            read_entry = NotificationRead.objects.get(
-                notification_id=notif_id,
-                user=request.user
-            )
-            read_entry.is_read = True
-            read_entry.read_at = timezone.now()
-            read_entry.save()
-            return JsonResponse({'success': True})
-        except NotificationRead.DoesNotExist:
+            if mark_read(request.user, notif_id):
+                return JsonResponse({'success': True})
             return JsonResponse({'success': False, 'error': 'Not found'})
+        except (ValueError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Invalid request'})
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
 
@@ -690,15 +580,11 @@ def mark_notification_read(request):
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.utils import timezone
-from .models import NotificationRead
 
 @login_required
 def mark_notification_read_all(request, pk):
-    read_entry = NotificationRead.objects.filter(pk=pk, user=request.user).first()
-    if read_entry and not read_entry.is_read:
-        read_entry.is_read = True
-        read_entry.read_at = timezone.now()
-        read_entry.save()
+    # pk is the Notification id
+    if mark_read(request.user, pk):
         messages.success(request, "Notification marked as read.")
     return redirect('my_notifications')
 
@@ -706,21 +592,14 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from .models import NotificationRead
 
 @login_required
 def mark_all_notifications_read(request):
     """
     Mark ALL unread notifications as read for the current user
     """
-    # Update all unread NotificationRead entries for this user
-    updated_count = NotificationRead.objects.filter(
-        user=request.user,
-        is_read=False
-    ).update(
-        is_read=True,
-        read_at=timezone.now()
-    )
+    # One watermark update, however many notifications that covers
+    updated_count = mark_all_read(request.user)
 
     if updated_count > 0:
         messages.success(request, f"{updated_count} notification(s) marked as read!")
@@ -739,10 +618,14 @@ from django.db.models import Count, Q
 from timetable.models import TimetableEntry
 from core.models import Subject
 from core.models import Student
-from chat.models import Message
-from reports.models import NotificationRead
+from chat.unread import unread_counts
 from users.models import CustomUser
 from timetable.models import Period,Day
+from django.db.models import Max
+from core.absence_counter import over_threshold
+
+LOW_ATTENDANCE_ABSENCES = 3
+
 def teacher_dashboard(request):
     teacher_user = request.user
     today = timezone.now().date()
@@ -757,23 +640,22 @@ def teacher_dashboard(request):
         score_count=Count('scores')
     ).filter(score_count=0)
 
-    # Low attendance students
+    # Today's attendance across this teacher's subjects — one rollup range query
+    teacher_subject_ids = Subject.objects.filter(
+        Q(teacher=teacher_user) | Q(timetable_entries__teacher=teacher_user)
+    ).values_list('id', flat=True).distinct()
+    attendance_today = attendance_totals(today, today, subject_ids=teacher_subject_ids)
+
+    # Low attendance students — 3+ absences in one of this teacher's subjects, from the absence counters
+    low_attendance = over_threshold(teacher_subject_ids, LOW_ATTENDANCE_ABSENCES)
     low_attendance_students = Student.objects.filter(
-        classroom__timetable_entries__teacher=teacher_user
+        id__in=low_attendance.values('student_id')
     ).annotate(
-        absences=Count('attendances', filter=Q(attendances__status='absent'))
-    ).filter(absences__gt=2).select_related('user')
+        absences=Max('absence_counters__absences', filter=Q(absence_counters__subject_id__in=teacher_subject_ids))
+    ).order_by('-absences').select_related('user')
 
     # Unread counts
-    unread_messages = Message.objects.filter(
-        chat_room__participants=teacher_user,
-        is_read=False
-    ).exclude(sender=teacher_user).count()
-
-    unread_notifications = NotificationRead.objects.filter(
-        user=teacher_user,
-        is_read=False
-    ).count()
+    unread = unread_counts(teacher_user)
 
     context = {
         'teacher_name': teacher_user.get_full_name(),
@@ -782,8 +664,9 @@ def teacher_dashboard(request):
         'pending_scores': pending_scores[:5],
         'low_attendance_count': low_attendance_students.count(),
         'low_attendance_students': low_attendance_students[:5],
-        'unread_messages': unread_messages,
-        'unread_notifications': unread_notifications,
+        'unread_messages': unread['messages'],
+        'unread_notifications': unread['notifications'],
+        'attendance_today': attendance_today,
         'today': today,
         'weekday': today.strftime('%A'),
         'debug_weekday': weekday,
@@ -799,36 +682,24 @@ from django.utils import timezone
 from django.db.models import Count, Q
 
 from timetable.models import TimetableEntry, Day, Period
+from timetable.grid import teacher_grid
 from core.models import Student
 from chat.models import Message
-from reports.models import NotificationRead
 from users.models import CustomUser
 
 def teacher_timetable(request):
     # DEVELOPMENT MODE — NO LOGIN
-    teacher_user = request.user
-    periods = Period.objects.all().order_by('number')
-    days = Day.objects.all().order_by('id')  # <-- show all days, including Sunday
-
-    entries = TimetableEntry.objects.filter(
-        teacher=teacher_user
-    ).select_related('classroom', 'subject', 'day', 'period')
+    grid_data = teacher_grid(request.user.id)
 
     # Use day.name as string key — template can handle string
-    grid = {}
-    for day in days:
-        grid[day.name] = {}  # 'monday', 'saturday', etc.
-        for period in periods:
-            grid[day.name][period] = None
-
-    for entry in entries:
-        day_key = entry.day.name  # 'saturday'
-        if day_key in grid and entry.period in grid[day_key]:
-            grid[day_key][entry.period] = entry
+    grid = {
+        day.name: {period: grid_data.cell(day.name, period) for period in grid_data.periods}
+        for day in grid_data.days  # <-- show all days, including Sunday
+    }
 
     context = {
-        'periods': periods,
-        'days': days,
+        'periods': grid_data.periods,
+        'days': grid_data.days,
         'grid': grid,
     }
     
@@ -853,13 +724,16 @@ def teacher_subjects(request):
 
 
 from django.shortcuts import render
-from timetable.models import TimetableEntry
+from timetable.grid import teacher_grid
 
 def my_classes(request):
     teacher_user = request.user
-    entries = TimetableEntry.objects.filter(
-        teacher=teacher_user
-    ).select_related('classroom', 'subject', 'day', 'period').order_by('day__id', 'period__number')
+    entries = teacher_grid(teacher_user.id).entries  # ordered by day, period
+
+    student_counts = dict(
+        Student.objects.filter(classroom_id__in={entry.classroom_id for entry in entries})
+        .order_by().values('classroom_id').annotate(n=Count('id')).values_list('classroom_id', 'n')
+    )
 
     # Group by classroom
     classes = {}
@@ -869,8 +743,7 @@ def my_classes(request):
             classes[classroom] = {
                 'classroom': classroom,
                 'subjects': [],
-                'student_count': classroom.students.count(),  # <-- COMMENT THIS LINE
-                # 'student_count': 0,  # temporary placeholder
+                'student_count': student_counts.get(classroom.id, 0),
             }
         classes[classroom]['subjects'].append({
             'subject': entry.subject,
@@ -893,6 +766,7 @@ from django.db.models import Count
 
 from timetable.models import TimetableEntry
 from core.models import Student, Attendance, Score  # Score from core
+from core.attendance_batch import AttendanceBatch
 
 @login_required
 def manual_attendance(request):
@@ -917,48 +791,14 @@ def manual_attendance(request):
             messages.error(request, "Invalid class selection.")
             return redirect('teacher_attendance_manual')
 
-        # Save attendance for each student
-        for student in selected_entry.classroom.students.all():
-            status = 'present' if request.POST.get(f'student_{student.id}') else 'absent'
-
-            Attendance.objects.update_or_create(
-                student=student,
-                subject=selected_entry.subject,
-                date=attendance_date,
-                defaults={
-                    'status': status,
-                    'marked_by': request.user
-                }
-            )
-
-            # Auto penalty system
-            absences = Attendance.objects.filter(
-                student=student,
-                subject=selected_entry.subject,
-                status='absent'
-            ).count()
-
-            # Get or create score (use 'attendance' as exam_type to avoid conflict)
-            score_obj, created = Score.objects.get_or_create(
-                student=student,
-                subject=selected_entry.subject,
-                exam_type='attendance',  # special type for attendance penalty
-                defaults={
-                    'score': 100.00,
-                    'grade': 'A'
-                }
-            )
-
-            # Apply penalty
-            if absences >= 3:
-                score_obj.score = 0.00
-                score_obj.grade = 'F'
-            elif absences == 2:
-                score_obj.score = max(0.00, score_obj.score - 10)
-            elif absences == 1:
-                score_obj.score = max(0.00, score_obj.score - 5)
+        # Save attendance for the whole roster in one batch
+        batch = AttendanceBatch(selected_entry.subject, attendance_date, marked_by=request.user)
+        for student_id in selected_entry.classroom.students.values_list('id', flat=True):
+            batch.add(student_id, 'present' if request.POST.get(f'student_{student_id}') else 'absent')
+        batch.save()
 
-            score_obj.save()
+        # Auto penalty system — 'attendance' exam type score from each student's absences
+        batch.apply_penalties()
 
         messages.success(request, f"Attendance saved for {selected_entry.classroom.name} - {selected_entry.subject.name}")
         return redirect('teacher_attendance_manual')
@@ -986,9 +826,6 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
-import qrcode
-from io import BytesIO
-import base64
 
 from timetable.models import TimetableEntry
 from core.models import Attendance
@@ -1015,15 +852,9 @@ def qr_attendance(request):
         # Generate token (simple — entry ID + date)
         token = f"{selected_entry.id}-{timezone.now().date()}"
 
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        # QR code — the same token all day, so the cache renders it once
         LOCAL_IP = "172.20.10.3"
-        qr.add_data(f"http://{LOCAL_IP}:8000/qr-scan/?token={token}")
-        qr.make(fit=True)
-        img = qr.make_image(fill='black', back_color='white')
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        qr_code = base64.b64encode(buffer.getvalue()).decode()
+        qr_code = qr_base64(f"http://{LOCAL_IP}:8000/qr-scan/?token={token}", border=5)
 
     context = {
         'timetable_entries': timetable_entries,
@@ -1073,6 +904,7 @@ from django.db.models import Count, Q
 from timetable.models import TimetableEntry
 from core.models import Student
 from core.models import Score
+from core.score_batch import ScoreBatchWriter
 
 def teacher_enter_scores(request):
     teacher_user = request.user
@@ -1102,22 +934,25 @@ def teacher_enter_scores(request):
             messages.error(request, "Invalid class.")
             return redirect('teacher_enter_scores')
 
-        for student in selected_entry.classroom.students.all():
-            marks_key = f'marks_{student.id}'
-            if marks_key in request.POST:
-                marks = request.POST[marks_key]
-                if marks:
-                    Score.objects.update_or_create(
-                        student=student,
-                        subject=selected_entry.subject,
-                        exam_type=exam_type,
-                        defaults={
-                            'score': marks,
-                            'recorded_by': teacher_user
-                        }
-                    )
-
-        messages.success(request, "Scores saved successfully!")
+        exam_type = request.POST.get('exam_type') or exam_type
+        try:
+            writer = ScoreBatchWriter(
+                selected_entry.classroom, exam_type, teacher_user,
+                subjects=[selected_entry.subject_id], absence_limit=None,
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('teacher_enter_scores')
+        for key, marks in request.POST.items():
+            if key.startswith('marks_') and marks.strip():
+                writer.add(key[len('marks_'):], selected_entry.subject_id, marks, cell=key)
+        writer.save()
+
+        errors = writer.error_messages()
+        if errors:
+            messages.error(request, f"{len(errors)} score(s) were not saved — " + "; ".join(errors))
+        if writer.saved or not errors:
+            messages.success(request, "Scores saved successfully!")
         return redirect('teacher_enter_scores')
 
     context = {
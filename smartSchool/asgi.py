@@ -20,12 +20,13 @@ from django.core.asgi import get_asgi_application
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from chat.routing import websocket_urlpatterns
+from reports.routing import websocket_urlpatterns as notification_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartSchool.settings')
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
-        URLRouter(websocket_urlpatterns)
+        URLRouter(websocket_urlpatterns + notification_urlpatterns)
     ),
 })
\ No newline at end of file
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'reports',
     'notifications',
     'timetable',
+    'jobs',
 
     # Third-party
     'django_bootstrap5',
@@ -114,6 +115,14 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Chat write-behind (chat/write_behind.py): broadcast socket messages first and
+# insert them in batches of CHAT_WRITE_BEHIND_BATCH or every ..._INTERVAL_MS.
+# Meant for a single ASGI process — one process at a time holds the batching
+# lease in the cache, which must be shared for that to hold
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'False') == 'True'
+CHAT_WRITE_BEHIND_BATCH = 100
+CHAT_WRITE_BEHIND_INTERVAL_MS = 200
+
 
 # ========================================
 # DATABASE
@@ -170,8 +179,6 @@ STATICFILES_DIRS = [
 
 STATICFILES_DIRS += [BASE_DIR / 'static/css']
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 # ========================================
 # MEDIA FILES (Uploaded photos, Excel, PDFs, etc.)
 # ========================================
@@ -195,11 +202,28 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 
-# Use Cloudinary for media storage
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
-
+# ========================================
+# FILE STORAGE
+# ========================================
+# Cloudinary for media when configured: web and the job worker (Procfile) run
+# on separate machines, so uploads and job artifacts must be in shared
+# storage. "files" holds non-image files — imports, exports, job artifacts —
+# which Cloudinary keeps as raw resources. Local disk in development.
 CLOUDINARY_STORAGE = {
-    'CLOUD_NAME': os.getenv('Root'),
-    'API_KEY': os.getenv('923754956826353'),
-    'API_SECRET': os.getenv('*********************************'),
+    'CLOUD_NAME': os.getenv('CLOUDINARY_CLOUD_NAME'),
+    'API_KEY': os.getenv('CLOUDINARY_API_KEY'),
+    'API_SECRET': os.getenv('CLOUDINARY_API_SECRET'),
+}
+
+if CLOUDINARY_STORAGE['CLOUD_NAME']:
+    MEDIA_STORAGE = {'BACKEND': 'cloudinary_storage.storage.MediaCloudinaryStorage'}
+    FILE_STORAGE = {'BACKEND': 'cloudinary_storage.storage.RawMediaCloudinaryStorage'}
+else:
+    MEDIA_STORAGE = FILE_STORAGE = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+
+STORAGES = {
+    'default': MEDIA_STORAGE,
+    'files': FILE_STORAGE,
+    # Manifest storage (whitenoise) needs collectstatic before any page renders, tests included
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
 }
@@ -14,6 +14,7 @@ from django.urls import path
 # === VIEW IMPORTS ===
 from student.views import (
     student_dashboard,
+    student_dashboard_api,
     my_report_card,
     my_id_card, 
     my_attendance,
@@ -28,10 +29,13 @@ from chat.views import (
     chat_list_teacher,
     send_message_teacher,
     start_chat_teacher,
+    unread_api,
 )
 from reports.views import (
     generate_report_card_pdf,
     generate_id_card,
+    id_cards_batch,
+    report_cards_batch,
     export_scores_excel,
     report_list,
     staff_dashboard,
@@ -76,6 +80,7 @@ from core.views import (
     mark_attendance,
     analytics_dashboard,
     performance_dashboard,
+    performance_matrix_api,
     student_info,
     edit_attendance,
     delete_attendance,
@@ -112,6 +117,7 @@ path('student/dashboard', student_dashboard, name='student_dashboard'),
 
     # ANALYTICS & PERFORMANCE
     path('performance/', performance_dashboard, name='performance_dashboard'),
+    path('performance/matrix/', performance_matrix_api, name='performance_matrix_api'),
     path('analytics/', analytics_dashboard, name='analytics_dashboard'),
     path('legacy-scores/', legacy_scores, name='legacy_scores'),
 
@@ -140,6 +146,8 @@ path('student/dashboard', student_dashboard, name='student_dashboard'),
 
     path('reports/pdf/<int:student_id>/', generate_report_card_pdf, name='report_card_pdf'),  # PDF download
     path('reports/id-card/<int:student_id>/', generate_id_card, name='id_card'),
+    path('reports/id-cards/', id_cards_batch, name='id_cards_batch'),
+    path('reports/report-cards/', report_cards_batch, name='report_cards_batch'),
 
     # DATA EXPORT
     path('export/', export_scores_excel, name='export_excel'),
@@ -169,6 +177,7 @@ path('student/dashboard', student_dashboard, name='student_dashboard'),
 
     path('chat/', include('chat.urls')),
     path('send/', send_message, name='send_message'),
+    path('api/unread/', unread_api, name='unread_api'),
 
 
 # part dashboard teacher
@@ -192,8 +201,12 @@ path('student/dashboard', student_dashboard, name='student_dashboard'),
 
     path('ai/', include('ai_assistant.urls')),
 
+    # BACKGROUND JOBS
+    path('jobs/', include('jobs.urls')),
+
     # STUDENT DASHBOARD
     path('student/dashboard/', student_dashboard, name='student_dashboard'),
+    path('student/dashboard/api/', student_dashboard_api, name='student_dashboard_api'),
 
     # MY REPORT CARD
     path('my-report-card/', my_report_card, name='my_report_card'),
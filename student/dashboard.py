@@ -0,0 +1,235 @@
+# student/dashboard.py — STUDENT DASHBOARD DATA
+#
+# StudentDashboardLoader gathers everything the student dashboard shows with a
+# fixed number of grouped queries, whatever the number of subjects, days or
+# exams: summaries + class rank, this month's attendance, subjects, chart
+# scores and chart class averages; the timetable comes from the compiled grid
+# cache (timetable/grid.py).
+# student_dashboard renders it; student_dashboard_api serves it to the mobile app.
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Avg, F, FloatField
+from django.db.models.expressions import Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from core.models import Attendance, Score, StudentScoreSummary, Subject
+from timetable.grid import classroom_grid
+
+CHART_EXAMS = 8
+
+
+def get_letter_grade(score):
+    """Convert numeric score to letter grade"""
+    if score >= 96: return 'A'
+    elif score >= 90: return 'A-'
+    elif score >= 85: return 'B+'
+    elif score >= 80: return 'B'
+    elif score >= 75: return 'B-'
+    elif score >= 70: return 'C+'
+    elif score >= 65: return 'C'
+    elif score >= 60: return 'C-'
+    elif score >= 50: return 'D'
+    else: return 'F'
+
+
+class StudentDashboardLoader:
+    """
+    Load a student's dashboard data. Pass a Student fetched with
+    select_related('user', 'classroom', 'section') so the header costs nothing.
+    """
+
+    def __init__(self, student, today=None):
+        self.student = student
+        self.today = today or timezone.now().date()
+        self.month_start = self.today - timedelta(days=self.today.day - 1)
+
+    def load(self):
+        data = {'student': self.student, 'today': self.today}
+        data.update(self._scores())
+        data.update(self._attendance())
+        data.update(self._chart())
+        data['timetable'] = self._timetable()
+        return data
+
+    # ─────────────────────────────────────
+    # SCORES + RANK — 2 queries
+    # ─────────────────────────────────────
+    def _summaries(self):
+        """
+        The student's summary rows, each ranked against the classroom in the database:
+        RANK() per subject (overall rows share the NULL partition) runs in a subquery
+        over the whole classroom, and the outer query keeps this student's rows.
+        """
+        ranked = StudentScoreSummary.objects.filter(classroom_id=self.student.classroom_id).order_by().annotate(
+            class_rank=Window(Rank(), partition_by=F('subject_id'), order_by=F('average').desc()),
+        )
+        sql, params = ranked.query.sql_with_params()
+        return StudentScoreSummary.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.student_id = %s', [*params, self.student.id],
+        )
+
+    def _scores(self):
+        summaries = {summary.subject_id: summary for summary in self._summaries()}
+        overall = summaries.get(None)
+        overall_average = round(overall.average, 1) if overall else 0
+
+        subject_grades = []
+        for subject in Subject.objects.filter(classroom_id=self.student.classroom_id):
+            summary = summaries.get(subject.id)
+            average = round(summary.average, 1) if summary else 0
+            subject_grades.append({
+                'subject': subject,
+                'average': average,
+                'letter_grade': get_letter_grade(average),
+                'latest_score': summary.latest_score if summary else None,
+            })
+
+        return {
+            'overall_average': overall_average,
+            'overall_grade': get_letter_grade(overall_average),
+            'student_rank': overall.class_rank if overall else '-',
+            'subject_grades': subject_grades,
+        }
+
+    # ─────────────────────────────────────
+    # ATTENDANCE — 1 query
+    # ─────────────────────────────────────
+    def _attendance(self):
+        rows = Attendance.objects.filter(
+            student=self.student, date__range=(self.month_start, self.today)
+        ).order_by('date', '-recorded_at').values_list('date', 'status')
+
+        total_days = present_days = absent_days = 0
+        day_status = {}
+        for date, status in rows:
+            total_days += 1
+            present_days += status == 'present'
+            absent_days += status == 'absent'
+            day_status.setdefault(date, status)  # latest record of the day wins
+
+        calendar = []
+        day = self.month_start
+        while day <= self.today:
+            status = day_status.get(day)
+            calendar.append({'date': day, 'present': status == 'present', 'absent': status == 'absent'})
+            day += timedelta(days=1)
+
+        return {
+            'attendance_percentage': round(present_days / total_days * 100, 1) if total_days > 0 else 0,
+            'present_days': present_days,
+            'absent_days': absent_days,
+            'total_days': total_days,
+            'attendance_calendar': calendar,
+        }
+
+    # ─────────────────────────────────────
+    # PERFORMANCE CHART — 2 queries
+    # ─────────────────────────────────────
+    def _chart(self):
+        # Latest score per exam type, most recent exam types first
+        latest = OrderedDict()
+        for exam_type, score in Score.objects.filter(student=self.student).order_by(
+            '-recorded_at', '-id'
+        ).values_list('exam_type', 'score'):
+            latest.setdefault(exam_type, score)
+        exam_types = list(latest)[:CHART_EXAMS]
+
+        if not exam_types:
+            return {
+                'chart_labels': ['No exams recorded yet'],
+                'chart_my_scores': [0],
+                'chart_class_averages': [0],
+                'chart_has_data': False,
+            }
+
+        class_averages = dict(
+            Score.objects.filter(
+                student__classroom_id=self.student.classroom_id, exam_type__in=exam_types
+            ).order_by().values('exam_type').annotate(
+                avg=Avg('score', output_field=FloatField())
+            ).values_list('exam_type', 'avg')
+        )
+        return {
+            'chart_labels': exam_types,
+            'chart_my_scores': [round(latest[exam_type], 1) for exam_type in exam_types],
+            'chart_class_averages': [round(class_averages.get(exam_type) or 0, 1) for exam_type in exam_types],
+            'chart_has_data': True,
+        }
+
+    # ─────────────────────────────────────
+    # TIMETABLE — compiled grid, cached
+    # ─────────────────────────────────────
+    def _timetable(self):
+        today_weekday = self.today.strftime("%A")
+        return [
+            {
+                'period': period,
+                'schedule': {day.title(): entry for day, entry in schedule.items() if entry},
+                'is_today_day': today_weekday,
+            }
+            for period, schedule in classroom_grid(self.student.classroom_id).rows()
+        ]
+
+
+def dashboard_json(data):
+    """JSON-ready version of StudentDashboardLoader.load() for the mobile app"""
+    student = data['student']
+    return {
+        'student': {
+            'id': student.id,
+            'name': student.user.get_full_name() or student.user.username,
+            'roll_number': student.roll_number,
+            'classroom': student.classroom.name if student.classroom else None,
+            'section': student.section.name if student.section else None,
+        },
+        'today': data['today'].isoformat(),
+        'overall_average': data['overall_average'],
+        'overall_grade': data['overall_grade'],
+        'class_rank': data['student_rank'] if data['student_rank'] != '-' else None,
+        'subjects': [
+            {
+                'id': item['subject'].id,
+                'name': item['subject'].name,
+                'average': item['average'],
+                'letter_grade': item['letter_grade'],
+                'latest_score': float(item['latest_score']) if item['latest_score'] is not None else None,
+            }
+            for item in data['subject_grades']
+        ],
+        'attendance': {
+            'percentage': data['attendance_percentage'],
+            'present_days': data['present_days'],
+            'absent_days': data['absent_days'],
+            'total_days': data['total_days'],
+            'calendar': [
+                {
+                    'date': day['date'].isoformat(),
+                    'status': 'present' if day['present'] else 'absent' if day['absent'] else None,
+                }
+                for day in data['attendance_calendar']
+            ],
+        },
+        'chart': {
+            'labels': data['chart_labels'] if data['chart_has_data'] else [],
+            'my_scores': [float(score) for score in data['chart_my_scores']] if data['chart_has_data'] else [],
+            'class_averages': data['chart_class_averages'] if data['chart_has_data'] else [],
+        },
+        'timetable': [
+            {
+                'period': row['period'].number,
+                'start_time': row['period'].start_time.strftime('%H:%M'),
+                'end_time': row['period'].end_time.strftime('%H:%M'),
+                'schedule': {
+                    day: {
+                        'subject': entry.subject.name,
+                        'teacher': entry.teacher.get_full_name() or entry.teacher.username,
+                    }
+                    for day, entry in row['schedule'].items()
+                },
+            }
+            for row in data['timetable']
+        ],
+    }
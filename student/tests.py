@@ -1,3 +1,82 @@
+import datetime
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attendance, ClassRoom, Score, Section, Student, StudentScoreSummary, Subject
+from student.dashboard import StudentDashboardLoader
+from timetable.grid import bump_timetable_version
+from timetable.models import Day, Period, TimetableEntry
+from users.models import CustomUser
+
+
+class StudentDashboardLoaderTests(TestCase):
+    QUERY_BUDGET = 8  # 5 for the student's data + 3 to compile the timetable grid
+    CACHED_GRID_QUERIES = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        classroom = ClassRoom.objects.create(name='Grade 10')
+        section = Section.objects.create(name='A', classroom=classroom)
+        teacher = CustomUser.objects.create_user('teacher', password='pw', role='teacher')
+        subjects = [Subject.objects.create(name=f'Subject {i}', classroom=classroom, teacher=teacher) for i in range(4)]
+
+        days = [Day.objects.create(name=name) for name in ('monday', 'tuesday', 'wednesday')]
+        periods = [
+            Period.objects.create(number=n, start_time=datetime.time(7 + n), end_time=datetime.time(8 + n))
+            for n in range(1, 4)
+        ]
+        for day in days:
+            for i, period in enumerate(periods):
+                TimetableEntry.objects.create(
+                    classroom=classroom, subject=subjects[i], teacher=teacher, day=day, period=period
+                )
+
+        today = timezone.now().date()
+        cls.students = []
+        for i in range(3):
+            user = CustomUser.objects.create_user(f'student{i}', password='pw', role='student')
+            student = Student.objects.create(user=user, roll_number=f'R-{i}', classroom=classroom, section=section)
+            cls.students.append(student)
+            for subject in subjects:
+                for exam_type in ('quiz', 'midterm', 'final'):
+                    Score.objects.create(
+                        student=student, subject=subject, exam_type=exam_type, score=50 + 10 * i, recorded_by=teacher
+                    )
+                Attendance.objects.create(
+                    student=student, subject=subject, date=today, status='present', marked_by=teacher
+                )
+
+    def load(self, student):
+        student = Student.objects.select_related('user', 'classroom', 'section').get(pk=student.pk)
+        bump_timetable_version()  # start from a cold timetable grid
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            return StudentDashboardLoader(student).load()
+
+    def test_query_budget_does_not_grow_with_data(self):
+        data = self.load(self.students[0])
+        self.assertEqual(len(data['subject_grades']), 4)
+        self.assertEqual(len(data['timetable']), 3)
+        self.assertEqual(data['chart_labels'][0], 'final')
+
+    def test_cached_timetable_grid_costs_no_queries(self):
+        student = self.load(self.students[0])['student']
+        with self.assertNumQueries(self.CACHED_GRID_QUERIES):
+            data = StudentDashboardLoader(student).load()
+        self.assertEqual(data['timetable'][0]['schedule']['Monday'].subject.name, 'Subject 0')
+
+    def test_rank_is_computed_against_the_whole_class(self):
+        self.assertEqual(self.load(self.students[2])['student_rank'], 1)
+        self.assertEqual(self.load(self.students[0])['student_rank'], 3)
+
+    def test_tied_averages_share_a_rank(self):
+        StudentScoreSummary.objects.filter(student=self.students[1]).update(average=70.0)
+        ranks = [self.load(student)['student_rank'] for student in self.students]
+        self.assertEqual(ranks, [3, 1, 1])
 
-# Create your tests here.
+    def test_json_endpoint(self):
+        self.client.force_login(self.students[1].user)
+        response = self.client.get(reverse('student_dashboard_api'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['class_rank'], 2)
@@ -1,12 +1,15 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.db.models import Avg, Max
 from django.utils import timezone
 from datetime import timedelta
 import random
 
 from core.models import Student, Attendance, Score, Subject
-from timetable.models import TimetableEntry, Period
+from student.dashboard import StudentDashboardLoader, dashboard_json
+from reports.report_cards import report_card_context
+from chat.unread import unread_messages
 
 
 # Motivational quotes list (outside the view for efficiency)
@@ -26,195 +29,35 @@ MOTIVATIONAL_QUOTES = [
 ]
 
 
+def _dashboard_student(request):
+    """The logged-in user's Student, with everything the dashboard header shows"""
+    return Student.objects.select_related('user', 'classroom', 'section').filter(user=request.user).first()
+
+
 @login_required
 def student_dashboard(request):
-    try:
-        student = request.user.student_profile
-    except AttributeError:
+    student = _dashboard_student(request)
+    if student is None:
         return render(request, 'error.html', {'message': 'No student profile found'})
 
-    today = timezone.now().date()
-    month_start = today - timedelta(days=today.day - 1)
-
-    # Random motivational quote
-    motivational_quote = random.choice(MOTIVATIONAL_QUOTES)
-
-    # 1. Overall average & letter grade
-    overall_avg = Score.objects.filter(student=student).aggregate(avg=Avg('score'))['avg'] or 0
-    overall_average = round(overall_avg, 1)
-
-    if overall_average >= 96:
-        overall_grade = 'A'
-    elif overall_average >= 90:
-        overall_grade = 'A-'
-    elif overall_average >= 85:
-        overall_grade = 'B+'
-    elif overall_average >= 80:
-        overall_grade = 'B'
-    elif overall_average >= 75:
-        overall_grade = 'B-'
-    elif overall_average >= 70:
-        overall_grade = 'C+'
-    elif overall_average >= 65:
-        overall_grade = 'C'
-    elif overall_average >= 60:
-        overall_grade = 'C-'
-    elif overall_average >= 50:
-        overall_grade = 'D'
-    else:
-        overall_grade = 'F'
-
-    # 2. Attendance this month
-    attendances_this_month = Attendance.objects.filter(
-        student=student,
-        date__gte=month_start,
-        date__lte=today
-    )
-    total_days = attendances_this_month.count()
-    present_days = attendances_this_month.filter(status='present').count()
-    absent_days = attendances_this_month.filter(status='absent').count()
-    attendance_percentage = round(present_days / total_days * 100, 1) if total_days > 0 else 0
-
-    # 3. Attendance calendar
-    attendance_calendar = []
-    day = month_start
-    while day <= today:
-        day_record = attendances_this_month.filter(date=day).first()
-        status = day_record.status if day_record else None
-        attendance_calendar.append({
-            'date': day,
-            'present': status == 'present',
-            'absent': status == 'absent',
-        })
-        day += timedelta(days=1)
-
-    # 4. Placeholders
-    unread_messages = 0
-    next_exam = None
-
-    # 5. Subject grades
-    subjects = Subject.objects.filter(classroom=student.classroom)
-    subject_grades = []
-    for subj in subjects:
-        subj_scores = Score.objects.filter(student=student, subject=subj)
-        subj_avg = subj_scores.aggregate(avg=Avg('score'))['avg'] or 0
-        subj_average = round(subj_avg, 1)
-
-        # Letter grade
-        if subj_average >= 96: subj_grade = 'A'
-        elif subj_average >= 90: subj_grade = 'A-'
-        elif subj_average >= 85: subj_grade = 'B+'
-        elif subj_average >= 80: subj_grade = 'B'
-        elif subj_average >= 75: subj_grade = 'B-'
-        elif subj_average >= 70: subj_grade = 'C+'
-        elif subj_average >= 65: subj_grade = 'C'
-        elif subj_average >= 60: subj_grade = 'C-'
-        elif subj_average >= 50: subj_grade = 'D'
-        else: subj_grade = 'F'
-
-        latest_score = subj_scores.order_by('-recorded_at').first()
-        subject_grades.append({
-            'subject': subj,
-            'average': subj_average,
-            'letter_grade': subj_grade,
-            'latest_score': latest_score.score if latest_score else None,
-        })
-
-    # 6. Class rank
-    class_students = Student.objects.filter(classroom=student.classroom)
-    ranked = class_students.annotate(avg_score=Avg('scores__score')).order_by('-avg_score')
-    student_rank = list(ranked).index(student) + 1 if student in ranked else "-"
-
-    # 7. Performance chart data
-    chart_labels = []
-    chart_my_scores = []
-    chart_class_averages = []
-    has_data = False
-
-    student_exams = Score.objects.filter(student=student) \
-        .values('exam_type') \
-        .annotate(latest_date=Max('recorded_at')) \
-        .order_by('-latest_date')[:8]
-
-    class_student_ids = Student.objects.filter(classroom=student.classroom).values_list('id', flat=True)
-
-    for exam in student_exams:
-        exam_type = exam['exam_type']
-        my_score_obj = Score.objects.filter(
-            student=student,
-            exam_type=exam_type
-        ).order_by('-recorded_at').first()
-
-        if my_score_obj:
-            has_data = True
-            chart_labels.append(exam_type)
-            chart_my_scores.append(round(my_score_obj.score, 1))
-
-            class_avg = Score.objects.filter(
-                student_id__in=class_student_ids,
-                exam_type=exam_type
-            ).aggregate(avg=Avg('score'))['avg']
-            chart_class_averages.append(round(class_avg or 0, 1))
-
-    if not has_data:
-        chart_labels = ['No exams recorded yet']
-        chart_my_scores = [0]
-        chart_class_averages = [0]
-    print(chart_labels, chart_my_scores, chart_class_averages, has_data)
-
-
-    # 8. Timetable
-    timetable = []
-    try:
-        periods = Period.objects.all().order_by('start_time')
-        today_weekday = today.strftime("%A")
-
-        for period in periods:
-            entries = TimetableEntry.objects.filter(
-                classroom=student.classroom,
-                period=period
-            ).select_related('subject', 'teacher')
-
-            schedule_dict = {}
-            for entry in entries:
-                day_name = entry.day.name.strip().title()
-                schedule_dict[day_name] = entry
-
-            timetable.append({
-                'period': period,
-                'schedule': schedule_dict,
-                'is_today_day': today_weekday,
-            })
-    except Exception as e:
-        print(f"Timetable loading error: {e}")
-        timetable = []
-
-    # === FINAL CONTEXT (created once at the end) ===
-    context = {
-        'student': student,
-        'overall_average': overall_average,
-        'overall_grade': overall_grade,
-        'attendance_percentage': attendance_percentage,
-        'present_days': present_days,
-        'absent_days': absent_days,
-        'total_days': total_days,
-        'unread_messages': unread_messages,
-        'next_exam': next_exam,
-        'subject_grades': subject_grades,
-        'attendance_calendar': attendance_calendar,
-        'timetable': timetable,
-        'student_rank': student_rank,
-        'today': today,
-        'motivational_quote': motivational_quote,
+    context = StudentDashboardLoader(student).load()
+    context.update({
+        'unread_messages': unread_messages(request.user.id),
+        # Placeholders
+        'next_exam': None,
+        # Random motivational quote
+        'motivational_quote': random.choice(MOTIVATIONAL_QUOTES),
+    })
+    return render(request, 'student/dashboard.html', context)
 
-        # Chart data
-        'chart_labels': chart_labels,
-        'chart_my_scores': chart_my_scores,
-        'chart_class_averages': chart_class_averages,
-        'chart_has_data': has_data,
-    }
 
-    return render(request, 'student/dashboard.html', context)
+@login_required
+def student_dashboard_api(request):
+    """Same data as student_dashboard, as JSON for the mobile app"""
+    student = _dashboard_student(request)
+    if student is None:
+        return JsonResponse({'error': 'No student profile found'}, status=404)
+    return JsonResponse(dashboard_json(StudentDashboardLoader(student).load()))
 
 # student/views.py
 
@@ -227,61 +70,15 @@ def my_report_card(request):
         messages.error(request, "No student profile found.")
         return redirect('student_dashboard')
 
-    subjects = Subject.objects.filter(classroom=student.classroom).order_by('name')
-    scores = Score.objects.filter(student=student).select_related('subject')
-
-    subject_scores = []
-    total_average = 0
-    subject_count = 0
-
-    for subject in subjects:
-        midterm = scores.filter(subject=subject, exam_type='midterm').first()
-        final = scores.filter(subject=subject, exam_type='final').first()
-        quiz = scores.filter(subject=subject, exam_type='quiz').first()
-        assignment = scores.filter(subject=subject, exam_type='assignment').first()
-
-        score_values = [float(s.score) for s in [midterm, final, quiz, assignment] if s]
-        avg = sum(score_values) / len(score_values) if score_values else 0
-        avg = round(avg, 1)
-
-        subject_scores.append({
-            'subject': subject,
-            'midterm': midterm.score if midterm else '-',
-            'final': final.score if final else '-',
-            'quiz': quiz.score if quiz else '-',
-            'assignment': assignment.score if assignment else '-',
-            'average': avg,
-            'letter_grade': get_letter_grade(avg),
-        })
-        total_average += avg
-        subject_count += 1
-
-    overall_average = round(total_average / subject_count, 1) if subject_count else 0
-    overall_grade = get_letter_grade(overall_average)
-
+    # Subject averages are cached per score version. No ETag: the page also carries
+    # badges and flash messages, so a 304 could show stale ones
     context = {
         'student': student,
-        'subject_scores': subject_scores,
-        'overall_average': overall_average,
-        'overall_grade': overall_grade,
+        **report_card_context(student),
         'today': timezone.now().date(),
     }
-
     return render(request, 'student/my_report_card.html', context)
 
-def get_letter_grade(score):
-    """Convert numeric score to letter grade"""
-    if score >= 96: return 'A'
-    elif score >= 90: return 'A-'
-    elif score >= 85: return 'B+'
-    elif score >= 80: return 'B'
-    elif score >= 75: return 'B-'
-    elif score >= 70: return 'C+'
-    elif score >= 65: return 'C'
-    elif score >= 60: return 'C-'
-    elif score >= 50: return 'D'
-    else: return 'F'
-
 # student/views.py
 # student/views.py — ADD THIS LINE AT THE TOP
 from django.shortcuts import render, redirect, get_object_or_404
@@ -289,6 +86,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
 from core.models import Student
+from core.qr_cache import qr_base64
 @login_required
 def my_id_card(request, student_id):
     if not request.user.is_student or request.user.student_profile.id != student_id:
@@ -296,7 +94,10 @@ def my_id_card(request, student_id):
         return redirect('student_dashboard')
 
     student = get_object_or_404(Student, id=student_id)
-    context = {'student': student}
+    context = {
+        'student': student,
+        'qr_base64': qr_base64(f"ID{student.id}"),
+    }
     return render(request, 'student/my_id_card.html', context)
 
 # student/views.py or core/views.py
@@ -379,7 +180,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta
-from timetable.models import TimetableEntry, Period, Day
+from timetable.grid import classroom_grid
 from core.models import Student
 
 @login_required
@@ -396,36 +197,19 @@ def my_timetable(request):
     week_start = today - timedelta(days=weekday)
     week_end = week_start + timedelta(days=6)
 
-    # Get all timetable entries for this classroom
-    entries = TimetableEntry.objects.filter(
-        classroom=student.classroom
-    ).select_related('subject', 'teacher', 'period', 'day')
-
-    # Get all periods to ensure every time slot is shown
-    periods = Period.objects.all().order_by('number')
-
-    # Build timetable grid
+    # Compiled, cached grid — entries are shared, so "today" is marked on the row, not the entry
+    today_name = today.strftime('%A').lower()
     timetable = []
-    for period in periods:
-        period_entry = {
+    for period, schedule in classroom_grid(student.classroom_id).rows():
+        timetable.append({
             'time': f"{period.start_time.strftime('%H:%M')} - {period.end_time.strftime('%H:%M')}",
-            'monday': None,
-            'tuesday': None,
-            'wednesday': None,
-            'thursday': None,
-            'friday': None,
-        }
-
-        # Fill with actual entries
-        for entry in entries.filter(period=period):
-            day_name = entry.day.name
-            period_entry[day_name] = entry
-
-            # Mark today
-            if entry.day.name == ['monday', 'tuesday', 'wednesday', 'thursday', 'friday'][weekday]:
-                period_entry[day_name].is_today = True
-
-        timetable.append(period_entry)
+            'monday': schedule.get('monday'),
+            'tuesday': schedule.get('tuesday'),
+            'wednesday': schedule.get('wednesday'),
+            'thursday': schedule.get('thursday'),
+            'friday': schedule.get('friday'),
+            'today': today_name,
+        })
 
     context = {
         'student': student,
@@ -444,31 +228,24 @@ from django.contrib import messages
 from django.db.models import Q
 from core.models import CustomUser  # Adjust if CustomUser is elsewhere
 from chat.models import ChatRoom, Message
+from chat.history import history_page
+from chat.presence import is_online
+from chat.rooms import membership, other_participant, room_list
+from chat.unread import messages_read
 @login_required
 def chat_list_student(request):
     user = request.user
-    # Get all chat rooms the user is in, sorted by latest activity
-    chat_rooms = ChatRoom.objects.filter(participants=user).order_by('-last_message_at', '-created_at')
-
-    rooms_with_info = []
-    for room in chat_rooms:
-        # For 1-on-1 chats, get the other participant
-        other_user = None
-        if not room.is_group:
-            other_user = room.participants.exclude(id=user.id).first()
-
-        # Last message preview
-        last_message = room.messages.select_related('sender').order_by('-timestamp').first()
-
-        # Unread count (messages from others that are unread)
-        unread_count = room.messages.filter(is_read=False).exclude(sender=user).count()
-
-        rooms_with_info.append({
-            'room': room,
-            'other_user': other_user,
-            'last_message': last_message,
-            'unread_count': unread_count,
-        })
+    # Get all chat rooms the user is in, sorted by latest activity — from their memberships
+    rooms_with_info = [
+        {
+            'room': item.room,
+            'other_user': item.other_user,  # for 1-on-1 chats
+            'online': item.other_online,  # has a chat socket open
+            'last_message': item.room.last_message,  # preview
+            'unread_count': item.unread_count,  # messages from others not read yet
+        }
+        for item in room_list(user)
+    ]
 
     # Users the student can start a chat with (teachers & admins only)
     available_users = CustomUser.objects.exclude(id=user.id)
@@ -523,7 +300,6 @@ def send_message_student(request):
                 sender=request.user,
                 content=content
             )
-            room.update_last_message()  # Assuming you have this method on ChatRoom
             messages.success(request, "Message sent!")
 
         return redirect('student:chat_room', room_id=room_id)
@@ -533,28 +309,29 @@ def send_message_student(request):
 
 @login_required
 def chat_room_student(request, room_id):
-    room = get_object_or_404(ChatRoom, id=room_id)
-
     # Access control: user must be a participant
-    if request.user not in room.participants.all():
+    member = membership(room_id, request.user)
+    if member is None:
+        get_object_or_404(ChatRoom, id=room_id)
         messages.error(request, "Access denied.")
         return redirect('chat:chat_list')
+    room = member.room
 
     # Get other user in 1-on-1 chat
-    other_user = None
-    if not room.is_group:
-        other_user = room.participants.exclude(id=request.user.id).first()
+    other_user = other_participant(room, request.user)
 
-    # Load messages
-    messages = room.messages.select_related('sender').order_by('timestamp')
+    # Load the latest page of messages — older ones are fetched as the user scrolls up
+    messages, has_older = history_page(room.id)
 
-    # Mark unread messages from others as read
-    room.messages.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
+    # Mark unread messages from others as read — one watermark update
+    messages_read(member)
 
     context = {
         'room': room,
         'other_user': other_user,
+        'other_online': is_online(other_user),
         'messages': messages,
+        'has_older': has_older,
         'user': request.user,
     }
     return render(request, 'student/chat_room.html', context)
@@ -0,0 +1,135 @@
+# timetable/grid.py — COMPILED TIMETABLE GRIDS
+#
+# A TimetableGrid is the day × period view of one classroom's or one teacher's
+# TimetableEntry rows (or of the whole school), compiled once and then served
+# from an in-process dict and the Django cache. Both layers are keyed by a
+# timetable version that TimetableEntry/Period/Day bump on every save, every
+# delete (post_delete, so cascades count), and every queryset update or bulk
+# write; ClassRoom/Subject saves and deletes bump it too, since grids show
+# their names, and so does renaming a teacher who is on the timetable. A
+# change invalidates every grid at once.
+
+import threading
+import time
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'timetable:version'
+# Backstop for writes that bypass the model layer entirely (raw SQL, other apps' bulk updates of related rows)
+CACHE_TIMEOUT = 10 * 60
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+class TimetableGrid:
+    """
+    Immutable day × period grid. Entries come with classroom, subject (+ teacher),
+    teacher, day and period loaded — treat them as read-only, they are shared.
+    """
+
+    __slots__ = ('days', 'periods', 'entries', '_cells')
+
+    def __init__(self, days, periods, entries):
+        object.__setattr__(self, 'days', tuple(days))
+        object.__setattr__(self, 'periods', tuple(periods))
+        object.__setattr__(self, 'entries', tuple(entries))
+        object.__setattr__(self, '_cells', MappingProxyType({
+            (entry.day.name, entry.period_id): entry for entry in self.entries
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TimetableGrid is immutable')
+
+    def __getstate__(self):
+        return {'days': self.days, 'periods': self.periods, 'entries': self.entries}
+
+    def __setstate__(self, state):
+        TimetableGrid.__init__(self, state['days'], state['periods'], state['entries'])
+
+    def cell(self, day_name, period):
+        """Entry at ('monday', Period or period id), or None"""
+        return self._cells.get((day_name, getattr(period, 'id', period)))
+
+    def rows(self):
+        """[(period, {day_name: entry})] for every period, in period order"""
+        return [
+            (period, {day.name: self._cells.get((day.name, period.id)) for day in self.days})
+            for period in self.periods
+        ]
+
+
+def _compile(**filters):
+    from timetable.models import Day, Period, TimetableEntry
+
+    entries = TimetableEntry.objects.filter(**filters).select_related(
+        'classroom', 'subject__teacher', 'subject__classroom', 'teacher', 'day', 'period'
+    ).order_by('day__id', 'period__number')
+    return TimetableGrid(
+        days=Day.objects.order_by('id'),
+        periods=Period.objects.order_by('number'),
+        entries=entries,
+    )
+
+
+# ─────────────────────────────────────
+# VERSIONING
+# ─────────────────────────────────────
+def timetable_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a cache restart never reuses an old version number
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        timetable_version()
+
+
+def bump_timetable_version():
+    """
+    Invalidate every compiled grid. Bumps now, and again once the surrounding
+    transaction commits so a grid compiled from pre-commit data is not kept.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+# ─────────────────────────────────────
+# LOOKUPS
+# ─────────────────────────────────────
+def _grid(key, **filters):
+    version = timetable_version()
+    local = _local.get(key)
+    if local is not None and local[0] == version and local[1] > time.monotonic():
+        return local[2]
+
+    cache_key = f'timetable:{version}:{key}'
+    grid = cache.get(cache_key)
+    if grid is None:
+        grid = _compile(**filters)
+        cache.set(cache_key, grid, CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local[key] = (version, time.monotonic() + CACHE_TIMEOUT, grid)
+    return grid
+
+
+def classroom_grid(classroom_id):
+    return _grid(f'classroom:{classroom_id}', classroom_id=classroom_id)
+
+
+def teacher_grid(teacher_id):
+    return _grid(f'teacher:{teacher_id}', teacher_id=teacher_id)
+
+
+def school_grid():
+    """Every entry of the school — for the timetable admin page"""
+    return _grid('school')
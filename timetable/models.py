@@ -1,20 +1,60 @@
 from django.db import models
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from users.models import CustomUser
 from core.models import ClassRoom,Subject
+from timetable.grid import bump_timetable_version
 
 
-class Period(models.Model):
+class TimetableQuerySet(models.QuerySet):
+    """Bulk writes that skip save() still invalidate the compiled grids"""
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            bump_timetable_version()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            bump_timetable_version()
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        rows = super().bulk_update(objs, *args, **kwargs)
+        if rows:
+            bump_timetable_version()
+        return rows
+
+
+class TimetableVersionMixin:
+    """
+    Any save invalidates the compiled timetable grids (timetable/grid.py);
+    deletes — direct, queryset or cascaded — go through the post_delete
+    handlers below, and bulk writes through TimetableQuerySet.
+    """
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_timetable_version()
+
+
+class Period(TimetableVersionMixin, models.Model):
     number = models.PositiveIntegerField()  # 1, 2, 3...
     start_time = models.TimeField()
     end_time = models.TimeField()
 
+    objects = TimetableQuerySet.as_manager()
+
     class Meta:
         ordering = ['number']
 
     def __str__(self):
         return f"Period {self.number} ({self.start_time} - {self.end_time})"
 
-class Day(models.Model):
+class Day(TimetableVersionMixin, models.Model):
     DAYS = [
         ('monday', 'Monday'),
         ('tuesday', 'Tuesday'),
@@ -26,13 +66,15 @@ class Day(models.Model):
     ]
     name = models.CharField(max_length=10, choices=DAYS, unique=True)
 
+    objects = TimetableQuerySet.as_manager()
+
     class Meta:
         ordering = ['id']
 
     def __str__(self):
         return self.get_name_display()
 
-class TimetableEntry(models.Model):
+class TimetableEntry(TimetableVersionMixin, models.Model):
     classroom = models.ForeignKey(ClassRoom, on_delete=models.CASCADE, related_name='timetable_entries')
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='timetable_entries')
     teacher = models.ForeignKey(
@@ -44,9 +86,58 @@ class TimetableEntry(models.Model):
     day = models.ForeignKey(Day, on_delete=models.CASCADE, related_name='timetable_entries')
     period = models.ForeignKey(Period, on_delete=models.CASCADE, related_name='timetable_entries')
 
+    objects = TimetableQuerySet.as_manager()
+
     class Meta:
         unique_together = ('classroom', 'day', 'period')  # genius — no double booking
         ordering = ['day__id', 'period__number']
 
     def __str__(self):
-        return f"{self.classroom} - {self.subject} ({self.teacher.get_full_name()}) - {self.day} Period {self.period}"
\ No newline at end of file
+        return f"{self.classroom} - {self.subject} ({self.teacher.get_full_name()}) - {self.day} Period {self.period}"
+
+
+# ─────────────────────────────────────
+# GRID INVALIDATION FOR WRITES THAT SKIP save()/delete()
+# ─────────────────────────────────────
+@receiver(post_delete, sender=TimetableEntry)
+@receiver(post_delete, sender=Day)
+@receiver(post_delete, sender=Period)
+@receiver(post_delete, sender=ClassRoom)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=CustomUser)
+def timetable_row_deleted(sender, **kwargs):
+    # Also sent for every row a cascade removes (ClassRoom → entries, etc.)
+    bump_timetable_version()
+
+
+@receiver(post_save, sender=ClassRoom)
+@receiver(post_save, sender=Subject)
+def timetable_label_saved(sender, created, **kwargs):
+    """Grids show classroom and subject names — a rename must not wait for the cache to expire"""
+    if created:
+        return  # nothing on a grid refers to it yet
+    bump_timetable_version()
+
+
+TEACHER_LABEL_FIELDS = ('first_name', 'last_name')
+
+
+@receiver(pre_save, sender=CustomUser)
+def timetable_teacher_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored name, so post_save can tell a rename from a password change or profile edit"""
+    instance._timetable_label = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(TEACHER_LABEL_FIELDS):
+        return
+    instance._timetable_label = CustomUser.objects.filter(pk=instance.pk).values_list(*TEACHER_LABEL_FIELDS).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def timetable_teacher_saved(sender, instance, **kwargs):
+    """Grids show teacher names (the entry's and the subject's) — bump only for a rename that shows"""
+    stored = instance._timetable_label
+    if stored is None or stored == tuple(getattr(instance, field) for field in TEACHER_LABEL_FIELDS):
+        return
+    if TimetableEntry.objects.filter(Q(teacher_id=instance.pk) | Q(subject__teacher_id=instance.pk)).exists():
+        bump_timetable_version()
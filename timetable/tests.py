@@ -1,3 +1,82 @@
+import datetime
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import ClassRoom, Subject
+from timetable.grid import classroom_grid, timetable_version
+from timetable.models import Day, Period, TimetableEntry
+from users.models import CustomUser
+
+
+class TimetableVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = CustomUser.objects.create_user('teacher', password='pw', role='teacher')
+        cls.classroom = ClassRoom.objects.create(name='Grade 10')
+        cls.subject = Subject.objects.create(name='Maths', classroom=cls.classroom, teacher=cls.teacher)
+        cls.monday = Day.objects.create(name='monday')
+        cls.period = Period.objects.create(number=1, start_time=datetime.time(8), end_time=datetime.time(9))
+        TimetableEntry.objects.create(
+            classroom=cls.classroom, subject=cls.subject, teacher=cls.teacher, day=cls.monday, period=cls.period
+        )
+
+    def assertBumps(self, write):
+        classroom_grid(self.classroom.id)  # compile and cache
+        before = timetable_version()
+        write()
+        self.assertGreater(timetable_version(), before)
+
+    def test_cascaded_delete_bumps(self):
+        self.assertBumps(lambda: Period.objects.filter(pk=self.period.pk).delete())
+        self.assertEqual(classroom_grid(self.classroom.id).entries, ())
+
+    def test_queryset_update_bumps(self):
+        tuesday = Day.objects.create(name='tuesday')
+        self.assertBumps(lambda: TimetableEntry.objects.update(day=tuesday))
+        self.assertIsNotNone(classroom_grid(self.classroom.id).cell('tuesday', self.period))
+
+    def test_bulk_create_bumps(self):
+        self.assertBumps(lambda: Day.objects.bulk_create([Day(name='friday')]))
+
+    def test_renaming_a_subject_bumps(self):
+        def rename():
+            self.subject.name = 'Algebra'
+            self.subject.save()
+
+        self.assertBumps(rename)
+        self.assertEqual(classroom_grid(self.classroom.id).cell('monday', self.period).subject.name, 'Algebra')
+
+    def assertDoesNotBump(self, write):
+        classroom_grid(self.classroom.id)
+        before = timetable_version()
+        write()
+        self.assertEqual(timetable_version(), before)
+
+    def test_a_login_does_not_bump(self):
+        self.assertDoesNotBump(lambda: self.client.force_login(self.teacher))
+
+    def test_renaming_a_timetabled_teacher_bumps(self):
+        def rename():
+            self.teacher.first_name = 'Tess'
+            self.teacher.save()
+
+        self.assertBumps(rename)
+        self.assertEqual(classroom_grid(self.classroom.id).cell('monday', self.period).teacher.first_name, 'Tess')
+
+    def test_other_user_saves_do_not_bump(self):
+        def change_password():
+            self.teacher.set_password('new')
+            self.teacher.save()
+
+        def edit_profile():
+            self.teacher.email = 'teacher@example.com'
+            self.teacher.save()
+
+        def rename_someone_else():
+            other = CustomUser.objects.create_user('other', password='pw', role='teacher')
+            other.first_name = 'Olga'
+            other.save()
+
+        for write in (change_password, edit_profile, rename_someone_else):
+            with self.subTest(write=write.__name__):
+                self.assertDoesNotBump(write)
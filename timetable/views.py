@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import TimetableEntry, ClassRoom, Subject, Period, Day
+from .grid import school_grid
 from users.models import CustomUser
 
 @login_required
@@ -76,15 +77,14 @@ def assign_timetable(request):
 
         return redirect('assign_timetable')
 
+    grid = school_grid()
     context = {
         'classrooms': ClassRoom.objects.all(),
         'subjects': Subject.objects.all(),
         'teachers': CustomUser.objects.filter(role='teacher'),
-        'days': Day.objects.all(),
-        'periods': Period.objects.all(),
-        'entries': TimetableEntry.objects.all().select_related(
-            'classroom', 'subject', 'teacher', 'day', 'period'
-        ).order_by('day__id', 'period__number'),
+        'days': grid.days,
+        'periods': grid.periods,
+        'entries': grid.entries,
         'entry_to_edit': entry_to_edit,
     }
     return render(request, 'timetable/schedule.html', context)
\ No newline at end of file